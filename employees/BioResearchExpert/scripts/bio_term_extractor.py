@@ -1,17 +1,65 @@
 import sys
-import re
-
-def extract_terms(text):
-    # 模拟从文献中提取基因、蛋白质或化合物
-    patterns = {
-        "Genes/Proteins": r"\b[A-Z0-9]{3,}\b",
-        "Compounds": r"\b[A-Za-z]+[0-9]+[A-Za-z]*\b"
-    }
+import os
+import json
+import argparse
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "..", "_shared"))
+from text_scanner import TextScanner, load_terms
+
+# 模拟从文献中提取基因、蛋白质或化合物
+PATTERNS = {
+    "Genes/Proteins": r"\b[A-Z0-9]{3,}\b",
+    "Compounds": r"\b[A-Za-z]+[0-9]+[A-Za-z]*\b"
+}
+STREAM_CHUNK = 1024 * 1024
+
+_default_scanner = None
+
+
+def build_scanner(dictionaries=None, keep_positions=True):
+    """正则类别合并为一个门控正则；领域词典 {类别: 词表} 并入同一个自动机。"""
+    return TextScanner(dictionaries=dictionaries, patterns=PATTERNS, keep_positions=keep_positions)
+
+
+def extract_terms(text, scanner=None):
+    global _default_scanner
+    if scanner is None:
+        if _default_scanner is None:
+            _default_scanner = build_scanner(keep_positions=False)
+        scanner = _default_scanner
+    scan = scanner.scan(text)
+    return {category: scan.terms(category) for category in scanner.categories}
+
+
+def scan_corpus(paths, dictionaries=None, keep_positions=False, chunk_size=STREAM_CHUNK):
+    """整批文献逐文件流式扫描，返回 {文件: {类别: {count, terms, positions}}}。"""
+    scanner = build_scanner(dictionaries, keep_positions)
     results = {}
-    for category, p in patterns.items():
-        results[category] = list(set(re.findall(p, text)))
+    for path in paths:
+        with open(path, 'r', encoding='utf-8', errors='ignore') as f:
+            results[path] = scanner.scan_stream(iter(lambda: f.read(chunk_size), '')).to_dict()
     return results
 
+
 if __name__ == "__main__":
-    text = sys.stdin.read()
-    print(extract_terms(text))
+    parser = argparse.ArgumentParser(description="Extract genes/proteins/compounds (stdin or files)")
+    parser.add_argument("files", nargs="*", help="Documents to scan; stdin when omitted")
+    parser.add_argument("--dict", action="append", default=[], metavar="CATEGORY=PATH",
+                        help="Domain dictionary file (one term per line); repeatable")
+    parser.add_argument("--positions", action="store_true", help="Include match positions")
+    args = parser.parse_args()
+
+    dictionaries = {}
+    for spec in args.dict:
+        category, _, path = spec.partition("=")
+        dictionaries.setdefault(category, []).extend(load_terms(path))
+
+    if args.files:
+        print(json.dumps(scan_corpus(args.files, dictionaries, args.positions), ensure_ascii=False, indent=2))
+    elif dictionaries or args.positions:
+        scanner = build_scanner(dictionaries, args.positions)
+        scan = scanner.scan_stream(iter(lambda: sys.stdin.read(STREAM_CHUNK), ''))
+        print(json.dumps(scan.to_dict(), ensure_ascii=False, indent=2))
+    else:
+        text = sys.stdin.read()
+        print(extract_terms(text))
@@ -1,23 +1,103 @@
 import pandas as pd
 import numpy as np
-from sklearn.linear_model import LinearRegression
-from scipy import stats
-import matplotlib.pyplot as plt
+import matplotlib
+from matplotlib.figure import Figure
+from matplotlib.backends.backend_agg import FigureCanvasAgg
 import os
+import re
+import json
+import time
+import hashlib
+import inspect
+import logging
+from concurrent.futures import ProcessPoolExecutor, as_completed
 
 # --- 1. Data Scouter ---
+logger = logging.getLogger("eda_toolkit")
+
+
 class DataScouter:
+    ENTITY_EXCLUDE = ['客流', '时长', '转化率', '买家数', '渗透率', '曝光率', 'nan', '占比']
+    BOUNDARY_BLACKLIST = ['客流', '时长', '转化率', '买家数', '渗透率', '曝光率', 'nan', '占比', '人数', '男性', '女性', '新客', '老客', '未知']
+    # 指标标签匹配顺序即优先级 (先匹配更精确的“停留时长”，再匹配泛化的“时长”)
+    METRIC_PATTERNS = [
+        ('Traffic', ['客流']),
+        ('Dwell', ['停留时长']),
+        ('Duration', ['时长']),
+        ('Conversion', ['转化']),
+        ('POS_Buyers', ['POS', '买家']),
+        ('New_Buyers', ['新客']),
+        ('Repeat_Buyers', ['老客']),
+    ]
+    TRAFFIC_COL = 13
+    _cache = (None, None)  # (标签列内容指纹, 解析结果)
+
+    @staticmethod
+    def _contains_any(labels, keywords):
+        pattern = "|".join(re.escape(k) for k in keywords)
+        return labels.str.contains(pattern, regex=True, na=False).to_numpy()
+
+    @staticmethod
+    def _parse_label_column(df):
+        """
+        一次性读取第 0 列：标签文本、门店边界掩码、每行的指标归类、每行之后的下一个边界。
+        解析结果按第 0 列内容的哈希缓存 (原地修改标签后指纹随之变化)，逐门店调用 get_metrics_map 时不重复扫描。
+        """
+        raw = df.iloc[:, 0].to_numpy(dtype=object)
+        key = hashlib.blake2b(pd.util.hash_array(raw, categorize=False).tobytes(), digest_size=16).digest()
+        cached_key, parsed = DataScouter._cache
+        if cached_key == key:
+            return parsed
+
+        labels = pd.Series(raw, dtype=object).map(str).str.strip()
+        n = len(labels)
+        boundary = (labels.str.len().to_numpy() > 1) & ~DataScouter._contains_any(labels, DataScouter.BOUNDARY_BLACKLIST)
+
+        metric_kind = np.full(n, None, dtype=object)
+        unassigned = np.ones(n, dtype=bool)
+        for name, kws in DataScouter.METRIC_PATTERNS:
+            hit = unassigned & DataScouter._contains_any(labels, kws)
+            metric_kind[hit] = name
+            unassigned &= ~hit
+
+        # next_boundary[r]: 严格位于 r 之后的第一个边界行 (没有则为 n)
+        boundary_rows = np.flatnonzero(boundary)
+        next_boundary = np.append(boundary_rows, n)[np.searchsorted(boundary_rows, np.arange(n), side='right')]
+
+        parsed = {'n': n, 'labels': labels.to_numpy(), 'metric_kind': metric_kind,
+                  'metric_rows': np.flatnonzero(~unassigned), 'next_boundary': next_boundary}
+        DataScouter._cache = (key, parsed)
+        return parsed
+
+    @staticmethod
+    def _metrics_in_block(parsed, name_row_idx):
+        next_entity_row = int(parsed['next_boundary'][name_row_idx]) if name_row_idx < parsed['n'] else parsed['n']
+        rows = parsed['metric_rows']
+        lo, hi = np.searchsorted(rows, [name_row_idx + 1, next_entity_row])
+        metrics = {}
+        for r in rows[lo:hi]:
+            # 同名指标出现多次时保留最后一行 (与逐行覆盖一致)
+            metrics[parsed['metric_kind'][r]] = int(r)
+        return next_entity_row, metrics
+
     @staticmethod
     def scan_entities(df, name_col_idx=0, exclude_keywords=None):
         if exclude_keywords is None:
-            exclude_keywords = ['客流', '时长', '转化率', '买家数', '渗透率', '曝光率', 'nan', '占比']
+            exclude_keywords = DataScouter.ENTITY_EXCLUDE
+        col = pd.Series(df.iloc[:, name_col_idx].to_numpy(dtype=object))
+        is_str = col.map(lambda v: isinstance(v, str)).to_numpy(dtype=bool)
+        text = col.where(is_str, "")
+        candidate = is_str & (text.str.len().to_numpy() > 1) & ~DataScouter._contains_any(text, exclude_keywords)
+
+        # 门店名下方第 3 行的客流列非空，才视为有效门店块
+        n = len(df)
+        has_traffic = np.zeros(n, dtype=bool)
+        if df.shape[1] > DataScouter.TRAFFIC_COL and n > 3:
+            has_traffic[:-3] = df.iloc[3:, DataScouter.TRAFFIC_COL].notna().to_numpy()
+
         entities = {}
-        for idx, val in enumerate(df.iloc[:, name_col_idx]):
-            if isinstance(val, str) and len(val) > 1:
-                if any(k in val for k in exclude_keywords): continue
-                traffic_row = idx + 3
-                if traffic_row < len(df) and pd.notna(df.iloc[traffic_row, 13]): 
-                     entities[val] = idx
+        for idx in np.flatnonzero(candidate & has_traffic):
+            entities[text.iat[idx]] = int(idx)
         return entities
 
     @staticmethod
@@ -25,35 +105,174 @@ class DataScouter:
         """
         精准锚定：仅在当前门店名与下一个门店名（或表尾）之间搜索指标。
         """
-        metrics = {}
-        
-        # 1. 寻找下一个实体的行号作为边界
-        next_entity_row = len(df)
-        blacklist = ['客流', '时长', '转化率', '买家数', '渗透率', '曝光率', 'nan', '占比', '人数', '男性', '女性', '新客', '老客', '未知']
-        
-        for r in range(name_row_idx + 1, len(df)):
-            val = str(df.iloc[r, 0]).strip()
-            # 如果这一行看起来像是一个新的店名（不在黑名单中且长度>1）
-            if len(val) > 1 and not any(k in val for k in blacklist):
-                next_entity_row = r
-                break
-        
-        print(f"[DEBUG] get_metrics_map for row {name_row_idx}: next_entity_row = {next_entity_row}")
-
-        # 2. 在 [name_row_idx, next_entity_row] 范围内搜索指标
-        for r in range(name_row_idx + 1, next_entity_row):
-            label = str(df.iloc[r, 0]).strip()
-            print(f"[DEBUG] Scanning metric label: '{label}'")
-            if '客流' in label: metrics['Traffic'] = r
-            elif '停留时长' in label: metrics['Dwell'] = r # 调整顺序，优先匹配更精确的“停留时长”
-            elif '时长' in label: metrics['Duration'] = r # 后匹配泛化的“时长”
-            elif '转化' in label: metrics['Conversion'] = r
-            elif 'POS' in label or '买家' in label: metrics['POS_Buyers'] = r
-            elif '新客' in label: metrics['New_Buyers'] = r
-            elif '老客' in label: metrics['Repeat_Buyers'] = r
-            
-        return metrics# --- 2. Anomaly Detector ---
+        next_entity_row, metrics = DataScouter._metrics_in_block(DataScouter._parse_label_column(df), name_row_idx)
+        logger.debug("get_metrics_map for row %s: next_entity_row = %s, metrics = %s", name_row_idx, next_entity_row, metrics)
+        return metrics
+
+    @staticmethod
+    def build_index(df, name_col_idx=0, exclude_keywords=None):
+        """
+        单遍扫描整张宽表，返回 {门店: {'row': 名称行, 'end': 下一门店行, 'metrics': {指标: 行号}}}。
+        """
+        parsed = DataScouter._parse_label_column(df)
+        index = {}
+        for name, row in DataScouter.scan_entities(df, name_col_idx, exclude_keywords).items():
+            end, metrics = DataScouter._metrics_in_block(parsed, row)
+            index[name] = {'row': row, 'end': end, 'metrics': metrics}
+        logger.debug("build_index: %d entities", len(index))
+        return index
+
+# --- 2. Anomaly Detector ---
 class AnomalyDetector:
+    @staticmethod
+    def _as_batch(matrix, keys=None):
+        """
+        统一为 (序列数, 时间点) 的二维数组。
+        支持: 一维单序列 / 二维 (门店×指标 展平后的序列) / 三维 (门店, 指标, 时间) / DataFrame (行为序列)。
+        """
+        if isinstance(matrix, pd.DataFrame):
+            if keys is None: keys = list(matrix.index)
+            matrix = matrix.to_numpy()
+        arr = np.asarray(matrix, dtype=float)
+        if arr.ndim == 1:
+            arr = arr[None, :]
+        elif arr.ndim == 3:
+            if keys is None: keys = [(s, m) for s in range(arr.shape[0]) for m in range(arr.shape[1])]
+            arr = arr.reshape(-1, arr.shape[2])
+        if keys is None: keys = list(range(arr.shape[0]))
+        if len(keys) != arr.shape[0]: raise ValueError("keys 数量与序列数不一致")
+        return arr, list(keys)
+
+    @staticmethod
+    def rolling_baseline(matrix, window=2):
+        """
+        NaN 感知的滞后移动均值：第 i 列为前 window 列 (不含自身) 非空值的均值。
+        使用 sliding_window_view (零拷贝步长视图) 一次算完所有序列，窗口全空或 i < window 处为 NaN。
+        """
+        arr = np.asarray(matrix, dtype=float)
+        out = np.full(arr.shape, np.nan)
+        if arr.shape[-1] <= window: return out
+        windows = np.lib.stride_tricks.sliding_window_view(arr[..., :-1], window, axis=-1)
+        valid = ~np.isnan(windows)
+        counts = valid.sum(axis=-1)
+        sums = np.where(valid, windows, 0.0).sum(axis=-1)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            out[..., window:] = np.where(counts > 0, sums / np.maximum(counts, 1), np.nan)
+        return out
+
+    @staticmethod
+    def volatility_scores(matrix, window=2):
+        """相对局部基线的偏离度 (curr - baseline) / baseline，无法计算处为 NaN。"""
+        arr = np.asarray(matrix, dtype=float)
+        baseline = AnomalyDetector.rolling_baseline(arr, window)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            dev = (arr - baseline) / baseline
+        dev[(baseline == 0) | np.isnan(arr)] = np.nan
+        return dev
+
+    @staticmethod
+    def _row_robust_stats(block):
+        """
+        逐行 中位数 / MAD (退化时为标准差) / Q1 / Q3，形状均为 (行数, 1)。
+        无缺失的行走 np.median 等快速路径，仅含 NaN 的行使用 nan* 版本。
+        """
+        stats_ = [np.empty((block.shape[0], 1)) for _ in range(4)]
+        has_nan = np.isnan(block).any(axis=1)
+        for rows, median_fn, pct_fn, std_fn in (
+            (~has_nan, np.median, np.percentile, np.std),
+            (has_nan, np.nanmedian, np.nanpercentile, np.nanstd),
+        ):
+            if not rows.any(): continue
+            sub = block[rows]
+            median = median_fn(sub, axis=1, keepdims=True)
+            mad = median_fn(np.abs(sub - median), axis=1, keepdims=True)
+            mad = np.where(mad == 0, std_fn(sub, axis=1, keepdims=True), mad)
+            q1, q3 = pct_fn(sub, [25, 75], axis=1, keepdims=True)
+            for out, val in zip(stats_, (median, mad, q1, q3)):
+                out[rows] = val
+        return stats_
+
+    @staticmethod
+    def robust_scores(matrix, dates):
+        """
+        按年份分组计算 Robust Z (MAD，退化时用标准差) 与 IQR 上下界，全部序列一次向量化。
+        返回 dict: mod_z / median / lower / upper (均与输入同形)，valid 为该年可用的 (序列, 列) 掩码。
+        """
+        arr = np.asarray(matrix, dtype=float)
+        shape = arr.shape
+        res = {k: np.full(shape, np.nan) for k in ('mod_z', 'median', 'lower', 'upper')}
+        res['valid'] = np.zeros(shape, dtype=bool)
+        years = np.array([d.split('-')[0] for d in dates])
+
+        for y in dict.fromkeys(years):
+            cols = np.flatnonzero(years == y)
+            block = arr[:, cols]
+            n_clean = (~np.isnan(block)).sum(axis=1)
+            ok = n_clean >= 3
+            if not ok.any(): continue
+            block = block[ok]
+
+            median, mad, q1, q3 = AnomalyDetector._row_robust_stats(block)
+            nonzero = (mad != 0).ravel()
+            iqr = q3 - q1
+            with np.errstate(invalid='ignore', divide='ignore'):
+                mod_z = 0.6745 * (block - median) / mad
+
+            rows = np.flatnonzero(ok)[nonzero]
+            idx = np.ix_(rows, cols)
+            res['mod_z'][idx] = mod_z[nonzero]
+            res['median'][idx] = np.broadcast_to(median[nonzero], (len(rows), len(cols)))
+            res['lower'][idx] = np.broadcast_to((q1 - 1.5 * iqr)[nonzero], (len(rows), len(cols)))
+            res['upper'][idx] = np.broadcast_to((q3 + 1.5 * iqr)[nonzero], (len(rows), len(cols)))
+            res['valid'][idx] = True
+        return res
+
+    @staticmethod
+    def _group_hits(hit_mask, keys, build):
+        """只遍历命中的 (序列, 列) 坐标，按序列聚合并按日期排序。"""
+        result = {k: [] for k in keys}
+        for r, c in zip(*np.nonzero(hit_mask)):
+            result[keys[r]].append(build(r, c))
+        for k in result:
+            result[k].sort(key=lambda x: x['date'])
+        return result
+
+    @staticmethod
+    def detect_volatility_batch(matrix, dates, window=2, threshold_pct=0.5, keys=None):
+        """批量版局部波动率突变检测，返回 {序列键: 异常列表}。"""
+        arr, keys = AnomalyDetector._as_batch(matrix, keys)
+        if arr.shape[1] != len(dates): raise ValueError("dates 长度与时间维不一致")
+        dev = AnomalyDetector.volatility_scores(arr, window)
+        with np.errstate(invalid='ignore'):
+            hits = np.abs(dev) > threshold_pct
+        method = f'Vol({window}M)'
+        return AnomalyDetector._group_hits(hits, keys, lambda r, c: {
+            'date': dates[c],
+            'val': arr[r, c],
+            'z_score': round(dev[r, c], 2), # 这里用 偏离度% 代替 Z-Score 展示
+            'type': 'Surge' if dev[r, c] > 0 else 'Plunge',
+            'method': method
+        })
+
+    @staticmethod
+    def detect_outliers_batch(matrix, dates, threshold=2.0, keys=None):
+        """批量版 MAD + IQR 异常检测，返回 {序列键: 异常列表}。"""
+        arr, keys = AnomalyDetector._as_batch(matrix, keys)
+        if arr.shape[1] != len(dates): return {k: [] for k in keys}
+        s = AnomalyDetector.robust_scores(arr, dates)
+        mod_z = s['mod_z']
+        with np.errstate(invalid='ignore'):
+            z_hit = np.abs(mod_z) > threshold
+            iqr_hit = (arr < s['lower']) | (arr > s['upper'])
+        hits = s['valid'] & ~np.isnan(arr) & (z_hit | iqr_hit)
+        return AnomalyDetector._group_hits(hits, keys, lambda r, c: {
+            'date': dates[c],
+            'val': arr[r, c],
+            'z_score': round(mod_z[r, c], 2),
+            'type': 'High' if arr[r, c] > s['median'][r, c] else 'Low',
+            'method': f"Z={mod_z[r, c]:.2f}" if z_hit[r, c] else "IQR"
+        })
+
     @staticmethod
     def detect_volatility_outliers(series, dates, window=2, threshold_pct=0.5):
         """
@@ -61,36 +280,7 @@ class AnomalyDetector:
         对比当前值与过去 N 个月的移动平均值。
         threshold_pct: 偏离幅度阈值 (0.5 代表 50% 突变)
         """
-        vals = np.array(series, dtype=float)
-        outliers = []
-        
-        for i in range(window, len(vals)):
-            curr_val = vals[i]
-            if pd.isna(curr_val): continue
-            
-            # 计算局部基线 (前 N 个月的均值)
-            local_window = vals[i-window : i]
-            # 剔除窗口内的 NaN
-            local_window = local_window[~np.isnan(local_window)]
-            
-            if len(local_window) == 0: continue
-            
-            baseline = np.mean(local_window)
-            if baseline == 0: continue
-            
-            # 计算偏离度
-            deviation = (curr_val - baseline) / baseline
-            
-            if abs(deviation) > threshold_pct:
-                outliers.append({
-                    'date': dates[i],
-                    'val': curr_val,
-                    'z_score': round(deviation, 2), # 这里用 偏离度% 代替 Z-Score 展示
-                    'type': 'Surge' if deviation > 0 else 'Plunge',
-                    'method': f'Vol({window}M)'
-                })
-                
-        return sorted(outliers, key=lambda x: x['date'])
+        return AnomalyDetector.detect_volatility_batch(series, dates, window, threshold_pct, keys=[0])[0]
 
     @staticmethod
     def detect_outliers(series, dates, threshold=2.0):
@@ -98,136 +288,349 @@ class AnomalyDetector:
         基于 MAD 与 IQR 双重逻辑的异常检测。
         Threshold 调低至 2.0 以捕捉显著的量级跳变。
         """
-        vals = np.array(series, dtype=float)
-        if len(vals) != len(dates): return []
-        
-        year_data = {}
-        for i, d in enumerate(dates):
-            y = d.split('-')[0]
-            if y not in year_data: year_data[y] = {'vals': [], 'indices': []}
-            year_data[y]['vals'].append(vals[i])
-            year_data[y]['indices'].append(i)
-            
-        outliers = []
-        for y, data in year_data.items():
-            y_vals = np.array(data['vals'])
-            y_indices = data['indices']
-            clean_mask = ~np.isnan(y_vals)
-            clean_vals = y_vals[clean_mask]
-            if len(clean_vals) < 3: continue
-            
-            # 方法 A: Robust Z-Score (MAD)
-            median = np.median(clean_vals)
-            mad = np.median(np.abs(clean_vals - median))
-            if mad == 0: mad = np.std(clean_vals)
-            if mad == 0: continue
-            mod_z = 0.6745 * (y_vals - median) / mad
-            
-            # 方法 B: IQR (作为补充)
-            q1, q3 = np.percentile(clean_vals, [25, 75])
-            iqr = q3 - q1
-            lower_bound = q1 - 1.5 * iqr
-            upper_bound = q3 + 1.5 * iqr
-            
-            for local_i, z in enumerate(mod_z):
-                v = y_vals[local_i]
-                if pd.isna(v): continue
-                
-                # 触发任一条件即视为异常
-                is_anomaly = False
-                reason = ""
-                if abs(z) > threshold:
-                    is_anomaly = True
-                    reason = f"Z={z:.2f}"
-                elif v < lower_bound or v > upper_bound:
-                    is_anomaly = True
-                    reason = "IQR"
-                
-                if is_anomaly:
-                    global_idx = y_indices[local_i]
-                    outliers.append({
-                        'date': dates[global_idx], 
-                        'val': v, 
-                        'z_score': round(z, 2), 
-                        'type': 'High' if v > median else 'Low',
-                        'method': reason
-                    })
-                    
-        return sorted(outliers, key=lambda x: x['date'])
+        return AnomalyDetector.detect_outliers_batch(series, dates, threshold, keys=[0])[0]
 
 # --- 3. Temporal Analysis ---
 class TrendTools:
+    @staticmethod
+    def fit_lines(Y, X=None):
+        """
+        闭式 OLS：对 (序列数, 点数) 矩阵逐行拟合 y = intercept + slope·x，NaN 视为缺失 (掩码)。
+        X 缺省为 0..n-1；也可传一维 (各行共享) 或与 Y 同形的二维数组。
+        返回 dict: slope / intercept / r2 / n，每行一个值；有效点数 < 2 的行为 NaN。
+        """
+        Y = np.atleast_2d(np.asarray(Y, dtype=float))
+        X = np.arange(Y.shape[1], dtype=float) if X is None else np.asarray(X, dtype=float)
+        X = np.broadcast_to(X, Y.shape)
+        mask = ~(np.isnan(Y) | np.isnan(X))
+        n = mask.sum(axis=1)
+        nz = np.maximum(n, 1)
+        x_mean = np.where(mask, X, 0.0).sum(axis=1) / nz
+        y_mean = np.where(mask, Y, 0.0).sum(axis=1) / nz
+        dx = np.where(mask, X - x_mean[:, None], 0.0)
+        dy = np.where(mask, Y - y_mean[:, None], 0.0)
+        sxx, sxy, syy = (dx * dx).sum(axis=1), (dx * dy).sum(axis=1), (dy * dy).sum(axis=1)
+
+        with np.errstate(invalid='ignore', divide='ignore'):
+            slope = sxy / sxx
+            intercept = y_mean - slope * x_mean
+            ss_res = np.maximum(syy - slope * sxy, 0.0)
+            # 与 sklearn 的 score 口径一致：y 为常数时完美拟合记 1，否则记 0
+            r2 = np.where(syy > 0, 1 - ss_res / syy, np.where(ss_res == 0, 1.0, 0.0))
+        bad = (n < 2) | (sxx == 0)
+        for arr in (slope, intercept, r2):
+            arr[bad] = np.nan
+        return {'slope': slope, 'intercept': intercept, 'r2': r2, 'n': n}
+
+    @staticmethod
+    def calculate_slopes(windows):
+        """
+        多个不等长窗口一次拟合：尾部补 NaN 组成二维数组 (x 仍从 0 开始)。
+        返回与 calculate_slope 相同语义的列表 (无法拟合为 None)。
+        """
+        windows = [np.asarray(w, dtype=float) for w in windows]
+        if not windows: return []
+        width = max(len(w) for w in windows)
+        if width < 2: return [None] * len(windows)
+        Y = np.full((len(windows), width), np.nan)
+        for i, w in enumerate(windows):
+            Y[i, :len(w)] = w
+        slopes = TrendTools.fit_lines(Y)['slope']
+        return [None if np.isnan(s) else float(s) for s in slopes]
+
     @staticmethod
     def calculate_slope(y):
         if len(y) < 2: return None
-        X = np.arange(len(y)).reshape(-1, 1)
-        mask = ~np.isnan(y)
-        if mask.sum() < 2: return None
-        model = LinearRegression()
-        model.fit(X[mask], y[mask])
-        return float(model.coef_[0])
+        return TrendTools.calculate_slopes([y])[0]
 
 # --- 4. Event & Calendar ---
+class CalendarIndex:
+    """
+    日期轴 ('YYYY-M') 的预计算索引：月序号、节假日掩码、春节位置一次算好，
+    之后的窗口取数 / 节假日判断 / 春节对齐同比均为 O(1) 查表。
+    holiday_months / cny_months 缺省取 EventTools 上的表，可按需传入更多年份。
+    """
+    def __init__(self, dates, holiday_months=None, cny_months=None):
+        self.dates = list(dates)
+        self.holiday_months = EventTools.HOLIDAY_MONTHS if holiday_months is None else holiday_months
+        self.cny_months = EventTools.CNY_MONTH_MAP if cny_months is None else cny_months
+        n = len(self.dates)
+
+        ym = [CalendarIndex.parse(d) for d in self.dates]
+        self.years = np.array([p[0] if p else -1 for p in ym], dtype=int)
+        self.months = np.array([p[1] if p else -1 for p in ym], dtype=int)
+        self.ordinals = np.where(self.years >= 0, self.years * 12 + self.months - 1, -1)
+        self.holiday = np.array([bool(p) and p[1] in self.holiday_months.get(p[0], []) for p in ym], dtype=bool)
+        self.cny = np.array([bool(p) and self.cny_months.get(p[0]) == p[1] for p in ym], dtype=bool)
+
+        self._pos = {}
+        for i, d in enumerate(self.dates):
+            self._pos.setdefault(d, i)
+        self._ord_pos = {}
+        for i, o in enumerate(self.ordinals.tolist()):
+            if o >= 0: self._ord_pos.setdefault(o, i)
+        # next_cny[i]: 位置 i 及之后第一个春节月的下标 (没有则为 n)
+        self.next_cny = np.full(n + 1, n, dtype=int)
+        for i in range(n - 1, -1, -1):
+            self.next_cny[i] = i if self.cny[i] else self.next_cny[i + 1]
+
+    @classmethod
+    def from_config(cls, dates, path):
+        """从 JSON 读取额外的节假日表：{"holiday_months": {"2026": [2, 10]}, "cny_months": {"2026": 2}}，与默认表合并。"""
+        with open(path, 'r', encoding='utf-8') as f:
+            cfg = json.load(f)
+        holiday = {**EventTools.HOLIDAY_MONTHS, **{int(y): list(m) for y, m in cfg.get('holiday_months', {}).items()}}
+        cny = {**EventTools.CNY_MONTH_MAP, **{int(y): int(m) for y, m in cfg.get('cny_months', {}).items()}}
+        return cls(dates, holiday, cny)
+
+    @staticmethod
+    def parse(date_str):
+        try:
+            y, m = map(int, date_str.split('-'))
+            return y, m
+        except (ValueError, AttributeError): return None
+
+    def __len__(self):
+        return len(self.dates)
+
+    def index(self, date_str):
+        """等价于 dates.index(date_str)，未找到时抛 ValueError。"""
+        try: return self._pos[date_str]
+        except KeyError: raise ValueError(f"{date_str!r} is not in dates") from None
+
+    def columns(self, start_idx, end_idx, mode='clean'):
+        """窗口 [start, end) 在日期轴内的列下标；clean 模式剔除节假日。"""
+        idx = np.arange(max(start_idx, 0), min(max(end_idx, 0), len(self.dates)))
+        return idx[~self.holiday[idx]] if mode == 'clean' else idx
+
+    def window(self, series, start_idx, end_idx, mode='clean'):
+        return np.asarray(series)[self.columns(start_idx, end_idx, mode)]
+
+    def aligned_yoy(self, start_idx, end_idx):
+        """
+        春节对齐的同比窗口，语义同 EventTools.get_aligned_yoy_indices。
+        去年春节月按 (年, 月) 查找，'2025-01' 与 '2025-1' 两种写法都能对齐
+        (旧实现按 "YYYY-M" 字符串查找，零填充日期轴上总是退回未对齐的 start-12 窗口)：
+        >>> CalendarIndex(['2024-01', '2024-02', '2024-03'] + [f'2024-{m:02d}' for m in range(4, 13)]
+        ...               + ['2025-01', '2025-02', '2025-03']).aligned_yoy(12, 15)
+        (1, 4)
+        """
+        if start_idx < 0 or end_idx > len(self.dates): return -1, -1
+        standard_start, standard_end = start_idx - 12, end_idx - 12
+        if standard_start < 0: return -1, -1
+        first_cny = self.next_cny[start_idx]
+        if first_cny >= end_idx: return standard_start, standard_end
+        cny_pos = first_cny - start_idx
+        last_y = self.years[start_idx] - 1
+        if last_y not in self.cny_months: return standard_start, standard_end
+        last_cny_idx = self._ord_pos.get(last_y * 12 + self.cny_months[last_y] - 1)
+        if last_cny_idx is None: return standard_start, standard_end
+        alt_start = int(last_cny_idx - cny_pos)
+        if alt_start < 0: return standard_start, standard_end
+        return alt_start, alt_start + (end_idx - start_idx)
+
+
 class EventTools:
     HOLIDAY_MONTHS = {2024: [2, 10], 2025: [1, 10]}
     CNY_MONTH_MAP = {2024: 2, 2025: 1}
+    _calendar_cache = {}
+
+    @staticmethod
+    def calendar_for(dates):
+        """按日期轴缓存 CalendarIndex (默认节假日表)，多门店共用同一日期轴时只构建一次。"""
+        key = tuple(dates)
+        cal = EventTools._calendar_cache.get(key)
+        if cal is None:
+            if len(EventTools._calendar_cache) >= 32: EventTools._calendar_cache.clear()
+            cal = EventTools._calendar_cache[key] = CalendarIndex(key)
+        return cal
     @staticmethod
     def is_holiday(date_str):
-        try:
-            y, m = map(int, date_str.split('-'))
-            return m in EventTools.HOLIDAY_MONTHS.get(y, [])
-        except: return False
+        p = CalendarIndex.parse(date_str)
+        return bool(p) and p[1] in EventTools.HOLIDAY_MONTHS.get(p[0], [])
     @staticmethod
     def get_window_data(series, dates, start_idx, end_idx, mode='clean'):
-        vals = []
-        for i in range(start_idx, end_idx):
-            if 0 <= i < len(dates):
-                d, v = dates[i], series[i]
-                if mode == 'clean':
-                    if not EventTools.is_holiday(d): vals.append(v)
-                else: vals.append(v)
-        return np.array(vals)
+        cal = dates if isinstance(dates, CalendarIndex) else EventTools.calendar_for(dates)
+        return cal.window(series, start_idx, end_idx, mode)
     @staticmethod
     def get_aligned_yoy_indices(dates, start_idx, end_idx):
-        if start_idx < 0 or end_idx > len(dates): return -1, -1
-        standard_start, standard_end = start_idx - 12, end_idx - 12
-        if standard_start < 0: return -1, -1
-        has_cny, cny_pos = False, -1
-        for i in range(start_idx, end_idx):
-            y, m = map(int, dates[i].split('-'))
-            if y in EventTools.CNY_MONTH_MAP and m == EventTools.CNY_MONTH_MAP[y]:
-                has_cny, cny_pos = True, i - start_idx
-                break
-        if not has_cny: return standard_start, standard_end
-        curr_y = int(dates[start_idx].split('-')[0])
-        last_y = curr_y - 1
-        if last_y not in EventTools.CNY_MONTH_MAP: return standard_start, standard_end
-        try:
-            last_cny_idx = dates.index(f"{last_y}-{EventTools.CNY_MONTH_MAP[last_y]}")
-            alt_start = last_cny_idx - cny_pos
-            if alt_start < 0: return standard_start, standard_end
-            return alt_start, alt_start + (end_idx - start_idx)
-        except: return standard_start, standard_end
+        cal = dates if isinstance(dates, CalendarIndex) else EventTools.calendar_for(dates)
+        return cal.aligned_yoy(start_idx, end_idx)
+    @staticmethod
+    def _prefix_stats(matrix):
+        """
+        非空计数 / 和 / 平方和 的前缀累积 (每行先减去自身均值以降低平方和的抵消误差)。
+        返回形状均为 (序列数, n+1)，第 0 列为 0。
+        """
+        arr = np.atleast_2d(np.asarray(matrix, dtype=float))
+        valid = ~np.isnan(arr)
+        n_valid = valid.sum(axis=1, keepdims=True)
+        center = np.where(valid, arr, 0.0).sum(axis=1, keepdims=True) / np.maximum(n_valid, 1)
+        x = np.where(valid, arr - center, 0.0)
+        pad = lambda a: np.concatenate([np.zeros((a.shape[0], 1)), np.cumsum(a, axis=1)], axis=1)
+        return pad(valid.astype(float)), pad(x), pad(x * x), valid
+
+    @staticmethod
+    def _split_t_stats(cnt, s1, s2, lo, hi, splits):
+        """
+        区间 [lo, hi) 内各切分点 t 的双样本 t 统计量 (等方差，忽略 NaN)，与 ttest_ind(nan_policy='omit') 同口径。
+        cnt/s1/s2 为前缀累积，splits 为一维切分点数组。返回 (序列数, len(splits))。
+        """
+        n1 = cnt[:, splits] - cnt[:, [lo]]
+        n2 = cnt[:, [hi]] - cnt[:, splits]
+        a1 = s1[:, splits] - s1[:, [lo]]
+        a2 = s1[:, [hi]] - s1[:, splits]
+        q1 = s2[:, splits] - s2[:, [lo]]
+        q2 = s2[:, [hi]] - s2[:, splits]
+        with np.errstate(invalid='ignore', divide='ignore'):
+            m1, m2 = a1 / n1, a2 / n2
+            ss = np.maximum(q1 - a1 * m1, 0) + np.maximum(q2 - a2 * m2, 0)
+            pooled = ss / (n1 + n2 - 2)
+            t = (m1 - m2) / np.sqrt(pooled * (1 / n1 + 1 / n2))
+        return t
+
+    @staticmethod
+    def scan_for_break_points_batch(matrix, min_window=3):
+        """
+        批量单断点扫描：前缀和一次求出所有切分点的 t 统计量，O(n) / 序列。
+        返回 {'best_break_index': (S,) int 数组 (无有效切分为 -1), 'max_t_stat': (S,), 't_stats': (S, n)}。
+        """
+        cnt, s1, s2, valid = EventTools._prefix_stats(matrix)
+        S, n = valid.shape
+        t_full = np.full((S, n), np.nan)
+        best = np.full(S, -1, dtype=int)
+        max_t = np.zeros(S)
+        splits = np.arange(min_window, n - min_window)
+        if len(splits) == 0:
+            return {'best_break_index': best, 'max_t_stat': max_t, 't_stats': t_full}
+
+        t = EventTools._split_t_stats(cnt, s1, s2, 0, n, splits)
+        # 与原逐点逻辑一致：任一侧缺失超过一半则跳过该切分点
+        n_pre, n_post = cnt[:, splits], cnt[:, [n]] - cnt[:, splits]
+        skip = (splits - n_pre > splits / 2) | ((n - splits) - n_post > (n - splits) / 2)
+        abs_t = np.where(skip | np.isnan(t), -np.inf, np.abs(t))
+        t_full[:, splits] = np.where(skip, np.nan, t)
+
+        pos = np.argmax(abs_t, axis=1)
+        top = abs_t[np.arange(S), pos]
+        found = top > 0
+        best[found] = splits[pos[found]]
+        max_t[found] = top[found]
+        return {'best_break_index': best, 'max_t_stat': max_t, 't_stats': t_full}
+
     @staticmethod
     def scan_for_break_point(series, min_window=3):
-        y, n = np.array(series), len(series)
-        best_t, max_t = -1, 0
-        for t in range(min_window, n - min_window):
-            pre, post = y[:t], y[t:]
-            if np.isnan(pre).sum() > len(pre)/2 or np.isnan(post).sum() > len(post)/2: continue
-            t_s, _ = stats.ttest_ind(pre, post, nan_policy='omit')
-            if abs(t_s) > max_t: max_t, best_t = abs(t_s), t
-        return {'best_break_index': best_t, 'max_t_stat': max_t}
+        res = EventTools.scan_for_break_points_batch(np.asarray(series, dtype=float)[None, :], min_window)
+        best = int(res['best_break_index'][0])
+        return {'best_break_index': best, 'max_t_stat': float(res['max_t_stat'][0]) if best >= 0 else 0}
+
+    @staticmethod
+    def _segment_cost(cnt, s1, s2, starts, end):
+        """均值漂移模型下各段 [start, end) 的残差平方和 (SSE)，NaN 不计入。"""
+        n = cnt[end] - cnt[starts]
+        a = s1[end] - s1[starts]
+        with np.errstate(invalid='ignore', divide='ignore'):
+            return np.where(n > 0, (s2[end] - s2[starts]) - a * a / np.maximum(n, 1), 0.0)
+
+    @staticmethod
+    def _binseg(cnt, s1, s2, n, max_breaks, min_window, min_t):
+        breaks, pending = [], [(0, n)]
+        while pending and len(breaks) < max_breaks:
+            # 在所有待切分段中选 |t| 最大者，断点按显著性依次加入
+            cands = []
+            for lo, hi in pending:
+                splits = np.arange(lo + min_window, hi - min_window)
+                if len(splits) == 0: continue
+                t = np.abs(EventTools._split_t_stats(cnt, s1, s2, lo, hi, splits)[0])
+                t = np.where(np.isnan(t), -np.inf, t)
+                k = int(np.argmax(t))
+                if t[k] >= min_t: cands.append((float(t[k]), int(splits[k]), lo, hi))
+            if not cands: break
+            t_best, b, lo, hi = max(cands)
+            breaks.append(b)
+            pending.remove((lo, hi))
+            pending += [(lo, b), (b, hi)]
+        return sorted(breaks)
+
+    @staticmethod
+    def _pelt(cnt, s1, s2, n, min_window, penalty):
+        c, a, q = cnt[0], s1[0], s2[0]
+        F = np.full(n + 1, np.inf)
+        F[0] = -penalty
+        last = np.zeros(n + 1, dtype=int)
+        candidates = np.array([0])
+        for end in range(min_window, n + 1):
+            eligible = candidates <= end - min_window
+            starts = candidates[eligible]
+            if len(starts) == 0: continue
+            costs = F[starts] + EventTools._segment_cost(c, a, q, starts, end) + penalty
+            k = int(np.argmin(costs))
+            F[end], last[end] = costs[k], starts[k]
+            # PELT 剪枝：已不可能更优的起点不再参与后续计算
+            candidates = np.concatenate([candidates[~eligible], starts[costs - penalty <= F[end]], [end]])
+        breaks, end = [], n
+        while end > 0 and np.isfinite(F[end]):
+            end = int(last[end])
+            if end > 0: breaks.append(end)
+        return sorted(breaks)
+
+    @staticmethod
+    def _multi_breaks(row, cnt, s1, s2, method, max_breaks, min_window, min_t, penalty):
+        n = len(row)
+        if method == 'binseg':
+            breaks = EventTools._binseg(cnt, s1, s2, n, max_breaks, min_window, min_t)
+        elif method == 'pelt':
+            if penalty is None:
+                penalty = 2 * (np.nanvar(row) if (~np.isnan(row)).sum() > 1 else 0.0) * np.log(max(n, 2))
+            breaks = EventTools._pelt(cnt, s1, s2, n, min_window, penalty)
+        else:
+            raise ValueError(f"未知的断点检测方法: {method} (可选: binseg / pelt)")
+        # 每个断点以相邻两段做 t 检验，给出显著性
+        bounds = [0] + breaks + [n]
+        t_stats = [float(abs(EventTools._split_t_stats(cnt, s1, s2, bounds[i], bounds[i + 2], np.array([b]))[0, 0]))
+                   for i, b in enumerate(breaks)]
+        return {'break_points': breaks, 't_stats': t_stats}
+
+    @staticmethod
+    def detect_break_points_batch(matrix, keys=None, method='binseg', max_breaks=3, min_window=3, min_t=3.0, penalty=None):
+        """
+        批量多断点检测，返回 {序列键: 结果}。
+        - binseg: 二分切割，每轮在各段中取 |t| 最大的切分点，|t| < min_t 或达到 max_breaks 时停止。
+        - pelt: 以 SSE 为代价的 PELT 剪枝动态规划，penalty 默认 2·σ²·ln(n)。
+        结果含 best_break_index / max_t_stat (与 scan_for_break_point 一致) 以及 break_points / t_stats。
+        单断点部分一次向量化，多断点逐序列复用同一份前缀和。
+        """
+        arr = np.atleast_2d(np.asarray(matrix, dtype=float))
+        keys = list(range(arr.shape[0])) if keys is None else list(keys)
+        if len(keys) != arr.shape[0]: raise ValueError("keys 数量与序列数不一致")
+        single = EventTools.scan_for_break_points_batch(arr, min_window)
+        cnt, s1, s2, _ = EventTools._prefix_stats(arr)
+
+        results = {}
+        for i, k in enumerate(keys):
+            best = int(single['best_break_index'][i])
+            res = {'best_break_index': best, 'max_t_stat': float(single['max_t_stat'][i]) if best >= 0 else 0}
+            res.update(EventTools._multi_breaks(arr[i], cnt[i:i + 1], s1[i:i + 1], s2[i:i + 1],
+                                                method, max_breaks, min_window, min_t, penalty))
+            results[k] = res
+        return results
+
+    @staticmethod
+    def detect_break_points(series, method='binseg', max_breaks=3, min_window=3, min_t=3.0, penalty=None):
+        """单序列多断点检测，参数与返回见 detect_break_points_batch。"""
+        return EventTools.detect_break_points_batch([series], [0], method, max_breaks, min_window, min_t, penalty)[0]
 
 # --- 5. Impact Analysis ---
 class ImpactAnalyzer:
     @staticmethod
-    def analyze_metric(values, dates, anchor_date, window=3):
+    def analyze_metric(values, dates, anchor_date, window=3, calendar=None):
         """
         按照SOP，执行完全对称的、包含交叉验证的指标影响分析。
+        calendar: 可传入预先构建的 CalendarIndex (多次调用共用同一日期轴时复用)。
         """
+        cal = calendar if calendar is not None else EventTools.calendar_for(dates)
         try:
-            anchor_idx = dates.index(anchor_date)
+            anchor_idx = cal.index(anchor_date)
         except ValueError:
             return {"error": f"Anchor date {anchor_date} not found in dates."}
 
@@ -235,30 +638,30 @@ class ImpactAnalyzer:
         pre_short_s, pre_short_e = anchor_idx - window, anchor_idx
         post_short_s, post_short_e = anchor_idx + 1, anchor_idx + 1 + window
         pre_full_s, pre_full_e = 0, anchor_idx
-        post_full_s, post_full_e = anchor_idx + 1, len(dates)
+        post_full_s, post_full_e = anchor_idx + 1, len(cal)
 
-        yoy_pre_short_s, yoy_pre_short_e = EventTools.get_aligned_yoy_indices(dates, pre_short_s, pre_short_e)
-        yoy_post_short_s, yoy_post_short_e = EventTools.get_aligned_yoy_indices(dates, post_short_s, post_short_e)
-        yoy_pre_full_s, yoy_pre_full_e = EventTools.get_aligned_yoy_indices(dates, pre_full_s, pre_full_e)
-        yoy_post_full_s, yoy_post_full_e = EventTools.get_aligned_yoy_indices(dates, post_full_s, post_full_e)
+        yoy_pre_short_s, yoy_pre_short_e = EventTools.get_aligned_yoy_indices(cal, pre_short_s, pre_short_e)
+        yoy_post_short_s, yoy_post_short_e = EventTools.get_aligned_yoy_indices(cal, post_short_s, post_short_e)
+        yoy_pre_full_s, yoy_pre_full_e = EventTools.get_aligned_yoy_indices(cal, pre_full_s, pre_full_e)
+        yoy_post_full_s, yoy_post_full_e = EventTools.get_aligned_yoy_indices(cal, post_full_s, post_full_e)
 
         # --- 2. 提取各窗口数据 ---
         # 绝对值 (剔除节假日)
-        pre_abs_vals = EventTools.get_window_data(values, dates, pre_short_s, pre_short_e, 'clean')
-        post_abs_vals = EventTools.get_window_data(values, dates, post_short_s, post_short_e, 'clean')
-        yoy_pre_abs_vals = EventTools.get_window_data(values, dates, yoy_pre_short_s, yoy_pre_short_e, 'clean')
-        yoy_post_abs_vals = EventTools.get_window_data(values, dates, yoy_post_short_s, yoy_post_short_e, 'clean')
+        pre_abs_vals = EventTools.get_window_data(values, cal, pre_short_s, pre_short_e, 'clean')
+        post_abs_vals = EventTools.get_window_data(values, cal, post_short_s, post_short_e, 'clean')
+        yoy_pre_abs_vals = EventTools.get_window_data(values, cal, yoy_pre_short_s, yoy_pre_short_e, 'clean')
+        yoy_post_abs_vals = EventTools.get_window_data(values, cal, yoy_post_short_s, yoy_post_short_e, 'clean')
         
         # 趋势 (不剔除节假日)
-        pre_trend_short = EventTools.get_window_data(values, dates, pre_short_s, pre_short_e, 'full')
-        post_trend_short = EventTools.get_window_data(values, dates, post_short_s, post_short_e, 'full')
-        pre_trend_full = EventTools.get_window_data(values, dates, pre_full_s, pre_full_e, 'full')
-        post_trend_full = EventTools.get_window_data(values, dates, post_full_s, post_full_e, 'full')
+        pre_trend_short = EventTools.get_window_data(values, cal, pre_short_s, pre_short_e, 'full')
+        post_trend_short = EventTools.get_window_data(values, cal, post_short_s, post_short_e, 'full')
+        pre_trend_full = EventTools.get_window_data(values, cal, pre_full_s, pre_full_e, 'full')
+        post_trend_full = EventTools.get_window_data(values, cal, post_full_s, post_full_e, 'full')
         
-        yoy_pre_trend_short = EventTools.get_window_data(values, dates, yoy_pre_short_s, yoy_pre_short_e, 'full')
-        yoy_post_trend_short = EventTools.get_window_data(values, dates, yoy_post_short_s, yoy_post_short_e, 'full')
-        yoy_pre_trend_full = EventTools.get_window_data(values, dates, yoy_pre_full_s, yoy_pre_full_e, 'full')
-        yoy_post_trend_full = EventTools.get_window_data(values, dates, yoy_post_full_s, yoy_post_full_e, 'full')
+        yoy_pre_trend_short = EventTools.get_window_data(values, cal, yoy_pre_short_s, yoy_pre_short_e, 'full')
+        yoy_post_trend_short = EventTools.get_window_data(values, cal, yoy_post_short_s, yoy_post_short_e, 'full')
+        yoy_pre_trend_full = EventTools.get_window_data(values, cal, yoy_pre_full_s, yoy_pre_full_e, 'full')
+        yoy_post_trend_full = EventTools.get_window_data(values, cal, yoy_post_full_s, yoy_post_full_e, 'full')
 
         # --- 3. 计算分析矩阵 ---
         def safe_mean(vals):
@@ -278,23 +681,139 @@ class ImpactAnalyzer:
         abs_matrix['change_pct'] = safe_pct_change(abs_matrix['post_avg'], abs_matrix['pre_avg'])
         abs_matrix['yoy_change_pct'] = safe_pct_change(abs_matrix['yoy_post_avg'], abs_matrix['yoy_pre_avg'])
         
-        trend_matrix = {
-            'pre_slope_short': TrendTools.calculate_slope(pre_trend_short) or np.nan,
-            'post_slope_short': TrendTools.calculate_slope(post_trend_short) or np.nan,
-            'pre_slope_full': TrendTools.calculate_slope(pre_trend_full) or np.nan,
-            'post_slope_full': TrendTools.calculate_slope(post_trend_full) or np.nan,
+        # 8 个趋势窗口合并为一次批量拟合
+        trend_windows = {
+            'pre_slope_short': pre_trend_short,
+            'post_slope_short': post_trend_short,
+            'pre_slope_full': pre_trend_full,
+            'post_slope_full': post_trend_full,
             
-            'yoy_pre_slope_short': TrendTools.calculate_slope(yoy_pre_trend_short) or np.nan,
-            'yoy_post_slope_short': TrendTools.calculate_slope(yoy_post_trend_short) or np.nan,
-            'yoy_pre_slope_full': TrendTools.calculate_slope(yoy_pre_trend_full) or np.nan,
-            'yoy_post_slope_full': TrendTools.calculate_slope(yoy_post_trend_full) or np.nan,
+            'yoy_pre_slope_short': yoy_pre_trend_short,
+            'yoy_post_slope_short': yoy_post_trend_short,
+            'yoy_pre_slope_full': yoy_pre_trend_full,
+            'yoy_post_slope_full': yoy_post_trend_full,
         }
+        slopes = TrendTools.calculate_slopes(list(trend_windows.values()))
+        trend_matrix = {k: s or np.nan for k, s in zip(trend_windows, slopes)}
         
         return {
             'absolute_matrix': abs_matrix,
             'trend_matrix': trend_matrix
         }
 
+    # 输出键顺序与 analyze_metric 一致
+    ABS_WINDOWS = ['pre_avg', 'post_avg', 'yoy_pre_avg', 'yoy_post_avg']
+    TREND_WINDOWS = ['pre_slope_short', 'post_slope_short', 'pre_slope_full', 'post_slope_full',
+                     'yoy_pre_slope_short', 'yoy_post_slope_short', 'yoy_pre_slope_full', 'yoy_post_slope_full']
+
+    @staticmethod
+    def plan_windows(cal, anchor_idx, window=3):
+        """
+        窗口只依赖 (日期轴, anchor, window)，对所有门店/指标相同：
+        一次性算出各窗口的列下标 (绝对值窗口已剔除节假日，趋势窗口保留全部)。
+        """
+        n = len(cal)
+        spans = {
+            'pre_short': (anchor_idx - window, anchor_idx),
+            'post_short': (anchor_idx + 1, anchor_idx + 1 + window),
+            'pre_full': (0, anchor_idx),
+            'post_full': (anchor_idx + 1, n),
+        }
+        for k in list(spans):
+            spans['yoy_' + k] = cal.aligned_yoy(*spans[k])
+        cols = lambda span, clean: cal.columns(*span, 'clean' if clean else 'full')
+
+        abs_cols = {
+            'pre_avg': cols(spans['pre_short'], True), 'post_avg': cols(spans['post_short'], True),
+            'yoy_pre_avg': cols(spans['yoy_pre_short'], True), 'yoy_post_avg': cols(spans['yoy_post_short'], True),
+        }
+        trend_cols = {
+            name: cols(spans[name.replace('_slope', '')], False) for name in ImpactAnalyzer.TREND_WINDOWS
+        }
+        return abs_cols, trend_cols
+
+    @staticmethod
+    def _panel_matrices(arr, abs_cols, trend_cols):
+        """arr: (序列数, 时间点)。返回 (绝对值指标 dict, 斜率指标 dict)，每项为 (序列数,) 数组。"""
+        abs_m = {}
+        for name, idx in abs_cols.items():
+            if len(idx) == 0:
+                abs_m[name] = np.full(arr.shape[0], np.nan)
+                continue
+            block = arr[:, idx]
+            cnt = (~np.isnan(block)).sum(axis=1)
+            with np.errstate(invalid='ignore', divide='ignore'):
+                abs_m[name] = np.where(cnt > 0, np.nansum(block, axis=1) / cnt, np.nan)
+
+        def pct(post, pre):
+            with np.errstate(invalid='ignore', divide='ignore'):
+                return np.where(~np.isnan(pre) & (pre != 0), (post - pre) / pre, np.nan)
+        abs_m['change_pct'] = pct(abs_m['post_avg'], abs_m['pre_avg'])
+        abs_m['yoy_change_pct'] = pct(abs_m['yoy_post_avg'], abs_m['yoy_pre_avg'])
+
+        # 8 个趋势窗口 × 全部序列 拼成一个补齐 NaN 的三维块，一次闭式拟合
+        width = max([len(idx) for idx in trend_cols.values()] + [2])
+        Y = np.full((len(trend_cols), arr.shape[0], width), np.nan)
+        for w, idx in enumerate(trend_cols.values()):
+            Y[w, :, :len(idx)] = arr[:, idx]
+        slopes = TrendTools.fit_lines(Y.reshape(-1, width))['slope'].reshape(len(trend_cols), arr.shape[0])
+        slopes[slopes == 0] = np.nan  # 与 analyze_metric 的 `slope or np.nan` 保持一致
+        trend_m = dict(zip(trend_cols, slopes))
+        return abs_m, trend_m
+
+    @staticmethod
+    def analyze_panel(panel, dates, anchor_date, window=3, stores=None, metrics=None, workers=None, chunk_size=2000,
+                      calendar=None):
+        """
+        多门店批量影响分析。
+        panel: (门店, 指标, 月份) 数组，或 {门店: {指标: 序列}} 字典。
+        返回 {门店: {指标: {'absolute_matrix', 'trend_matrix'}}}，与逐个调用 analyze_metric 结果一致。
+        workers > 1 且序列数超过 chunk_size 时按门店分块交给进程池。
+        """
+        if isinstance(panel, dict):
+            stores = list(panel.keys()) if stores is None else stores
+            metrics = sorted({m for v in panel.values() for m in v}) if metrics is None else metrics
+            arr = np.full((len(stores), len(metrics), len(dates)), np.nan)
+            for i, s in enumerate(stores):
+                for j, m in enumerate(metrics):
+                    if m in panel[s]: arr[i, j] = np.asarray(panel[s][m], dtype=float)
+        else:
+            arr = np.asarray(panel, dtype=float)
+        S, M, T = arr.shape
+        stores = list(range(S)) if stores is None else list(stores)
+        metrics = list(range(M)) if metrics is None else list(metrics)
+        if T != len(dates): raise ValueError("panel 的时间维与 dates 长度不一致")
+
+        cal = calendar if calendar is not None else EventTools.calendar_for(dates)
+        try:
+            anchor_idx = cal.index(anchor_date)
+        except ValueError:
+            return {"error": f"Anchor date {anchor_date} not found in dates."}
+        abs_cols, trend_cols = ImpactAnalyzer.plan_windows(cal, anchor_idx, window)
+
+        flat = arr.reshape(S * M, T)
+        if workers and workers > 1 and len(flat) > chunk_size:
+            chunks = [flat[i:i + chunk_size] for i in range(0, len(flat), chunk_size)]
+            with ProcessPoolExecutor(max_workers=workers) as pool:
+                parts = list(pool.map(ImpactAnalyzer._panel_matrices, chunks,
+                                      [abs_cols] * len(chunks), [trend_cols] * len(chunks)))
+            abs_m = {k: np.concatenate([p[0][k] for p in parts]) for k in parts[0][0]}
+            trend_m = {k: np.concatenate([p[1][k] for p in parts]) for k in parts[0][1]}
+        else:
+            abs_m, trend_m = ImpactAnalyzer._panel_matrices(flat, abs_cols, trend_cols)
+
+        results = {}
+        for i, s in enumerate(stores):
+            results[s] = {}
+            for j, m in enumerate(metrics):
+                r = i * M + j
+                results[s][m] = {
+                    'absolute_matrix': {k: v[r] for k, v in abs_m.items()},
+                    'trend_matrix': {k: v[r] for k, v in trend_m.items()}
+                }
+        return results
+
+
 # --- 6. Attribution ---
 class AttributionAnalyzer:
     @staticmethod
@@ -306,55 +825,199 @@ class AttributionAnalyzer:
 
 # --- 7. Visualization ---
 class ChartGenerator:
+    """
+    所有图表走 Agg 画布的面向对象 API (不依赖 pyplot 全局状态，可在无显示环境 / 子进程中渲染)。
+    单子图图表在同一进程内按图表类型复用 Figure/Axes，每次清空内容并恢复默认边距；
+    共享 x 轴的多子图图表每次新建 Figure (复用时 tight_layout 的布局状态会残留)。
+    """
+    _figures = {}
+
+    @staticmethod
+    def _figure(key, figsize, nrows=1, sharex=False, reuse=True):
+        entry = ChartGenerator._figures.get(key) if reuse else None
+        if entry is None:
+            fig = Figure(figsize=figsize)
+            FigureCanvasAgg(fig)
+            entry = (fig, list(fig.subplots(nrows, 1, sharex=sharex, squeeze=False)[:, 0]))
+            if reuse: ChartGenerator._figures[key] = entry
+        else:
+            fig, axes = entry
+            for ax in axes: ax.clear()
+            # tight_layout 会改写 subplotpars；复用前恢复默认边距，使重绘与新建 Figure 的结果一致
+            fig.subplots_adjust(**{k: matplotlib.rcParams[f'figure.subplot.{k}']
+                                   for k in ('left', 'right', 'bottom', 'top', 'wspace', 'hspace')})
+        return entry
+
+    @staticmethod
+    def _save(fig, output_path):
+        fig.tight_layout()
+        fig.savefig(output_path)
+
     @staticmethod
     def plot_multi_metric_trend(store_name, dates, metrics_data, anchor_date, outliers, output_path):
-        fig, axes = plt.subplots(len(metrics_data), 1, figsize=(10, 3 * len(metrics_data)), sharex=True)
-        if len(metrics_data) == 1: axes = [axes]
-        try: event_idx = dates.index(anchor_date)
-        except: event_idx = None
+        n = len(metrics_data)
+        fig, axes = ChartGenerator._figure(('multi_metric_trend', n), (10, 3 * n), n, sharex=True, reuse=False)
+        pos = {}
+        for i, d in enumerate(dates): pos.setdefault(d, i)
+        event_idx = pos.get(anchor_date)
         x = np.arange(len(dates))
         for i, (m_name, vals) in enumerate(metrics_data.items()):
             ax = axes[i]
             ax.plot(x, vals, marker='o', markersize=4, label=m_name)
-            if m_name in outliers:
-                for out in outliers[m_name]:
-                    try: ax.scatter(dates.index(out['date']), out['val'], color='red', s=50, zorder=5)
-                    except: pass
+            for out in outliers.get(m_name, []):
+                if out['date'] in pos: ax.scatter(pos[out['date']], out['val'], color='red', s=50, zorder=5)
             if event_idx: ax.axvline(event_idx, color='red', linestyle='--', alpha=0.7)
             ax.set_title(f"{store_name} - {m_name}")
             ax.grid(True, alpha=0.3)
             if i == 0: ax.legend()
-        plt.xticks(x[::3], dates[::3], rotation=45)
-        plt.tight_layout()
-        plt.savefig(output_path); plt.close()
+        axes[-1].set_xticks(x[::3], dates[::3], rotation=45)
+        ChartGenerator._save(fig, output_path)
     @staticmethod
     def plot_slope_scissors(store_name, curr_pre, curr_post, last_pre, last_post, bench_pre, bench_post, output_path):
-        plt.figure(figsize=(9, 6))
+        fig, (ax,) = ChartGenerator._figure(('slope_scissors', 1), (9, 6))
         if all(v is not None for v in [bench_pre, bench_post]):
-            plt.plot([0, 1], [bench_pre, bench_post], color='#1f77b4', linestyle='--', marker='s', label='Market')
+            ax.plot([0, 1], [bench_pre, bench_post], color='#1f77b4', linestyle='--', marker='s', label='Market')
         if all(v is not None for v in [last_pre, last_post]):
-            plt.plot([0, 1], [last_pre, last_post], color='gray', linestyle='--', marker='o', alpha=0.5, label='Last Year')
+            ax.plot([0, 1], [last_pre, last_post], color='gray', linestyle='--', marker='o', alpha=0.5, label='Last Year')
         if all(v is not None for v in [curr_pre, curr_post]):
-            plt.plot([0, 1], [curr_pre, curr_post], color='#d62728', linewidth=3, marker='o', label='Store (Curr)')
-        plt.xticks([0, 1], ['Pre', 'Post']); plt.title(f"{store_name}: Slope Scissors"); plt.legend(); plt.grid(True, alpha=0.3)
-        plt.tight_layout(); plt.savefig(output_path); plt.close()
+            ax.plot([0, 1], [curr_pre, curr_post], color='#d62728', linewidth=3, marker='o', label='Store (Curr)')
+        ax.set_xticks([0, 1], ['Pre', 'Post']); ax.set_title(f"{store_name}: Slope Scissors"); ax.legend(); ax.grid(True, alpha=0.3)
+        ChartGenerator._save(fig, output_path)
     @staticmethod
     def plot_butterfly_chart(df, output_path, title):
         if df.empty: return
-        plt.figure(figsize=(10, 6))
+        fig, (ax,) = ChartGenerator._figure(('butterfly', 1), (10, 6))
         df = df.sort_values('Abs_Change')
-        plt.barh(df['Category'], df['Abs_Change'], color=['green' if x>0 else 'red' for x in df['Abs_Change']])
-        plt.axvline(0, color='black', linewidth=0.8); plt.title(title); plt.grid(axis='x', alpha=0.3)
-        plt.tight_layout(); plt.savefig(output_path); plt.close()
+        ax.barh(df['Category'], df['Abs_Change'], color=['green' if x>0 else 'red' for x in df['Abs_Change']])
+        ax.axvline(0, color='black', linewidth=0.8); ax.set_title(title); ax.grid(axis='x', alpha=0.3)
+        ChartGenerator._save(fig, output_path)
     @staticmethod
     def plot_efficiency_quadrant(store_data, output_path):
-        plt.figure(figsize=(10, 8))
+        fig, (ax,) = ChartGenerator._figure(('efficiency_quadrant', 1), (10, 8))
         x, y, labels = [], [], []
         for s in store_data:
             x.append(s['metrics'].get('Traffic', {}).get('mom_pct', 0))
             y.append(s['metrics'].get('POS_Buyers', {}).get('mom_pct', 0))
             labels.append(s['name'])
-        plt.scatter(x, y, s=150, alpha=0.7); plt.axhline(0, color='black', ls='--'); plt.axvline(0, color='black', ls='--')
-        for i, txt in enumerate(labels): plt.annotate(txt, (x[i], y[i]))
-        plt.title("Efficiency Quadrant"); plt.xlabel("Traffic MoM%"); plt.ylabel("POS MoM%"); plt.grid(True, alpha=0.3)
-        plt.tight_layout(); plt.savefig(output_path); plt.close()
+        ax.scatter(x, y, s=150, alpha=0.7); ax.axhline(0, color='black', ls='--'); ax.axvline(0, color='black', ls='--')
+        for i, txt in enumerate(labels): ax.annotate(txt, (x[i], y[i]))
+        ax.set_title("Efficiency Quadrant"); ax.set_xlabel("Traffic MoM%"); ax.set_ylabel("POS MoM%"); ax.grid(True, alpha=0.3)
+        ChartGenerator._save(fig, output_path)
+
+    @staticmethod
+    def plot_trend_break(title_name, labels, values, predicted, event_idx, total_saved, trr, slope, output_path):
+        """批量趋势断点图：实际值 vs 事件前惯性趋势，事件后缺口着色。"""
+        fig, (ax,) = ChartGenerator._figure(('trend_break', 1), (12, 6))
+        x = np.arange(len(labels))
+        values, predicted = np.asarray(values, dtype=float), np.asarray(predicted, dtype=float)
+        ax.plot(x, values, 'o-', label='Actual Data', color='#1f77b4', linewidth=2.5)
+        ax.plot(x, predicted, '--', label=f'Inertia Trend (Slope={slope:.2f})', color='gray', alpha=0.7)
+        ax.axvline(x=event_idx, color='red', linestyle=':', linewidth=2, label='Intervention Event')
+        gap_label = f"{'Saved' if total_saved > 0 else 'Lost'}: {abs(total_saved):.0f}"
+        ax.fill_between(x[event_idx:], values[event_idx:], predicted[event_idx:], alpha=0.15,
+                        color='green' if total_saved > 0 else 'red', label=gap_label)
+        step = max(1, len(labels) // 12)
+        ax.set_xticks(x[::step], [str(l) for l in labels[::step]], rotation=45)
+        ax.set_title(f'Trend Break Analysis: {title_name}\nTRR (Trend Reversal Rate): {trr:.4f}', fontsize=14)
+        ax.legend(); ax.grid(True, linestyle='--', alpha=0.3)
+        ChartGenerator._save(fig, output_path)
+
+
+def _fingerprint(obj, h=None):
+    """图表输入的稳定哈希：DataFrame / ndarray 按内容，容器递归，其余按 repr。"""
+    h = h or hashlib.sha256()
+    if isinstance(obj, pd.DataFrame):
+        h.update(repr(list(obj.columns)).encode())
+        h.update(pd.util.hash_pandas_object(obj, index=True).values.tobytes())
+    elif isinstance(obj, np.ndarray):
+        h.update(str(obj.dtype).encode()); h.update(np.ascontiguousarray(obj).tobytes())
+    elif isinstance(obj, dict):
+        for k in sorted(obj, key=repr):
+            h.update(repr(k).encode()); _fingerprint(obj[k], h)
+    elif isinstance(obj, (list, tuple)):
+        h.update(b'[')
+        for v in obj: _fingerprint(v, h)
+        h.update(b']')
+    else:
+        h.update(repr(obj).encode())
+    return h
+
+
+def _render_chart_job(kind, kwargs, output_path):
+    t0 = time.perf_counter()
+    getattr(ChartGenerator, kind)(output_path=output_path, **kwargs)
+    return time.perf_counter() - t0
+
+
+class ChartRenderService:
+    """
+    批量图表渲染：进程池并行 (每个 worker 内复用 Figure)，输入数据与绘图代码均未变化且图片仍在时跳过。
+    job 为 dict: {'kind': ChartGenerator 方法名, 'kwargs': 除 output_path 外的参数, 'output_path': 图片路径}。
+    """
+    MANIFEST = ".chart_manifest.json"
+
+    def __init__(self, manifest_dir, workers=None, force=False):
+        self.workers = workers if workers is not None else (os.cpu_count() or 1)
+        self.force = force
+        os.makedirs(manifest_dir, exist_ok=True)
+        self.manifest_path = os.path.join(manifest_dir, self.MANIFEST)
+        self.manifest = {}
+        if os.path.exists(self.manifest_path):
+            try:
+                with open(self.manifest_path, 'r', encoding='utf-8') as f:
+                    self.manifest = json.load(f)
+            except ValueError:
+                self.manifest = {}
+
+    @staticmethod
+    def job_key(job):
+        h = _fingerprint([job['kind'], job.get('kwargs', {})])
+        # 绘图函数源码变更也应触发重绘
+        h.update(inspect.getsource(getattr(ChartGenerator, job['kind'])).encode())
+        return h.hexdigest()
+
+    def render(self, jobs):
+        summary = {'rendered': [], 'skipped': [], 'failed': {}, 'timings': {}, 'seconds': 0.0}
+        t_start = time.perf_counter()
+        pending = []
+        for job in jobs:
+            path = os.path.abspath(job['output_path'])
+            key = self.job_key(job)
+            if not self.force and self.manifest.get(path) == key and os.path.exists(path):
+                summary['skipped'].append(job['output_path'])
+            else:
+                pending.append((job, path, key))
+
+        def collect(job, path, key, get_seconds):
+            try:
+                summary['timings'][job['output_path']] = get_seconds()
+                summary['rendered'].append(job['output_path'])
+                self.manifest[path] = key
+            except Exception as e:
+                self.manifest.pop(path, None)
+                summary['failed'][job['output_path']] = f"{type(e).__name__}: {e}"
+
+        if self.workers > 1 and len(pending) > 1:
+            with ProcessPoolExecutor(max_workers=min(self.workers, len(pending))) as pool:
+                futures = {pool.submit(_render_chart_job, j['kind'], j.get('kwargs', {}), j['output_path']): (j, p, k)
+                           for j, p, k in pending}
+                for fut in as_completed(futures):
+                    collect(*futures[fut], fut.result)
+        else:
+            for j, p, k in pending:
+                collect(j, p, k, lambda: _render_chart_job(j['kind'], j.get('kwargs', {}), j['output_path']))
+
+        with open(self.manifest_path, 'w', encoding='utf-8') as f:
+            json.dump(self.manifest, f, ensure_ascii=False, indent=2)
+        summary['seconds'] = time.perf_counter() - t_start
+        return summary
+
+    @staticmethod
+    def print_summary(summary, top=10):
+        print(f">>> Charts rendered {len(summary['rendered'])} | skipped (unchanged) {len(summary['skipped'])} | "
+              f"failed {len(summary['failed'])} | {summary['seconds']:.2f}s")
+        by_kind = sorted(summary['timings'].items(), key=lambda x: x[1], reverse=True)[:top]
+        for path, sec in by_kind:
+            print(f"   {sec:7.3f}s  {path}")
+        for path, err in summary['failed'].items():
+            print(f"   ✗ {path}: {err}")
@@ -1,27 +1,350 @@
 import sys
+import os
 import re
+import json
+import argparse
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
 
-def audit_sql(sql_query):
+# 词法单元：字符串/注释/引号标识符整体成一个 token，其中的关键字不会被误判
+TOKEN_RE = re.compile(r"""
+     (?P<ws>\s+)
+    |(?P<line_comment>--[^\n]*)
+    |(?P<block_comment>/\*.*?\*/)
+    |(?P<unterminated>/\*.*\Z|'[^']*(?:''[^']*)*\Z|"[^"]*(?:""[^"]*)*\Z|`[^`]*\Z)
+    |(?P<string>'[^']*(?:''[^']*)*')
+    |(?P<qident>"[^"]*(?:""[^"]*)*"|`[^`]*`)
+    |(?P<number>\d+(?:\.\d*)?(?:[eE][-+]?\d+)?|\.\d+(?:[eE][-+]?\d+)?)
+    |(?P<word>[A-Za-z_][A-Za-z0-9_$]*)
+    |(?P<op><>|!=|<=|>=|\|\||::|[-+*/%=<>(),.;])
+    |(?P<other>.)
+""", re.S | re.X)
+SKIP_KINDS = {"ws", "line_comment", "block_comment"}
+
+DESTRUCTIVE = {"DROP", "TRUNCATE", "DELETE"}
+SET_OPERATORS = {"UNION", "INTERSECT", "EXCEPT", "MINUS"}
+CLAUSE_END = {"WHERE", "GROUP", "ORDER", "HAVING", "LIMIT", "QUALIFY", "WINDOW", "FETCH", "OFFSET"} | SET_OPERATORS
+COMPARISONS = {"=", "<", ">", "<=", ">=", "<>", "!=", "LIKE", "ILIKE", "IN", "BETWEEN", "IS"}
+# 后跟 "(" 但不是函数调用的关键字
+NON_FUNCTIONS = {"IN", "EXISTS", "AND", "OR", "NOT", "ON", "USING", "VALUES", "AS", "OVER", "ANY", "ALL",
+                 "SOME", "JOIN", "FROM", "WHERE", "SELECT", "WITH", "INTO", "TABLE", "BETWEEN", "IS", "LIKE"}
+SELECT_STAR_PREV = {"SELECT", "DISTINCT", "ALL", ","}
+
+SEVERITY_ORDER = {"CRITICAL": 0, "WARNING": 1, "ADVICE": 2}
+DEFAULT_CHUNK = 1024 * 1024
+# 流式切分时暂不确定的尾部 token 数 (数字指数部分最多向后看 3 个 token：1 e + 5)
+PENDING_TOKENS = 3
+
+# 兼容旧版输出的文案 (audit_sql 输出为 "[级别] 文案")
+MSG_DESTRUCTIVE = "发现潜在的破坏性操作 (DROP/TRUNCATE/DELETE)"
+MSG_SELECT_STAR = "建议避免使用 SELECT *，请明确列名以提高性能"
+MSG_NO_LIMIT = "未发现 LIMIT 限制，大数据量下可能导致超时"
+
+
+def _token(m):
+    kind, value = m.lastgroup, m.group(0)
+    return kind, value, value.upper() if kind == "word" else value, m.start()
+
+
+def tokenize(sql):
+    """返回有效 token 列表 [(kind, value, upper, pos)]，跳过空白与注释。"""
+    return [_token(m) for m in TOKEN_RE.finditer(sql) if m.lastgroup not in SKIP_KINDS]
+
+
+def iter_statements(stream, chunk_size=DEFAULT_CHUNK):
+    """
+    从文本流中按顶层 ';' 切分语句 (字符串/注释中的 ';' 不会误切)，逐条产出 (起始行号, 语句文本, tokens)。
+    只缓存尚未结束的最后一条语句，可处理任意大小的 .sql 文件。
+    词法分析增量进行：每块只切分新到达的尾部，已确定的 token 不再重复切分，超长语句也是线性时间。
+    """
+    buf, line = "", 1
+    tokens, resume = [], 0          # tokens 对应 buf[:resume]，已确定
+    while True:
+        chunk = stream.read(chunk_size)
+        eof = not chunk
+        buf += chunk
+        # 末尾几个 token 可能随后续输入改变 (单词/空白延长、未闭合的字符串或注释、1e+5 这类数字)，
+        # 暂不确定，留待下一块从其起点重新切分
+        first_new, held = len(tokens), deque()
+        for m in TOKEN_RE.finditer(buf, resume):
+            held.append(m)
+            if len(held) <= PENDING_TOKENS:
+                continue
+            m = held.popleft()
+            if m.lastgroup not in SKIP_KINDS:
+                tokens.append(_token(m))
+            resume = m.end()
+        if eof:
+            tokens.extend(_token(m) for m in held if m.lastgroup not in SKIP_KINDS)
+        cut = len(buf) if eof else None
+        if not eof:
+            for kind, value, _, pos in reversed(tokens[first_new:]):
+                if kind == "op" and value == ";":
+                    cut = pos + 1
+                    break
+        if cut:
+            # 行号增量累计，避免每条语句都从缓冲区开头数换行
+            start, stmt_tokens, n = 0, [], 0
+            for n, tok in enumerate(tokens):
+                if tok[3] >= cut:
+                    break
+                if tok[0] == "op" and tok[1] == ";":
+                    if stmt_tokens:
+                        yield line, buf[start:tok[3]], [(k, v, u, p - start) for k, v, u, p in stmt_tokens]
+                    line += buf.count("\n", start, tok[3] + 1)
+                    start, stmt_tokens = tok[3] + 1, []
+                else:
+                    stmt_tokens.append(tok)
+            else:
+                n = len(tokens)
+            if stmt_tokens:
+                yield line, buf[start:cut], [(k, v, u, p - start) for k, v, u, p in stmt_tokens]
+            line += buf.count("\n", start, cut)
+            tokens = [(k, v, u, p - cut) for k, v, u, p in tokens[n:]]
+            buf, resume = buf[cut:], resume - cut
+        if eof:
+            return
+
+
+def _finding(severity, rule, message, stmt_line, stmt_text, pos):
+    return {"severity": severity, "rule": rule, "message": message,
+            "line": stmt_line + stmt_text.count("\n", 0, pos)}
+
+
+def analyze_statement(tokens, stmt_text="", stmt_line=1):
+    """
+    单趟扫描一条语句的 token，按查询块 (每个 SELECT 及其括号层级) 跟踪子句状态：
+    破坏性操作、SELECT *、缺少 LIMIT、无过滤全表扫描、笛卡尔积、非 SARGable 谓词。
+    """
     findings = []
-    # 1. 检查危险操作
-    if re.search(r"\b(DROP|TRUNCATE|DELETE)\b", sql_query, re.I):
-        findings.append("[CRITICAL] 发现潜在的破坏性操作 (DROP/TRUNCATE/DELETE)")
-    
-    # 2. 检查 SELECT *
-    if re.search(r"SELECT\s+\*", sql_query, re.I):
-        findings.append("[WARNING] 建议避免使用 SELECT *，请明确列名以提高性能")
-    
-    # 3. 检查是否有限流
-    if not re.search(r"LIMIT\s+\d+", sql_query, re.I):
-        findings.append("[ADVICE] 未发现 LIMIT 限制，大数据量下可能导致超时")
-        
+    seen = set()
+
+    def add(severity, rule, message, pos):
+        if (rule, message) not in seen:
+            seen.add((rule, message))
+            findings.append(_finding(severity, rule, message, stmt_line, stmt_text, pos))
+
+    def close_block(block):
+        if block["pending_join"] is not None:
+            add("WARNING", "cartesian_join", "JOIN 缺少 ON/USING 条件，可能产生笛卡尔积", block["pending_join"])
+        if block["comma_join"] is not None and not block["has_where"]:
+            add("WARNING", "cartesian_join", "FROM 中逗号连接多表且无 WHERE 条件，将产生笛卡尔积", block["comma_join"])
+        if block["has_from"] and not block["has_where"] and not block["has_limit"]:
+            add("WARNING", "unbounded_scan", "查询块无 WHERE 过滤也无 LIMIT，可能全表扫描", block["pos"])
+
+    if not tokens:
+        return findings
+    first = tokens[0][2]
+    is_query = first in ("SELECT", "WITH") or (first == "(" and any(t[2] == "SELECT" for t in tokens[:8]))
+
+    depth = 0
+    blocks = []          # 查询块栈
+    paren_stack = []     # 每个 "(" 是否为 WHERE/ON 中的函数调用
+    top_where = top_limit = False
+    n = len(tokens)
+    for i, (kind, value, word, pos) in enumerate(tokens):
+        prev = tokens[i - 1][2] if i else None
+        block = blocks[-1] if blocks else None
+        at_block = block is not None and depth == block["depth"]
+
+        if kind == "op":
+            if value == "(":
+                func = (tokens[i - 1][1] if i and tokens[i - 1][0] == "word" and prev not in NON_FUNCTIONS else None)
+                in_filter = block is not None and block["clause"] in ("where", "on")
+                paren_stack.append(func if in_filter else None)
+                depth += 1
+            elif value == ")":
+                func = paren_stack.pop() if paren_stack else None
+                depth = max(0, depth - 1)
+                while blocks and blocks[-1]["depth"] > depth:
+                    close_block(blocks.pop())
+                nxt = tokens[i + 1][2] if i + 1 < n else None
+                if func and nxt in COMPARISONS:
+                    add("WARNING", "non_sargable", f"过滤条件中对列使用函数 {func.upper()}(...) 后比较，无法利用索引/分区裁剪", pos)
+            elif value == "*" and (prev in SELECT_STAR_PREV or (prev == "." and block is not None and block["clause"] == "select")):
+                add("WARNING", "select_star", MSG_SELECT_STAR, pos)
+            elif value == "," and at_block and block["clause"] == "from":
+                if block["comma_join"] is None:
+                    block["comma_join"] = pos
+            continue
+
+        if kind == "string":
+            if prev in ("LIKE", "ILIKE") and value.startswith("'%"):
+                add("WARNING", "non_sargable", "LIKE 以通配符 % 开头，无法利用索引", pos)
+            continue
+        if kind != "word":
+            continue
+
+        if word in DESTRUCTIVE:
+            add("CRITICAL", "destructive", MSG_DESTRUCTIVE, pos)
+
+        if depth == 0:
+            if word == "WHERE":
+                top_where = True
+            elif word in ("LIMIT", "TOP", "FETCH"):
+                top_limit = True
+
+        if word == "SELECT":
+            blocks.append({"depth": depth, "pos": pos, "clause": "select", "has_from": False, "has_where": False,
+                           "has_limit": False, "comma_join": None, "pending_join": None})
+            continue
+        if not at_block:
+            continue
+
+        if word == "FROM" and block["clause"] == "select":
+            block["clause"], block["has_from"] = "from", True
+        elif word == "JOIN":
+            if block["pending_join"] is not None:
+                add("WARNING", "cartesian_join", "JOIN 缺少 ON/USING 条件，可能产生笛卡尔积", block["pending_join"])
+            if prev == "CROSS":
+                add("WARNING", "cartesian_join", "CROSS JOIN 会产生笛卡尔积，请确认是否有意为之", pos)
+                block["pending_join"] = None
+            else:
+                block["pending_join"] = None if prev == "NATURAL" else pos
+            block["clause"] = "from"
+        elif word in ("ON", "USING") and block["clause"] == "from":
+            block["pending_join"] = None
+            block["clause"] = "on"
+        elif word in CLAUSE_END:
+            if block["pending_join"] is not None:
+                add("WARNING", "cartesian_join", "JOIN 缺少 ON/USING 条件，可能产生笛卡尔积", block["pending_join"])
+                block["pending_join"] = None
+            if word == "WHERE":
+                block["clause"], block["has_where"] = "where", True
+            elif word in ("LIMIT", "FETCH"):
+                block["clause"], block["has_limit"] = "limit", True
+            elif word in SET_OPERATORS:
+                close_block(blocks.pop())
+            else:
+                block["clause"] = "other"
+        elif word == "TOP" and prev in ("SELECT", "DISTINCT"):
+            block["has_limit"] = True
+        elif block["clause"] == "on" and word in ("LEFT", "RIGHT", "INNER", "FULL", "CROSS", "NATURAL", "OUTER"):
+            block["clause"] = "from"
+
+    while blocks:
+        close_block(blocks.pop())
+
+    # 语句级问题定位到首个 token (而非上一条语句的分号)
+    if first in ("UPDATE", "DELETE") and not top_where:
+        add("CRITICAL", "destructive", f"{first} 语句缺少 WHERE 条件，将影响全表", tokens[0][3])
+    if is_query and not top_limit:
+        add("ADVICE", "missing_limit", MSG_NO_LIMIT, tokens[0][3])
+
+    findings.sort(key=lambda f: (SEVERITY_ORDER[f["severity"]], f["line"]))
     return findings
 
+
+def audit_stream(stream, source="<stdin>", chunk_size=DEFAULT_CHUNK):
+    """流式审计一个 SQL 文本流，返回 {file, statements, findings}。"""
+    findings, count = [], 0
+    for stmt_line, stmt_text, tokens in iter_statements(stream, chunk_size):
+        count += 1
+        for f in analyze_statement(tokens, stmt_text, stmt_line):
+            f["statement"] = count
+            findings.append(f)
+    return {"file": source, "statements": count, "findings": findings}
+
+
+def audit_file(path, chunk_size=DEFAULT_CHUNK):
+    try:
+        with open(path, "r", encoding="utf-8", errors="ignore") as f:
+            return audit_stream(f, path, chunk_size)
+    except OSError as e:
+        return {"file": path, "statements": 0, "findings": [], "error": str(e)}
+
+
+def collect_sql_files(paths):
+    files = []
+    for p in paths:
+        if os.path.isdir(p):
+            for dirpath, _, filenames in os.walk(p):
+                files.extend(os.path.join(dirpath, n) for n in sorted(filenames) if n.lower().endswith(".sql"))
+        else:
+            files.append(p)
+    return files
+
+
+def audit_paths(paths, workers=None):
+    """
+    批量审计文件/目录 (递归 .sql)，多文件时按文件并行。
+    返回机器可读报告 {files: [...], summary: {...}}。
+    """
+    files = collect_sql_files(paths)
+    workers = workers if workers is not None else (os.cpu_count() or 1)
+    if workers > 1 and len(files) > 1:
+        with ProcessPoolExecutor(max_workers=min(workers, len(files))) as pool:
+            reports = list(pool.map(audit_file, files, chunksize=max(1, len(files) // (workers * 4))))
+    else:
+        reports = [audit_file(f) for f in files]
+
+    by_severity, by_rule = {}, {}
+    for r in reports:
+        for f in r["findings"]:
+            by_severity[f["severity"]] = by_severity.get(f["severity"], 0) + 1
+            by_rule[f["rule"]] = by_rule.get(f["rule"], 0) + 1
+    return {
+        "files": reports,
+        "summary": {
+            "files": len(reports),
+            "statements": sum(r["statements"] for r in reports),
+            "findings": sum(by_severity.values()),
+            "by_severity": by_severity,
+            "by_rule": by_rule,
+            "errors": [r["file"] for r in reports if r.get("error")]
+        }
+    }
+
+
+def audit_sql(sql_query):
+    """兼容旧接口：审计一段 SQL 文本 (可含多条语句)，返回去重后的提示文本列表。"""
+    messages = []
+    for stmt_line, stmt_text, tokens in iter_statements(_StringReader(sql_query)):
+        for f in analyze_statement(tokens, stmt_text, stmt_line):
+            msg = f"[{f['severity']}] {f['message']}"
+            if msg not in messages:
+                messages.append(msg)
+    return messages
+
+
+class _StringReader:
+    def __init__(self, text):
+        self._text = text
+
+    def read(self, size=-1):
+        text, self._text = self._text, ""
+        return text
+
+
 if __name__ == "__main__":
-    query = sys.stdin.read()
-    results = audit_sql(query)
-    if results:
-        print("
-".join(results))
+    parser = argparse.ArgumentParser(description="SQL 静态安全审计 (stdin 或 .sql 文件/目录)")
+    parser.add_argument("paths", nargs="*", help=".sql files or directories; stdin when omitted")
+    parser.add_argument("--workers", type=int, default=None, help="Parallel worker processes for multiple files")
+    parser.add_argument("--format", choices=["text", "json"], default=None, help="Output format (default: text for stdin, json for files)")
+    parser.add_argument("--output", default=None, help="Write the report to this path instead of stdout")
+    args = parser.parse_args()
+
+    if not args.paths and args.format != "json":
+        query = sys.stdin.read()
+        results = audit_sql(query)
+        if results:
+            print("\n".join(results))
+        else:
+            print("SQL 静态审计通过。")
+        sys.exit(0)
+
+    report = audit_paths(args.paths, args.workers) if args.paths else {
+        "files": [audit_stream(sys.stdin)], "summary": None}
+    if args.format == "text":
+        lines = []
+        for r in report["files"]:
+            for f in r["findings"]:
+                lines.append(f"{r['file']}:{f['line']}: [{f['severity']}] {f['rule']}: {f['message']}")
+        text = "\n".join(lines) or "SQL 静态审计通过。"
+    else:
+        text = json.dumps(report, ensure_ascii=False, indent=2)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(text)
     else:
-        print("SQL 静态审计通过。")
+        print(text)
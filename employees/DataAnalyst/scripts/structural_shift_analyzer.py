@@ -1,4 +1,5 @@
 import pandas as pd
+import numpy as np
 import matplotlib.pyplot as plt
 import argparse
 import os
@@ -8,6 +9,118 @@ plt.style.use('seaborn-v0_8-whitegrid')
 plt.rcParams['font.sans-serif'] = ['Arial Unicode MS', 'SimHei', 'PingFang SC']
 plt.rcParams['axes.unicode_minus'] = False
 
+def waterfall_frame(deltas, totals, pre_label, post_label, top_n=10):
+    """
+    生成瀑布图数据 (向量化，支持多个父节点同时计算)。
+    deltas: 列 parent / label / diff，已按父节点内 |diff| 降序排列。
+    totals: 以 parent 为索引，列 pre / post。
+    超过 top_n 个子项时，其余合并为 Others。
+    返回列: parent / order / label / type / value / start / end (start-end 即柱子的上下沿)。
+    """
+    d = deltas[['parent', 'label', 'diff']].copy()
+    d['rank'] = d.groupby('parent', sort=False).cumcount()
+    top = d[d['rank'] < top_n]
+    rest = d[d['rank'] >= top_n]
+
+    parts = [
+        pd.DataFrame({'parent': totals.index, 'order': -1, 'label': f"{pre_label} Total", 'type': 'Total', 'value': totals['pre'].to_numpy()}),
+        pd.DataFrame({'parent': top['parent'].to_numpy(), 'order': top['rank'].to_numpy(), 'label': top['label'].to_numpy(),
+                      'type': 'Delta', 'value': top['diff'].to_numpy()}),
+    ]
+    if not rest.empty:
+        others = rest.groupby('parent', sort=False)['diff'].sum()
+        parts.append(pd.DataFrame({'parent': others.index, 'order': top_n, 'label': 'Others', 'type': 'Delta', 'value': others.to_numpy()}))
+    parts.append(pd.DataFrame({'parent': totals.index, 'order': top_n + 1, 'label': f"{post_label} Total", 'type': 'Total', 'value': totals['post'].to_numpy()}))
+
+    wf = pd.concat(parts, ignore_index=True).sort_values(['parent', 'order'], kind='stable').reset_index(drop=True)
+    is_delta = (wf['type'] == 'Delta').to_numpy()
+    # 累计值：Pre Total 起步，逐个叠加变动；Post Total 不参与累计
+    carried = np.where(wf['order'].to_numpy() == top_n + 1, 0.0, wf['value'].to_numpy(dtype=float))
+    running = pd.Series(carried).groupby(wf['parent'].to_numpy(), sort=False).cumsum().to_numpy()
+    wf['start'] = np.where(is_delta, running - wf['value'].to_numpy(dtype=float), 0.0)
+    wf['end'] = np.where(is_delta, running, wf['value'].to_numpy(dtype=float))
+    wf['order'] = wf.groupby('parent', sort=False).cumcount()
+    return wf
+
+
+def _safe_div(a, b):
+    with np.errstate(invalid='ignore', divide='ignore'):
+        return np.where(b != 0, a / np.where(b != 0, b, 1), np.nan)
+
+
+def decompose_structural_shift(df, period_col, levels, value_col, period_pairs, volume_col=None, top_n=10):
+    """
+    多层级 × 多期对 的结构变迁分解。
+    - 明细层只做一次 groupby，上层由明细宽表逐级汇总。
+    - 每个节点相对其父节点计算 变动 / 贡献度；提供 volume_col 时再拆分为
+      量效应 (父节点总量变化) + 结构效应 (份额变化) + 价效应 (单位价值变化)，三者之和等于变动。
+    返回 (分解明细表, 瀑布图数据表)，两表均带 pair / level 列。
+    """
+    levels = list(levels)
+    measures = [value_col] + ([volume_col] if volume_col else [])
+    periods = list(dict.fromkeys(p for pair in period_pairs for p in pair))
+    sub = df[df[period_col].isin(periods)]
+    missing = [p for p in periods if p not in set(sub[period_col].unique())]
+    if missing:
+        raise ValueError(f"Periods not found in data: {missing}")
+
+    wide = sub.groupby(levels + [period_col], sort=False, observed=True)[measures].sum().unstack(period_col, fill_value=0)
+
+    decomp_parts, waterfall_parts = [], []
+    for depth in range(1, len(levels) + 1):
+        lv = levels[:depth]
+        tbl = wide if depth == len(levels) else wide.groupby(level=lv, sort=False).sum()
+        keys = tbl.index.to_frame(index=False)
+        keys.columns = lv
+        if depth > 1:
+            # 按列拼接父路径 (逐列向量化，避免逐行 apply)
+            path = keys[lv[0]].astype(str)
+            for c in lv[1:-1]:
+                path = path + ' / ' + keys[c].astype(str)
+            parent = path.to_numpy()
+        else:
+            parent = np.full(len(keys), 'Total', dtype=object)
+        pid = pd.factorize(parent)[0]
+
+        for pre, post in period_pairs:
+            v_pre = tbl[(value_col, pre)].to_numpy(dtype=float)
+            v_post = tbl[(value_col, post)].to_numpy(dtype=float)
+            P_pre, P_post = np.bincount(pid, v_pre)[pid], np.bincount(pid, v_post)[pid]
+            diff = v_post - v_pre
+            out = keys.copy()
+            out.insert(0, 'level', lv[-1]); out.insert(0, 'pair', f"{pre}->{post}")
+            out['parent'] = parent
+            out['label'] = keys[lv[-1]].to_numpy()
+            out['Pre'], out['Post'], out['Diff'] = v_pre, v_post, diff
+            out['Abs_Diff'] = np.abs(diff)
+            out['Pct_Change'] = _safe_div(diff, v_pre)
+            out['Contribution'] = _safe_div(diff, P_post - P_pre)
+
+            if volume_col:
+                q_pre = tbl[(volume_col, pre)].to_numpy(dtype=float)
+                q_post = tbl[(volume_col, post)].to_numpy(dtype=float)
+                Q_pre, Q_post = np.bincount(pid, q_pre)[pid], np.bincount(pid, q_post)[pid]
+                s_pre, s_post = np.nan_to_num(_safe_div(q_pre, Q_pre)), np.nan_to_num(_safe_div(q_post, Q_post))
+                r_pre_raw, r_post_raw = _safe_div(v_pre, q_pre), _safe_div(v_post, q_post)
+                # 新增/退出的子项没有一侧的单价：以另一侧单价补齐，使其变动全部计入结构效应
+                r_pre = np.nan_to_num(np.where(np.isnan(r_pre_raw), r_post_raw, r_pre_raw))
+                r_post = np.nan_to_num(np.where(np.isnan(r_post_raw), r_pre, r_post_raw))
+                out['Volume_Effect'] = (Q_post - Q_pre) * s_pre * r_pre
+                out['Mix_Effect'] = Q_post * (s_post - s_pre) * r_pre
+                out['Rate_Effect'] = Q_post * s_post * (r_post - r_pre)
+                out['Residual'] = diff - out['Volume_Effect'] - out['Mix_Effect'] - out['Rate_Effect']
+
+            out = out.sort_values(['parent', 'Abs_Diff'], ascending=[True, False], kind='stable')
+            decomp_parts.append(out)
+
+            totals = out.groupby('parent', sort=False)[['Pre', 'Post']].sum().rename(columns={'Pre': 'pre', 'Post': 'post'})
+            wf = waterfall_frame(out.rename(columns={'Diff': 'diff'}), totals, pre, post, top_n)
+            wf.insert(0, 'level', lv[-1]); wf.insert(0, 'pair', f"{pre}->{post}")
+            waterfall_parts.append(wf)
+
+    return pd.concat(decomp_parts, ignore_index=True), pd.concat(waterfall_parts, ignore_index=True)
+
+
 def analyze_structural_shift(input_file, period_col, category_col, value_col, pre_label, post_label, output_dir):
     """
     结构变迁分析工具：生成瀑布图和贡献度表
@@ -66,74 +179,34 @@ def analyze_structural_shift(input_file, period_col, category_col, value_col, pr
     
     # 为了图表清晰，只取 Top 10 变动最大的，其他的归为 "Others"
     top_n = 10
-    if len(pivot) > top_n:
-        top_cats = pivot.iloc[:top_n]
-        others_diff = pivot.iloc[top_n:]['Diff'].sum()
-        
-        # 构建绘图数据
-        plot_data = []
-        plot_data.append({'Label': f"{pre_label} Total", 'Value': total_pre, 'Type': 'Total'})
-        
-        for cat, row in top_cats.iterrows():
-            plot_data.append({'Label': cat, 'Value': row['Diff'], 'Type': 'Delta'})
-            
-        plot_data.append({'Label': 'Others', 'Value': others_diff, 'Type': 'Delta'})
-        plot_data.append({'Label': f"{post_label} Total", 'Value': total_post, 'Type': 'Total'})
-        
-    else:
-        # 少于 10 个，全部展示
-        plot_data = []
-        plot_data.append({'Label': f"{pre_label} Total", 'Value': total_pre, 'Type': 'Total'})
-        
-        for cat, row in pivot.iterrows():
-            plot_data.append({'Label': cat, 'Value': row['Diff'], 'Type': 'Delta'})
-            
-        plot_data.append({'Label': f"{post_label} Total", 'Value': total_post, 'Type': 'Total'})
+    deltas = pd.DataFrame({'parent': 0, 'label': pivot.index, 'diff': pivot['Diff'].to_numpy()})
+    totals = pd.DataFrame({'pre': [total_pre], 'post': [total_post]}, index=[0])
+    wf = waterfall_frame(deltas, totals, pre_label, post_label, top_n)
         
     # 绘制瀑布图
     plt.figure(figsize=(14, 8))
     
-    # 计算每个柱子的底部位置 (running total)
-    running_total = 0
-    xticks = []
-    xlabels = []
+    x = np.arange(len(wf))
+    vals = wf['value'].to_numpy(dtype=float)
+    is_delta = (wf['type'] == 'Delta').to_numpy()
+    # 瀑布图的核心：柱子悬空，底部为 start/end 中较小者
+    bottoms = np.minimum(wf['start'], wf['end']).to_numpy()
+    tops = np.maximum(wf['start'], wf['end']).to_numpy()
     
     # 第一个柱子：Pre Total
-    plt.bar(0, plot_data[0]['Value'], color='gray', label='Total')
-    running_total = plot_data[0]['Value']
-    xticks.append(0)
-    xlabels.append(plot_data[0]['Label'])
+    plt.bar(0, vals[0], color='gray', label='Total')
     
     # 中间的柱子
-    for i, item in enumerate(plot_data[1:-1]):
-        val = item['Value']
-        x = i + 1
-        color = 'green' if val >= 0 else 'red'
-        
-        # 瀑布图的核心：柱子悬空
-        # 如果是正增长，底部是之前的 total
-        # 如果是负增长，顶部是之前的 total (所以底部是 total + val)
-        if val >= 0:
-            bottom = running_total
-        else:
-            bottom = running_total + val
-            
-        plt.bar(x, abs(val), bottom=bottom, color=color)
-        
-        # 更新 running total
-        running_total += val
-        
-        xticks.append(x)
-        xlabels.append(item['Label'])
-        
-        # 标注数值
-        plt.text(x, bottom + abs(val) + (total_pre * 0.01), f"{val:+.0f}", ha='center', fontsize=9)
+    plt.bar(x[is_delta], np.abs(vals[is_delta]), bottom=bottoms[is_delta],
+            color=np.where(vals[is_delta] >= 0, 'green', 'red'))
+    # 标注数值
+    for xi, val, top in zip(x[is_delta], vals[is_delta], tops[is_delta]):
+        plt.text(xi, top + (total_pre * 0.01), f"{val:+.0f}", ha='center', fontsize=9)
         
     # 最后一个柱子：Post Total
-    last_idx = len(plot_data) - 1
-    plt.bar(last_idx, plot_data[-1]['Value'], color='gray')
-    xticks.append(last_idx)
-    xlabels.append(plot_data[-1]['Label'])
+    last_idx = len(wf) - 1
+    plt.bar(last_idx, vals[-1], color='gray')
+    xticks, xlabels = list(x), list(wf['label'])
     
     # 画连接线
     # (省略复杂连接线，保持简洁)
@@ -166,16 +239,56 @@ def analyze_structural_shift(input_file, period_col, category_col, value_col, pr
             
     print("Analysis complete.")
 
+def run_decomposition(input_file, period_col, levels, value_col, period_pairs, output_dir, volume_col=None, top_n=10):
+    """多层级 / 多期对 模式：输出分解明细表与瀑布图数据表。"""
+    os.makedirs(output_dir, exist_ok=True)
+    print(f"Loading data from {input_file}...")
+    df = pd.read_parquet(input_file) if input_file.endswith('.parquet') else pd.read_csv(input_file)
+    # 命令行传入的期间标签均为字符串，期间列统一按字符串匹配
+    df[period_col] = df[period_col].astype(str)
+    decomp, waterfall = decompose_structural_shift(df, period_col, levels, value_col, period_pairs, volume_col, top_n)
+
+    out_decomp = os.path.join(output_dir, 'structural_shift_decomposition.csv')
+    out_wf = os.path.join(output_dir, 'structural_shift_waterfall_data.csv')
+    decomp.to_csv(out_decomp, index=False, encoding='utf-8-sig')
+    waterfall.to_csv(out_wf, index=False, encoding='utf-8-sig')
+    print(f"Decomposition ({len(decomp):,} nodes) saved to {out_decomp}")
+    print(f"Waterfall data saved to {out_wf}")
+
+    top = decomp[decomp['level'] == levels[0]]
+    for pair, g in top.groupby('pair', sort=False):
+        print(f"\n--- {pair}: Top Contributors ({levels[0]}) ---")
+        print(g[['label', 'Pre', 'Post', 'Diff', 'Contribution']].head().to_string(index=False))
+    return decomp, waterfall
+
 if __name__ == "__main__":
     parser = argparse.ArgumentParser(description='Structural Shift Analyzer')
     parser.add_argument('--input', required=True, help='Path to CSV file (Long Format)')
     parser.add_argument('--period_col', required=True, help='Column name for Period (e.g., Year, Month)')
-    parser.add_argument('--category_col', required=True, help='Column name for Category/Segment')
+    parser.add_argument('--category_col', help='Column name for Category/Segment (single-level mode)')
     parser.add_argument('--value_col', required=True, help='Column name for Value (e.g., Traffic, Sales)')
-    parser.add_argument('--pre_label', required=True, help='Label of the Pre period (e.g., "2024")')
-    parser.add_argument('--post_label', required=True, help='Label of the Post period (e.g., "2025")')
+    parser.add_argument('--pre_label', help='Label of the Pre period (e.g., "2024")')
+    parser.add_argument('--post_label', help='Label of the Post period (e.g., "2025")')
     parser.add_argument('--output', required=True, help='Output directory')
+    # 多层级 / 多期对 模式
+    parser.add_argument('--levels', help='Comma-separated category hierarchy, e.g. "channel,小类编码,商品编码"')
+    parser.add_argument('--pairs', help='Comma-separated period pairs "pre:post", e.g. "2024:2025,2025-01:2025-02"')
+    parser.add_argument('--volume_col', help='Volume column for mix/rate decomposition (e.g., 销售数量)')
+    parser.add_argument('--top_n', type=int, default=10, help='Waterfall bars per parent before grouping into Others')
     
     args = parser.parse_args()
     
-    analyze_structural_shift(args.input, args.period_col, args.category_col, args.value_col, args.pre_label, args.post_label, args.output)
+    if args.levels or args.pairs:
+        levels = [c.strip() for c in (args.levels or args.category_col or '').split(',') if c.strip()]
+        if args.pairs:
+            pairs = [tuple(p.split(':', 1)) for p in args.pairs.split(',')]
+        elif args.pre_label and args.post_label:
+            pairs = [(args.pre_label, args.post_label)]
+        else:
+            parser.error('--pairs (or --pre_label/--post_label) is required')
+        if not levels: parser.error('--levels (or --category_col) is required')
+        run_decomposition(args.input, args.period_col, levels, args.value_col, pairs, args.output, args.volume_col, args.top_n)
+    else:
+        if not all([args.category_col, args.pre_label, args.post_label]):
+            parser.error('single-level mode requires --category_col, --pre_label and --post_label')
+        analyze_structural_shift(args.input, args.period_col, args.category_col, args.value_col, args.pre_label, args.post_label, args.output)
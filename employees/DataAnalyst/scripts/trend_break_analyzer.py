@@ -1,9 +1,11 @@
 import pandas as pd
 import numpy as np
 import matplotlib.pyplot as plt
-from sklearn.linear_model import LinearRegression
 import argparse
 import os
+import re
+
+from eda_toolkit import TrendTools, ChartRenderService
 
 # 设置绘图风格
 plt.style.use('seaborn-v0_8-whitegrid')
@@ -54,22 +56,17 @@ def analyze_trend_break(file_path, date_col, value_col, event_date, output_dir,
         print("Error: Not enough data points before event to fit a trend.")
         return
 
-    X_fit = fit_data['dt_numeric'].values.reshape(-1, 1)
-    y_fit = fit_data[value_col].values
-    
-    model = LinearRegression()
-    model.fit(X_fit, y_fit)
-    
-    slope = model.coef_[0]
-    intercept = model.intercept_
-    r_squared = model.score(X_fit, y_fit)
+    # 小窗口直接用闭式 OLS，省去 sklearn 模型构建开销
+    fit = TrendTools.fit_lines(fit_data[value_col].values, fit_data['dt_numeric'].values)
+    slope = fit['slope'][0]
+    intercept = fit['intercept'][0]
+    r_squared = fit['r2'][0]
     
     print(f"Pre-event Trend Slope: {slope:.4f}")
     print(f"Model R^2: {r_squared:.4f}")
 
     # 预测 (Project) - 预测范围：从拟合开始到数据结束
-    X_all = df['dt_numeric'].values.reshape(-1, 1)
-    df['predicted_inertia'] = model.predict(X_all)
+    df['predicted_inertia'] = intercept + slope * df['dt_numeric'].values
     
     # 计算 Post-Event 的统计量
     post_data = df.iloc[event_idx:]
@@ -83,11 +80,7 @@ def analyze_trend_break(file_path, date_col, value_col, event_date, output_dir,
         # Trend Reversal Rate (TRR)
         # Fit a new line for post data
         if len(post_data) >= 2:
-            X_post = post_data['dt_numeric'].values.reshape(-1, 1)
-            y_post = post_data[value_col].values
-            model_post = LinearRegression()
-            model_post.fit(X_post, y_post)
-            slope_post = model_post.coef_[0]
+            slope_post = TrendTools.fit_lines(post_data[value_col].values, post_data['dt_numeric'].values)['slope'][0]
             trr = slope_post - slope
         else:
             slope_post = np.nan
@@ -145,15 +138,176 @@ def analyze_trend_break(file_path, date_col, value_col, event_date, output_dir,
         
     print("Analysis complete.")
 
+RESULT_COLUMNS = ['event_date', 'event_index', 'n_points', 'pre_slope', 'pre_intercept', 'pre_r2',
+                  'post_slope', 'trr', 'total_saved', 'avg_saved', 'status']
+
+
+def _read_table(path):
+    return pd.read_parquet(path) if path.endswith('.parquet') else pd.read_csv(path)
+
+
+def compute_trend_breaks(panel, events, entity_col='entity', metric_col='metric', date_col='date',
+                         value_col='value', event_col='event_date', window_months=6, return_series=False):
+    """
+    批量趋势断点：对长表 (entity, metric, date, value) 中每个 实体-指标 序列，
+    一次性完成 事件前惯性拟合 / 缺口 (Saved/Lost) / 事件后斜率 / TRR。
+    events 至少包含 entity_col 与 event_col，可选 metric_col (按指标指定事件)。
+    口径与 analyze_trend_break 一致：数值型日期直接作为 x 并精确匹配事件，否则按时间排序后用序号，事件取最近日期。
+    """
+    keys = [entity_col, metric_col]
+    missing = [c for c in keys + [date_col, value_col] if c not in panel.columns]
+    if missing:
+        raise ValueError(f"Panel is missing columns: {missing}")
+    missing = [c for c in (entity_col, event_col) if c not in events.columns]
+    if missing:
+        raise ValueError(f"Events table is missing columns: {missing}")
+    on = [c for c in keys if c in events.columns]
+    events = events[on + [event_col]].drop_duplicates()
+    conflicts = events[events.duplicated(on, keep=False)]
+    if not conflicts.empty:
+        sample = conflicts.groupby(on, sort=False)[event_col].agg(list).head(5).to_dict()
+        raise ValueError(f"{conflicts.groupby(on).ngroups} series have more than one event date "
+                         f"(one event per series expected), e.g. {sample}")
+
+    df = panel[keys + [date_col, value_col]].copy()
+    # datetime64 列也能被 to_numeric 转成纳秒整数，只对 object / 数值列尝试数值口径
+    is_numeric_date = False
+    if not pd.api.types.is_datetime64_any_dtype(df[date_col]):
+        numeric = pd.to_numeric(df[date_col], errors='coerce')
+        is_numeric_date = bool(numeric.notna().all())
+    df['_t'] = numeric if is_numeric_date else pd.to_datetime(df[date_col])
+    df = df.sort_values(keys + ['_t'], kind='stable')
+
+    df = df.merge(events, on=on, how='inner')
+    if df.empty:
+        return pd.DataFrame(columns=keys + RESULT_COLUMNS)
+
+    grouped = df.groupby(keys, sort=False)
+    df['_g'] = grouped.ngroup()
+    df['_pos'] = grouped.cumcount()
+    df['_x'] = df['_t'].astype(float) if is_numeric_date else df['_pos'].astype(float)
+
+    # 事件位置：数值日期精确匹配，日期型取最近的一期
+    if is_numeric_date:
+        hit = df['_t'] == pd.to_numeric(df[event_col], errors='coerce')
+        event_pos = df[hit].groupby('_g')['_pos'].first()
+    else:
+        # 事件日期缺失的序列没有候选位置，保持 E=-1 (event_not_found)
+        dist = (df['_t'] - pd.to_datetime(df[event_col])).abs().dropna()
+        event_pos = df.loc[dist.groupby(df.loc[dist.index, '_g']).idxmin(), ['_g', '_pos']].set_index('_g')['_pos']
+
+    G, L = int(df['_g'].max()) + 1, int(df['_pos'].max()) + 1
+    Y = np.full((G, L), np.nan); X = np.full((G, L), np.nan)
+    g, pos = df['_g'].to_numpy(), df['_pos'].to_numpy()
+    Y[g, pos] = df[value_col].to_numpy(dtype=float)
+    X[g, pos] = df['_x'].to_numpy()
+    n_points = np.bincount(g, minlength=G)
+    E = np.full(G, -1, dtype=int)
+    E[event_pos.index.to_numpy()] = event_pos.to_numpy()
+
+    P = np.arange(L)[None, :]
+    present = P < n_points[:, None]
+    pre_mask = present & (P >= (E - window_months)[:, None]) & (P < E[:, None])
+    post_mask = present & (P >= E[:, None]) & (E[:, None] >= 0)
+
+    pre = TrendTools.fit_lines(np.where(pre_mask, Y, np.nan), np.where(pre_mask, X, np.nan))
+    predicted = pre['intercept'][:, None] + pre['slope'][:, None] * X
+    diff = np.where(post_mask, Y - predicted, np.nan)
+    n_post = (~np.isnan(diff)).sum(axis=1)
+    total_saved = np.where(n_post > 0, np.nansum(diff, axis=1), 0.0)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        avg_saved = np.where(n_post > 0, total_saved / n_post, np.nan)
+    post_slope = TrendTools.fit_lines(np.where(post_mask, Y, np.nan), np.where(post_mask, X, np.nan))['slope']
+
+    status = np.where(E < 0, 'event_not_found', np.where(pre_mask.sum(axis=1) < 2, 'insufficient_pre', 'ok'))
+    ok = status == 'ok'
+    first = df.drop_duplicates('_g').set_index('_g').sort_index()
+    result = pd.DataFrame({
+        entity_col: first[entity_col].to_numpy(),
+        metric_col: first[metric_col].to_numpy(),
+        'event_date': first[event_col].to_numpy(),
+        'event_index': E,
+        'n_points': n_points,
+        'pre_slope': np.where(ok, pre['slope'], np.nan),
+        'pre_intercept': np.where(ok, pre['intercept'], np.nan),
+        'pre_r2': np.where(ok, pre['r2'], np.nan),
+        'post_slope': np.where(ok, post_slope, np.nan),
+        'trr': np.where(ok, post_slope - pre['slope'], np.nan),
+        'total_saved': np.where(ok, total_saved, np.nan),
+        'avg_saved': np.where(ok, avg_saved, np.nan),
+        'status': status,
+    })
+    if not return_series:
+        return result
+    labels = df.groupby('_g', sort=True)[date_col].agg(list).tolist()
+    return result, {'Y': Y, 'predicted': predicted, 'labels': labels}
+
+
+def analyze_trend_break_batch(panel_path, events_path, output_dir, entity_col='entity', metric_col='metric',
+                              date_col='date', value_col='value', event_col='event_date', window_months=6,
+                              fmt='csv', charts=False, workers=None):
+    """批量模式：读取长表与事件表，输出一张汇总结果表，可选并行出图 (未变化的图跳过)。"""
+    panel, events = _read_table(panel_path), _read_table(events_path)
+    print(f"Loaded {len(panel):,} rows, {len(events):,} events")
+    result, series = compute_trend_breaks(panel, events, entity_col, metric_col, date_col, value_col,
+                                          event_col, window_months, return_series=True)
+    os.makedirs(output_dir, exist_ok=True)
+    out_file = os.path.join(output_dir, f'trend_break_results.{fmt}')
+    if fmt == 'parquet':
+        result.to_parquet(out_file, index=False)
+    else:
+        result.to_csv(out_file, index=False, encoding='utf-8-sig')
+    print(f"{int((result['status'] == 'ok').sum())}/{len(result)} series analysed -> {out_file}")
+
+    if charts:
+        chart_dir = os.path.join(output_dir, 'charts')
+        jobs = []
+        for i, row in enumerate(result.itertuples(index=False)):
+            if row.status != 'ok': continue
+            n = int(row.n_points)
+            name = f"{getattr(row, entity_col)} - {getattr(row, metric_col)}"
+            jobs.append({
+                'kind': 'plot_trend_break',
+                'kwargs': dict(title_name=name, labels=series['labels'][i], values=series['Y'][i, :n],
+                               predicted=series['predicted'][i, :n], event_idx=int(row.event_index),
+                               total_saved=float(row.total_saved), trr=float(row.trr), slope=float(row.pre_slope)),
+                'output_path': os.path.join(chart_dir, re.sub(r'[\\/:*?"<>|\s]+', '_', f"trend_break_{name}") + '.png'),
+            })
+        os.makedirs(chart_dir, exist_ok=True)
+        summary = ChartRenderService(chart_dir, workers=workers).render(jobs)
+        ChartRenderService.print_summary(summary)
+    return result
+
+
 if __name__ == "__main__":
     parser = argparse.ArgumentParser(description='General Trend Break Analyzer')
-    parser.add_argument('--input', required=True, help='Path to CSV file')
-    parser.add_argument('--date_col', required=True, help='Column name for date/time')
-    parser.add_argument('--value_col', required=True, help='Column name for metric value')
-    parser.add_argument('--event_date', required=True, help='Value in date_col representing the event')
+    parser.add_argument('--input', help='Path to CSV file (single-series mode)')
+    parser.add_argument('--date_col', help='Column name for date/time')
+    parser.add_argument('--value_col', help='Column name for metric value')
+    parser.add_argument('--event_date', help='Value in date_col representing the event (single-series mode)')
     parser.add_argument('--output', required=True, help='Output directory')
     parser.add_argument('--window', type=int, default=6, help='Months/periods to fit before event')
+    # 批量模式
+    parser.add_argument('--panel', help='Long-format panel CSV/Parquet: entity, metric, date, value (batch mode)')
+    parser.add_argument('--events', help='Events CSV/Parquet: entity[, metric], event_date (batch mode)')
+    parser.add_argument('--entity_col', default='entity')
+    parser.add_argument('--metric_col', default='metric')
+    parser.add_argument('--event_col', default='event_date')
+    parser.add_argument('--format', choices=['csv', 'parquet'], default='csv', help='Batch result table format (parquet requires pyarrow)')
+    parser.add_argument('--charts', action='store_true', help='Render one chart per series (batch mode)')
+    parser.add_argument('--workers', type=int, default=None, help='Chart rendering processes (default: CPU count)')
     
     args = parser.parse_args()
     
-    analyze_trend_break(args.input, args.date_col, args.value_col, args.event_date, args.output, args.window)
+    if args.panel:
+        if not args.events: parser.error('--panel requires --events')
+        try:
+            analyze_trend_break_batch(args.panel, args.events, args.output, args.entity_col, args.metric_col,
+                                      args.date_col or 'date', args.value_col or 'value', args.event_col,
+                                      args.window, args.format, args.charts, args.workers)
+        except ValueError as e:
+            parser.error(str(e))
+    else:
+        if not all([args.input, args.date_col, args.value_col, args.event_date]):
+            parser.error('single-series mode requires --input, --date_col, --value_col and --event_date')
+        analyze_trend_break(args.input, args.date_col, args.value_col, args.event_date, args.output, args.window)
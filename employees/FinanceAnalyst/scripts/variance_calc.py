@@ -1,5 +1,16 @@
 import sys
+import os
 import json
+import argparse
+
+import numpy as np
+import pandas as pd
+
+DEFAULT_KEYS = ['cost_center', 'account', 'month']
+DEFAULT_CHUNKSIZE = 1_000_000
+# 分块聚合时，累计的部分结果超过该行数即合并一次，控制内存
+COMPACT_ROWS = 5_000_000
+
 
 def calculate_variance(actual, budget):
     variance = actual - budget
@@ -11,7 +22,176 @@ def calculate_variance(actual, budget):
         "status": status
     }
 
+
+def _variance_columns(df, revenue_mask=None):
+    """
+    向量化计算差异列 (口径同 calculate_variance)：
+    abs_variance = actual - budget；预算为 0 时百分比记 0；成本类差异 <= 0 为有利，收入类反之。
+    """
+    actual = df['actual'].to_numpy(dtype=float)
+    budget = df['budget'].to_numpy(dtype=float)
+    variance = actual - budget
+    with np.errstate(divide='ignore', invalid='ignore'):
+        percent = np.where(budget != 0, variance / budget * 100, 0.0)
+    favorable = variance <= 0
+    if revenue_mask is not None:
+        favorable = np.where(revenue_mask, variance >= 0, favorable)
+
+    out = df.copy()
+    out['abs_variance'] = np.round(variance, 2)
+    out['percent_variance'] = np.round(percent, 2)
+    out['status'] = np.where(favorable, 'FAVORABLE', 'UNFAVORABLE')
+    return out
+
+
+def _read_chunks(path, keys, value_col, chunksize):
+    """
+    CSV 按 chunksize 分块读取；Parquet 按 row group 批次读取 (需要 pyarrow)。
+    键列一律读为字符串，避免逐块类型推断使同一科目在不同块/文件中成为 4001 与 '4001'。
+    """
+    columns = keys + [value_col]
+    if path.endswith('.parquet'):
+        import pyarrow.parquet as pq
+        for batch in pq.ParquetFile(path).iter_batches(batch_size=chunksize, columns=columns):
+            chunk = batch.to_pandas()
+            for k in keys:
+                chunk[k] = chunk[k].astype(str).where(chunk[k].notna(), None)
+            yield chunk
+    else:
+        yield from pd.read_csv(path, usecols=columns, chunksize=chunksize, dtype={k: str for k in keys})
+
+
+def aggregate_ledger(path, keys, value_col, chunksize=DEFAULT_CHUNKSIZE, stats=None):
+    """
+    流式读取明细账并按 keys 汇总金额：每块先 groupby-sum，部分结果累计到阈值后再合并，
+    内存只与 (块大小 + 键的基数) 相关，与账本总行数无关。
+    键缺失的行保留为 NaN 键参与汇总 (不静默丢弃)，行数记入 stats['missing_key_rows']。
+    """
+    partials, pending_rows = [], 0
+    if stats is not None:
+        stats.setdefault('missing_key_rows', 0)
+    for chunk in _read_chunks(path, keys, value_col, chunksize):
+        chunk[value_col] = pd.to_numeric(chunk[value_col], errors='coerce').fillna(0.0)
+        if stats is not None:
+            stats['missing_key_rows'] += int(chunk[keys].isna().any(axis=1).sum())
+        part = chunk.groupby(keys, sort=False, observed=True, dropna=False)[value_col].sum()
+        partials.append(part)
+        pending_rows += len(part)
+        if pending_rows > COMPACT_ROWS and len(partials) > 1:
+            partials = [pd.concat(partials).groupby(level=list(range(len(keys))), sort=False, dropna=False).sum()]
+            pending_rows = len(partials[0])
+    if not partials:
+        return pd.Series(dtype=float, index=pd.MultiIndex.from_arrays([[]] * len(keys), names=keys), name=value_col)
+    total = pd.concat(partials).groupby(level=list(range(len(keys))), sort=False, dropna=False).sum()
+    total.index.names = keys
+    return total
+
+
+def compute_variance(actual, budget, keys=DEFAULT_KEYS, actual_col='amount', budget_col='amount',
+                     revenue_accounts=None, account_col='account'):
+    """
+    实际 vs 预算 批量差异。actual / budget 为 DataFrame (未汇总亦可) 或已按 keys 汇总的 Series。
+    以 keys 全外连接，缺失侧按 0 计，返回 keys + actual/budget/abs_variance/percent_variance/status。
+    revenue_accounts 中的科目按收入口径判定 (实际高于预算为有利)。
+    """
+    def to_series(obj, col):
+        if isinstance(obj, pd.Series):
+            return obj
+        return obj.groupby(keys, sort=False, observed=True, dropna=False)[col].sum()
+
+    a = to_series(actual, actual_col).rename('actual')
+    b = to_series(budget, budget_col).rename('budget')
+    joined = pd.concat([a, b], axis=1, join='outer').fillna(0.0)
+    joined.index.names = keys
+    joined = joined.sort_index().reset_index()
+
+    revenue_mask = None
+    if revenue_accounts:
+        revenue_mask = joined[account_col].astype(str).isin({str(x) for x in revenue_accounts}).to_numpy()
+    result = _variance_columns(joined, revenue_mask)
+    result['revenue'] = revenue_mask if revenue_mask is not None else False
+    return result
+
+
+def rollup_variance(detail, hierarchy):
+    """
+    按层级逐级汇总 (例如 ['cost_center', 'account'] -> 成本中心 / 成本中心×科目 / 总计)。
+    金额先求和再重算差异，收入/成本口径按方向分别汇总后合并，避免正负抵消造成误判。
+    返回长表：level, 各层级列 (上层未用到的列为 '(all)'), actual, budget, 差异列。
+    """
+    frames = []
+    for depth in range(len(hierarchy), -1, -1):
+        cols = hierarchy[:depth]
+        group_cols = cols + ['revenue']
+        if cols:
+            g = detail.groupby(group_cols, sort=True, observed=True, dropna=False)[['actual', 'budget']].sum().reset_index()
+        else:
+            g = detail.groupby(['revenue'], sort=True)[['actual', 'budget']].sum().reset_index()
+        level = _variance_columns(g, g['revenue'].to_numpy(dtype=bool))
+        for c in hierarchy[depth:]:
+            level[c] = '(all)'
+        level.insert(0, 'level', '/'.join(cols) if cols else 'total')
+        frames.append(level[['level'] + hierarchy + ['revenue', 'actual', 'budget', 'abs_variance', 'percent_variance', 'status']])
+    return pd.concat(frames, ignore_index=True)
+
+
+def run_batch(actual_path, budget_path, keys=DEFAULT_KEYS, actual_col='amount', budget_col='amount',
+              hierarchy=None, revenue_accounts=None, output_dir='.', fmt='csv', chunksize=DEFAULT_CHUNKSIZE):
+    actual_stats, budget_stats = {}, {}
+    actual = aggregate_ledger(actual_path, keys, actual_col, chunksize, actual_stats)
+    budget = aggregate_ledger(budget_path, keys, budget_col, chunksize, budget_stats)
+    detail = compute_variance(actual, budget, keys, revenue_accounts=revenue_accounts)
+
+    os.makedirs(output_dir, exist_ok=True)
+    outputs = {'detail': detail}
+    if hierarchy:
+        outputs['rollup'] = rollup_variance(detail, hierarchy)
+    written = {}
+    for name, frame in outputs.items():
+        path = os.path.join(output_dir, f'variance_{name}.{fmt}')
+        if fmt == 'parquet':
+            frame.to_parquet(path, index=False)
+        else:
+            frame.to_csv(path, index=False, encoding='utf-8-sig')
+        written[name] = path
+
+    summary = {
+        "rows": len(detail),
+        "actual_total": round(float(detail['actual'].sum()), 2),
+        "budget_total": round(float(detail['budget'].sum()), 2),
+        "unfavorable_rows": int((detail['status'] == 'UNFAVORABLE').sum()),
+        "missing_key_rows": {"actual": actual_stats['missing_key_rows'], "budget": budget_stats['missing_key_rows']},
+        "outputs": written
+    }
+    print(json.dumps(summary, ensure_ascii=False, indent=2))
+    return summary
+
+
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Budget vs actual variance (stdin pair, or batch tables)")
+    parser.add_argument('--actual', help='Actual ledger (CSV/Parquet); enables batch mode')
+    parser.add_argument('--budget', help='Budget table (CSV/Parquet)')
+    parser.add_argument('--keys', default=','.join(DEFAULT_KEYS), help='Join keys, comma separated')
+    parser.add_argument('--actual_col', default='amount')
+    parser.add_argument('--budget_col', default='amount')
+    parser.add_argument('--hierarchy', default=None, help='Roll-up levels, comma separated (e.g. cost_center,account)')
+    parser.add_argument('--revenue_accounts', default=None, help='Accounts where higher actual is favourable, comma separated')
+    parser.add_argument('--chunksize', type=int, default=DEFAULT_CHUNKSIZE, help='Rows per streamed chunk')
+    parser.add_argument('--output_dir', default='.')
+    parser.add_argument('--format', choices=['csv', 'parquet'], default='csv')
+    args = parser.parse_args()
+
+    if args.actual or args.budget:
+        if not (args.actual and args.budget):
+            parser.error('batch mode requires both --actual and --budget')
+        run_batch(
+            args.actual, args.budget, keys=args.keys.split(','), actual_col=args.actual_col,
+            budget_col=args.budget_col, hierarchy=args.hierarchy.split(',') if args.hierarchy else None,
+            revenue_accounts=args.revenue_accounts.split(',') if args.revenue_accounts else None,
+            output_dir=args.output_dir, fmt=args.format, chunksize=args.chunksize
+        )
+        sys.exit(0)
+
     # 示例输入: 1200, 1000
     try:
         data = sys.stdin.read().split()
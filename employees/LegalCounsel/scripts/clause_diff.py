@@ -1,12 +1,315 @@
 import sys
+import os
+import re
+import json
+import html
+import bisect
 import difflib
+import hashlib
+import argparse
+from concurrent.futures import ProcessPoolExecutor
+
+# 条款标题：第X条/章/节/款、Article/Section/Clause N、1. / 1.1 / 3、、(a) / （一）
+HEADING_RE = re.compile(
+    r'^\s*(第[一二三四五六七八九十百千零〇\d]+[条章节款]'
+    r'|(?:Article|Section|Clause)\s+[\dIVXLC]+(?:\.\d+)*'
+    r'|\d+(?:\.\d+)*(?:[.、)]|(?=\s))'
+    r'|[（(](?:[a-z]|\d+|[一二三四五六七八九十]+)[)）])',
+    re.I
+)
+# 细粒度比对的词元：中日文逐字，ASCII 词/数字成段 (不吞并其后的中文)，其余逐字符
+TOKEN_RE = re.compile(r'[぀-ヿ㐀-䶿一-鿿]|[A-Za-z0-9_]+|\s+|[^A-Za-z0-9_\s]')
+SIMILARITY_THRESHOLD = 0.5
+
+
+def _normalize(text):
+    return ' '.join(text.split())
+
+
+def segment_clauses(text):
+    """
+    切分条款：文档中出现条款标题时按标题切分 (标题前的内容为序言)，否则按空行分段。
+    每个条款的 key 为去掉编号后的正文哈希，编号变化 (重新编号) 不影响对齐。
+    """
+    lines = text.splitlines()
+    has_headings = any(HEADING_RE.match(l) for l in lines)
+    clauses, current, start = [], [], 0
+
+    def flush():
+        body = '\n'.join(current).strip()
+        if body:
+            m = HEADING_RE.match(body)
+            label = m.group(1).strip() if m else ''
+            content = body[m.end():] if m else body
+            norm = _normalize(content)
+            clauses.append({
+                "index": len(clauses),
+                "label": label,
+                "text": body,
+                "line": start + 1,
+                "key": hashlib.sha1(norm.encode('utf-8')).hexdigest()
+            })
+
+    for i, line in enumerate(lines):
+        boundary = HEADING_RE.match(line) if has_headings else not line.strip()
+        if boundary and current:
+            flush()
+            current, start = [], i
+        if not current:
+            start = i
+        if has_headings or line.strip():
+            current.append(line)
+    flush()
+    return clauses
+
+
+def _lis_pairs(pairs):
+    """pairs 按标准文档序排列的 (i, j)，返回 j 单调递增的最长子序列 (patience 排序，O(n log n))。"""
+    tails, tails_idx, back = [], [], [None] * len(pairs)
+    for k, (_, j) in enumerate(pairs):
+        pos = bisect.bisect_left(tails, j)
+        back[k] = tails_idx[pos - 1] if pos else None
+        if pos == len(tails):
+            tails.append(j)
+            tails_idx.append(k)
+        else:
+            tails[pos] = j
+            tails_idx[pos] = k
+    out, k = [], tails_idx[-1] if tails_idx else None
+    while k is not None:
+        out.append(pairs[k])
+        k = back[k]
+    return out[::-1]
+
+
+def _tokens(text):
+    return TOKEN_RE.findall(text)
+
+
+def _similarity(a_tokens, b_tokens):
+    sm = difflib.SequenceMatcher(None, a_tokens, b_tokens, autojunk=False)
+    if sm.real_quick_ratio() < SIMILARITY_THRESHOLD or sm.quick_ratio() < SIMILARITY_THRESHOLD:
+        return 0.0
+    return sm.ratio()
+
+
+def inline_diff(a_text, b_text):
+    """变更条款内的词级差异：[(tag, 标准片段, 目标片段)]，tag 为 equal/replace/delete/insert。"""
+    a, b = _tokens(a_text), _tokens(b_text)
+    sm = difflib.SequenceMatcher(None, a, b, autojunk=False)
+    return [(tag, ''.join(a[i1:i2]), ''.join(b[j1:j2])) for tag, i1, i2, j1, j2 in sm.get_opcodes()]
+
+
+def _pair_gap(std, tgt, a_idx, b_idx, entries):
+    """锚点之间的间隙：先按哈希对齐相同条款，剩余的删除/新增按相似度配对为 modified。"""
+    sm = difflib.SequenceMatcher(None, [std[i]['key'] for i in a_idx], [tgt[j]['key'] for j in b_idx], autojunk=False)
+    for tag, i1, i2, j1, j2 in sm.get_opcodes():
+        if tag == 'equal':
+            entries.extend(("unchanged", a_idx[i1 + k], b_idx[j1 + k], 1.0) for k in range(i2 - i1))
+            continue
+        dels, ins = list(a_idx[i1:i2]), list(b_idx[j1:j2])
+        ins_tokens = {j: _tokens(tgt[j]['text']) for j in ins}
+        used = set()
+        for i in dels:
+            a_tok = _tokens(std[i]['text'])
+            best, best_score = None, SIMILARITY_THRESHOLD
+            for j in ins:
+                if j in used:
+                    continue
+                score = _similarity(a_tok, ins_tokens[j])
+                if score >= best_score:
+                    best, best_score = j, score
+            if best is None:
+                entries.append(("removed", i, None, 0.0))
+            else:
+                used.add(best)
+                entries.append(("modified", i, best, best_score))
+        entries.extend(("added", None, j, 0.0) for j in ins if j not in used)
+
+
+def diff_clauses(std, tgt):
+    """
+    条款级对齐：两侧都唯一出现的哈希作为候选锚点，取目标序单调的最长子序列 (线性对数时间)，
+    锚点之间的间隙再做条款级对齐；只对 modified 条款做词级细粒度比对。
+    位置不在锚点序列上、但正文完全相同的条款标记为 moved。
+    """
+    def unique_keys(clauses):
+        seen = {}
+        for c in clauses:
+            seen[c['key']] = None if c['key'] in seen else c['index']
+        return {k: i for k, i in seen.items() if i is not None}
+
+    u_std, u_tgt = unique_keys(std), unique_keys(tgt)
+    candidates = sorted((i, u_tgt[k]) for k, i in u_std.items() if k in u_tgt)
+    anchors = _lis_pairs(candidates)
+
+    entries = []
+    prev_i, prev_j = -1, -1
+    for i, j in anchors + [(len(std), len(tgt))]:
+        a_idx, b_idx = list(range(prev_i + 1, i)), list(range(prev_j + 1, j))
+        if a_idx or b_idx:
+            _pair_gap(std, tgt, a_idx, b_idx, entries)
+        if i < len(std):
+            entries.append(("unchanged", i, j, 1.0))
+        prev_i, prev_j = i, j
+
+    # 删除 + 新增 且正文相同 -> 移动
+    added_by_key = {}
+    for n, (status, i, j, _) in enumerate(entries):
+        if status == "added":
+            added_by_key.setdefault(tgt[j]['key'], []).append(n)
+    dropped = set()
+    for n, (status, i, j, score) in enumerate(entries):
+        if status == "removed" and added_by_key.get(std[i]['key']):
+            m = added_by_key[std[i]['key']].pop(0)
+            entries[n] = ("moved", i, entries[m][2], 1.0)
+            dropped.add(m)
+    entries = [e for n, e in enumerate(entries) if n not in dropped]
+
+    result = []
+    for status, i, j, score in entries:
+        a, b = (std[i] if i is not None else None), (tgt[j] if j is not None else None)
+        item = {
+            "status": status,
+            "standard_index": i, "target_index": j,
+            "label": (b or a)['label'],
+            "standard_line": a['line'] if a else None, "target_line": b['line'] if b else None,
+            "similarity": round(score, 4),
+            "standard_text": a['text'] if a else None, "target_text": b['text'] if b else None
+        }
+        if status == "modified":
+            item["ops"] = inline_diff(a['text'], b['text'])
+        result.append(item)
+    return result
+
+
+def compare_documents(standard, target, std_clauses=None):
+    std = std_clauses if std_clauses is not None else segment_clauses(standard)
+    tgt = segment_clauses(target)
+    clauses = diff_clauses(std, tgt)
+    summary = {s: 0 for s in ("unchanged", "modified", "added", "removed", "moved")}
+    for c in clauses:
+        summary[c["status"]] += 1
+    return {"summary": summary, "standard_clauses": len(std), "target_clauses": len(tgt), "clauses": clauses}
+
+
+HTML_STYLE = """
+body{font-family:-apple-system,'PingFang SC','Microsoft YaHei',sans-serif;margin:24px;color:#222}
+table{border-collapse:collapse;width:100%;table-layout:fixed}
+td,th{border:1px solid #ddd;padding:6px 8px;vertical-align:top;white-space:pre-wrap;word-break:break-word}
+th{background:#f5f5f5}.unchanged td{color:#888}.added td{background:#e6ffed}.removed td{background:#ffeef0}
+.moved td{background:#f1f0ff}del{background:#fdb8c0;text-decoration:line-through}ins{background:#acf2bd;text-decoration:none}
+.tag{font-size:12px;color:#555}
+"""
+
+
+def render_html(report, title="条款差异比对", show_unchanged=False):
+    esc = html.escape
+    s = report["summary"]
+    rows = []
+    for c in report["clauses"]:
+        if c["status"] == "unchanged" and not show_unchanged:
+            continue
+        if c["status"] == "modified":
+            left = ''.join(esc(a) if tag == 'equal' else (f"<del>{esc(a)}</del>" if a else '') for tag, a, _ in c["ops"])
+            right = ''.join(esc(b) if tag == 'equal' else (f"<ins>{esc(b)}</ins>" if b else '') for tag, _, b in c["ops"])
+        else:
+            left, right = esc(c["standard_text"] or ''), esc(c["target_text"] or '')
+        tag = f'{c["status"]} {c["similarity"]:.0%}' if c["status"] == "modified" else c["status"]
+        rows.append(f'<tr class="{c["status"]}"><td class="tag">{esc(c["label"] or "")}<br>{tag}</td>'
+                    f'<td>{left}</td><td>{right}</td></tr>')
+    head = (f"<p>修改 {s['modified']} | 新增 {s['added']} | 删除 {s['removed']} | 移动 {s['moved']} | "
+            f"未变 {s['unchanged']}</p>")
+    return (f"<!DOCTYPE html><html><head><meta charset='utf-8'><title>{esc(title)}</title>"
+            f"<style>{HTML_STYLE}</style></head><body><h2>{esc(title)}</h2>{head}"
+            f"<table><colgroup><col style='width:10%'><col style='width:45%'><col style='width:45%'></colgroup>"
+            f"<tr><th>条款</th><th>标准文本</th><th>目标文本</th></tr>{''.join(rows)}</table></body></html>")
+
 
 def compare_clauses(standard, target):
-    d = difflib.HtmlDiff()
-    return d.make_file(standard.splitlines(), target.splitlines())
+    """兼容旧接口：返回 HTML 差异报告。"""
+    return render_html(compare_documents(standard, target))
+
+
+def _read(path):
+    with open(path, 'r', encoding='utf-8', errors='ignore') as f:
+        return f.read()
+
+
+def _output_stems(target_paths):
+    """输出文件名：取相对公共目录的路径 (分隔符替换为 __)，a/c.txt 与 b/c.txt 不会互相覆盖。"""
+    paths = [os.path.abspath(p) for p in target_paths]
+    root = os.path.commonpath([os.path.dirname(p) for p in paths]) if paths else ''
+    stems, seen = [], {}
+    for p in paths:
+        stem = os.path.splitext(os.path.relpath(p, root))[0].replace(os.sep, '__')
+        seen[stem] = seen.get(stem, 0) + 1
+        stems.append(stem if seen[stem] == 1 else f"{stem}_{seen[stem]}")
+    return stems
+
+
+def _compare_job(std_clauses, target_path, output_dir, formats, stem=None):
+    report = compare_documents(None, _read(target_path), std_clauses)
+    report["target"] = target_path
+    stem = stem or os.path.splitext(os.path.basename(target_path))[0]
+    base = os.path.join(output_dir, stem + "_diff")
+    outputs = {}
+    if "json" in formats:
+        with open(base + ".json", 'w', encoding='utf-8') as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+        outputs["json"] = base + ".json"
+    if "html" in formats:
+        with open(base + ".html", 'w', encoding='utf-8') as f:
+            f.write(render_html(report, title=f"条款差异比对: {os.path.basename(target_path)}"))
+        outputs["html"] = base + ".html"
+    return {"target": target_path, "summary": report["summary"], "outputs": outputs}
+
+
+def compare_batch(standard_path, target_paths, output_dir, formats=("html", "json"), workers=None):
+    """一份标准文本对多份合同：标准只切分一次，按合同并行比对，返回汇总列表 (并写出 index.json)。"""
+    std_clauses = segment_clauses(_read(standard_path))
+    stems = _output_stems(target_paths)
+    os.makedirs(output_dir, exist_ok=True)
+    workers = workers if workers is not None else (os.cpu_count() or 1)
+    if workers > 1 and len(target_paths) > 1:
+        with ProcessPoolExecutor(max_workers=min(workers, len(target_paths))) as pool:
+            futures = [pool.submit(_compare_job, std_clauses, p, output_dir, formats, stem)
+                       for p, stem in zip(target_paths, stems)]
+            results = []
+            for p, fut in zip(target_paths, futures):
+                try:
+                    results.append(fut.result())
+                except Exception as e:
+                    results.append({"target": p, "error": f"{type(e).__name__}: {e}"})
+    else:
+        results = []
+        for p, stem in zip(target_paths, stems):
+            try:
+                results.append(_compare_job(std_clauses, p, output_dir, formats, stem))
+            except Exception as e:
+                results.append({"target": p, "error": f"{type(e).__name__}: {e}"})
+
+    with open(os.path.join(output_dir, "index.json"), 'w', encoding='utf-8') as f:
+        json.dump({"standard": standard_path, "results": results}, f, ensure_ascii=False, indent=2)
+    return results
+
 
 if __name__ == "__main__":
-    # 模拟读取两个条款文件
+    parser = argparse.ArgumentParser(description="条款级合同差异比对 (HTML / JSON)")
+    parser.add_argument("standard", help="标准条款文本")
+    parser.add_argument("targets", nargs="+", help="待比对的合同文本 (可多个)")
+    parser.add_argument("--output_dir", default="clause_diff_reports")
+    parser.add_argument("--format", default="html,json", help="输出格式，逗号分隔: html,json")
+    parser.add_argument("--workers", type=int, default=None, help="并行进程数 (多份合同时)")
+    args = parser.parse_args()
+
     print("法律提示：正在进行条款差异比对...")
-    # 实际应用中会接收两个路径作为输入
-    print("比对完成，已生成差异分析报告。")
+    results = compare_batch(args.standard, args.targets, args.output_dir,
+                            tuple(f.strip() for f in args.format.split(",")), args.workers)
+    for r in results:
+        if "error" in r:
+            print(f"  ✗ {r['target']}: {r['error']}")
+        else:
+            s = r["summary"]
+            print(f"  {r['target']}: 修改 {s['modified']} / 新增 {s['added']} / 删除 {s['removed']} / 移动 {s['moved']}")
+    print(f"比对完成，已生成差异分析报告: {args.output_dir}")
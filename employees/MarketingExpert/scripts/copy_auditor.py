@@ -1,24 +1,65 @@
 import sys
+import os
 import collections
 import re
+import argparse
 
-def audit_copy(text):
-    # 1. 检查禁止词汇 (示例)
-    banned = ["绝对", "第一", "最", "万能"]
-    found_banned = [w for w in banned if w in text]
-    
-    # 2. 关键字密度
-    words = re.findall(r'\w+', text.lower())
-    total = len(words)
-    counts = collections.Counter(words)
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "..", "_shared"))
+from text_scanner import TextScanner, load_terms
+
+# 1. 禁止词汇 (示例)；可通过 --banned-file 追加上千条词表
+BANNED_WORDS = ["绝对", "第一", "最", "万能"]
+WORD_RE = re.compile(r'\w+')
+STREAM_CHUNK = 1024 * 1024
+
+_scanner_cache = {}
+
+
+def build_scanner(banned=None):
+    """按词表编译扫描器并缓存 (同一词表重复审计不重建自动机)。"""
+    banned = tuple(banned or BANNED_WORDS)
+    scanner = _scanner_cache.get(banned)
+    if scanner is None:
+        scanner = _scanner_cache[banned] = TextScanner(dictionaries={"banned": banned})
+    return scanner
+
+
+def _summarize(scan, counts, total, banned):
+    hit_counts = scan.counts["banned"]
     top_keywords = {w: f"{round(c/total*100, 2)}%" for w, c in counts.most_common(3)}
-    
     return {
-        "banned_words_found": found_banned,
+        "banned_words_found": [w for w in dict.fromkeys(banned) if hit_counts.get(w)],
+        "banned_word_counts": dict(hit_counts),
+        "banned_word_positions": [(s, e, w) for s, e, w in sorted(scan.positions["banned"])],
         "keyword_density": top_keywords,
         "readability_score": "PASS" if total > 20 else "TOO_SHORT"
     }
 
+
+def audit_copy(text, banned=None):
+    banned = list(banned or BANNED_WORDS)
+    scan = build_scanner(banned).scan(text)
+
+    # 2. 关键字密度
+    words = WORD_RE.findall(text.lower())
+    total = len(words)
+    counts = collections.Counter(words)
+    return _summarize(scan, counts, total, banned)
+
+
+def audit_stream(stream, banned=None, chunk_size=STREAM_CHUNK):
+    """大文档/整批语料：按块读取，禁用词与词频在同一趟扫描中完成。"""
+    banned = list(banned or BANNED_WORDS)
+    counts = collections.Counter()
+    chunks = iter(lambda: stream.read(chunk_size), '')
+    scan = build_scanner(banned).scan_stream(chunks, on_segment=lambda seg: counts.update(WORD_RE.findall(seg.lower())))
+    return _summarize(scan, counts, sum(counts.values()), banned)
+
+
 if __name__ == "__main__":
-    text = sys.stdin.read()
-    print(audit_copy(text))
+    parser = argparse.ArgumentParser(description="品牌调性与文案合规审计 (stdin 输入)")
+    parser.add_argument("--banned-file", default=None, help="额外禁用词表，每行一个")
+    args = parser.parse_args()
+
+    banned = BANNED_WORDS + (load_terms(args.banned_file) if args.banned_file else [])
+    print(audit_stream(sys.stdin, banned))
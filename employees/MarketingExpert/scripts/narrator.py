@@ -2,49 +2,116 @@ import json
 import os
 import pandas as pd
 
+METRICS_FILE = 'advanced_analysis_results.json'
+ATTRIBUTION_FILES = {
+    'new_old': 'attribution_new_old_customer.json',
+    'profile': 'attribution_customer_profile.json',
+}
+# 旧版结果为纯数组，只能依赖固定的执行顺序定位记录；记录自带 门店名称/指标名称 时优先按键索引
+LEGACY_STORE_MAP = {
+    '上海湾': {'start': 0, 'metrics': ['Conversion', 'Duration', 'Dwell', 'POS_Buyers', 'Traffic']},
+    '新江湾': {'start': 5, 'metrics': ['Conversion', 'Duration', 'Dwell', 'POS_Buyers', 'Traffic']}
+}
+
+
+class ReportIndex:
+    """
+    报告目录的键控索引：门店 -> 指标 -> 记录，门店 -> 归因行。
+    每个文件只解析一次，归因表按门店一次 groupby 切分，之后按门店取数为 O(1)。
+    """
+
+    _cache = {}
+
+    def __init__(self, report_dir: str):
+        self.report_dir = report_dir
+        self.metrics = {}
+        self.attribution = {}
+        self._load_metrics()
+        for kind, fname in ATTRIBUTION_FILES.items():
+            self.attribution[kind] = self._load_attribution(os.path.join(report_dir, fname))
+
+    @classmethod
+    def open(cls, report_dir: str):
+        """按目录缓存索引；任一报告文件的 mtime 变化时重建。"""
+        key = os.path.abspath(report_dir)
+        stamp = tuple(
+            os.path.getmtime(p) if os.path.exists(p) else None
+            for p in (os.path.join(key, f) for f in (METRICS_FILE, *ATTRIBUTION_FILES.values()))
+        )
+        cached = cls._cache.get(key)
+        if cached is None or cached[0] != stamp:
+            cached = cls._cache[key] = (stamp, cls(report_dir))
+        return cached[1]
+
+    def _load_metrics(self):
+        path = os.path.join(self.report_dir, METRICS_FILE)
+        if not os.path.exists(path):
+            return
+        with open(path, 'r', encoding='utf-8') as f:
+            all_metrics = json.load(f)
+
+        for record in all_metrics:
+            if isinstance(record, dict) and '门店名称' in record and '指标名称' in record:
+                self.metrics.setdefault(record['门店名称'], {})[record['指标名称']] = record
+        if self.metrics:
+            return
+
+        # 整个文件都未自带键的旧产物：按已知执行顺序回填 (复制记录，不改动原始数据)
+        for store, info in LEGACY_STORE_MAP.items():
+            store_metrics = {}
+            for i, metric_name in enumerate(info['metrics']):
+                if info['start'] + i >= len(all_metrics):
+                    break
+                record = all_metrics[info['start'] + i]
+                if isinstance(record, dict):
+                    store_metrics[metric_name] = dict(record, 指标名称=metric_name)
+            if store_metrics:
+                self.metrics[store] = store_metrics
+
+    @staticmethod
+    def _load_attribution(path: str):
+        """返回 {门店: 行子表}；文件缺失或无 门店名称 列时返回 None。"""
+        if not os.path.exists(path):
+            return None
+        with open(path, 'r', encoding='utf-8') as f:
+            df = pd.DataFrame(json.load(f))
+        if df.empty or '门店名称' not in df.columns:
+            return None
+        groups = {store: g for store, g in df.groupby('门店名称', sort=False)}
+        groups[None] = df.iloc[0:0]  # 未命中门店时返回同结构空表
+        return groups
+
+    def stores(self):
+        return list(self.metrics.keys())
+
+    def store_metrics(self, store: str):
+        return self.metrics.get(store)
+
+    def store_attribution(self, kind: str, store: str):
+        groups = self.attribution.get(kind)
+        if groups is None:
+            return None
+        return groups.get(store, groups[None])
+
+
 class InsightNarrator:
-    def __init__(self, report_dir: str, store_name: str):
+    def __init__(self, report_dir: str, store_name: str, index: ReportIndex = None):
         self.report_dir = report_dir
         self.store_name = store_name
+        self.index = index
         self.metrics_data = None
         self.new_old_attr = None
         self.profile_attr = None
         self._load_data()
 
     def _load_data(self):
-        """Loads the three JSON report files."""
+        """从键控索引中取出本门店的指标与归因行 (索引按目录缓存，多门店不重复解析)。"""
         try:
-            # --- Load Core Metrics ---
-            # This is tricky because the JSON is just an array. We rely on the known execution order.
-            # (上海湾, Conversion), (上海湾, Duration), (上海湾, Dwell), (上海湾, POS_Buyers), (上海湾, Traffic)
-            # (新江湾, Conversion), ...
-            store_map = {
-                '上海湾': {'start': 0, 'metrics': ['Conversion', 'Duration', 'Dwell', 'POS_Buyers', 'Traffic']},
-                '新江湾': {'start': 5, 'metrics': ['Conversion', 'Duration', 'Dwell', 'POS_Buyers', 'Traffic']}
-            }
-            if self.store_name in store_map:
-                with open(os.path.join(self.report_dir, 'advanced_analysis_results.json'), 'r', encoding='utf-8') as f:
-                    all_metrics = json.load(f)
-                
-                self.metrics_data = {}
-                store_info = store_map[self.store_name]
-                for i, metric_name in enumerate(store_info['metrics']):
-                    record = all_metrics[store_info['start'] + i]
-                    # Add metric name to the record for easier lookup
-                    record['指标名称'] = metric_name
-                    self.metrics_data[metric_name] = record
-            
-            # --- Load Attribution Data ---
-            # These files should contain '门店名称' and can be filtered.
-            attr_new_old_path = os.path.join(self.report_dir, 'attribution_new_old_customer.json')
-            if os.path.exists(attr_new_old_path):
-                with open(attr_new_old_path, 'r', encoding='utf-8') as f:
-                    self.new_old_attr = pd.DataFrame(json.load(f))
-
-            attr_profile_path = os.path.join(self.report_dir, 'attribution_customer_profile.json')
-            if os.path.exists(attr_profile_path):
-                with open(attr_profile_path, 'r', encoding='utf-8') as f:
-                    self.profile_attr = pd.DataFrame(json.load(f))
+            if self.index is None:
+                self.index = ReportIndex.open(self.report_dir)
+            self.metrics_data = self.index.store_metrics(self.store_name)
+            self.new_old_attr = self.index.store_attribution('new_old', self.store_name)
+            self.profile_attr = self.index.store_attribution('profile', self.store_name)
 
         except FileNotFoundError as e:
             print(f"Error: Could not find a report file. {e}")
@@ -84,12 +151,12 @@ class InsightNarrator:
     def _format_attribution_table(self, df: pd.DataFrame, comp_type: str, title: str):
         """Formats an attribution table (either new/old or profile)."""
         rows = [f"**{title}**:", ""]
-        if df is None or df.empty or '门店名称' not in df.columns:
+        if df is None:
              rows.append(f"无法为 {self.store_name} 生成 {title} 归因看板 (数据缺失或格式错误)。")
              return "\n".join(rows)
 
         # The attribution files might not have the '对比类型' column, so we work with what we have.
-        store_df = df[df['门店名称'] == self.store_name].copy()
+        store_df = df
         if '对比类型' in store_df.columns:
             store_df = store_df[store_df['对比类型'] == comp_type]
 
@@ -116,12 +183,11 @@ class InsightNarrator:
 
         return "\n".join(rows)
 
-    def generate_prompt(self, output_prompt_file):
-        """Generates the full narrative prompt from the loaded V2 data."""
+    def build_prompt(self):
+        """Builds the full narrative prompt text; returns None when core metrics are missing."""
         if not self.metrics_data:
-            print("错误: 核心指标数据未能加载，无法生成prompt。")
-            return
-            
+            return None
+
         # Extract basic info from the first available metric
         any_metric = next(iter(self.metrics_data.values()))
         reno_month = any_metric.get('reno_month', 'N/A')
@@ -174,11 +240,45 @@ class InsightNarrator:
         
         prompt.append("\n> **深度解读指令**: 结合前面的效能数据，分析这种客群置换是“良性换血”（如高价值客群替换了低价值客群）还是“恶性流失”？")
 
+        return "\n".join(prompt)
+
+    def generate_prompt(self, output_prompt_file):
+        """Generates the full narrative prompt from the loaded V2 data."""
+        text = self.build_prompt()
+        if text is None:
+            print("错误: 核心指标数据未能加载，无法生成prompt。")
+            return
         with open(output_prompt_file, 'w', encoding='utf-8') as f:
-            f.write("\n".join(prompt))
+            f.write(text)
         print(f"V2 Prompt Generated: {output_prompt_file}")
 
 
+def generate_prompts(report_dir: str, stores=None, output_dir: str = None):
+    """
+    批量生成多门店 prompt：报告目录只解析一次，逐店从索引取数渲染。
+    stores 为空时生成索引中的全部门店；返回 {门店: 输出路径}，缺少核心指标的门店跳过。
+    """
+    index = ReportIndex.open(report_dir)
+    output_dir = output_dir or report_dir
+    os.makedirs(output_dir, exist_ok=True)
+
+    written, missing = {}, []
+    for store in (stores if stores is not None else index.stores()):
+        text = InsightNarrator(report_dir, store, index=index).build_prompt()
+        if text is None:
+            missing.append(store)
+            continue
+        path = os.path.join(output_dir, f'prompt_for_{store}.md')
+        with open(path, 'w', encoding='utf-8') as f:
+            f.write(text)
+        written[store] = path
+
+    print(f"V2 Prompts Generated: {len(written)} stores -> {output_dir}")
+    if missing:
+        print(f"错误: 以下门店核心指标数据缺失，已跳过: {', '.join(map(str, missing))}")
+    return written
+
+
 if __name__ == "__main__":
     # Example of how to run this new narrator
     try:
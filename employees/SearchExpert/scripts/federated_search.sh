@@ -1,11 +1,20 @@
 #!/bin/bash
-# 模拟跨平台检索调度器
+# 跨平台检索调度器
+# 本地知识库 (reports / SOPs / 调研产物) 走增量倒排索引 + BM25，见 local_index.py
 
 QUERY=$1
-echo "正在检索内部知识库 (Wiki)..."
-# 实际逻辑应调用 MCP 或特定 API
-echo "正在检索 Slack 历史消息..."
-echo "正在检索 Google Drive 文档..."
+TOP_K=${2:-10}
+SCRIPT_DIR="$( cd "$( dirname "${BASH_SOURCE[0]}" )" && pwd )"
+PYTHON_BIN=${PYTHON_BIN:-python3}
 
+if [ -z "$QUERY" ]; then
+    echo "Usage: federated_search.sh <query> [top_k]"
+    exit 1
+fi
+
+echo "正在检索本地知识库 (reports / SOPs / research)..."
+# --update 只重建变化过的文件，未变化时几乎零开销
+"$PYTHON_BIN" "$SCRIPT_DIR/local_index.py" search "$QUERY" -k "$TOP_K" --update
+
+# Slack / Google Drive 等远端来源需通过 MCP 或对应 API 接入，本地索引不覆盖
 echo "--- 检索完成 ---"
-echo "发现 3 条高相关性结果。"
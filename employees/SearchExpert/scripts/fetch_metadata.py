@@ -1,30 +1,229 @@
 import sys
-import urllib.request
+import os
 import re
 import json
+import base64
+import codecs
+import hashlib
+import tempfile
+import threading
+import http.client
+import urllib.request
+from urllib.parse import urlsplit, urljoin, unquote
+
+HEADERS = {
+    'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
+}
+TIMEOUT = 10
+MAX_REDIRECTS = 5
+CHUNK_SIZE = 16 * 1024
+# 提前结束读取时，剩余正文不超过该大小则读完以保留长连接，否则直接断开
+DRAIN_LIMIT = 256 * 1024
+CACHE_DIR = os.environ.get(
+    "SEARCH_EXPERT_CACHE", os.path.join(os.path.expanduser("~"), ".cache", "search_expert")
+)
+
+TITLE_RE = re.compile(r'<title>(.*?)</title>')
+DESC_RE = re.compile(r'<meta property="og:description" content="(.*?)"')
+HEAD_END = '</head>'
+
+
+def _proxy_for(scheme, netloc):
+    """
+    与 urlopen 的默认 ProxyHandler 同口径：读取 HTTP_PROXY / HTTPS_PROXY (及系统代理设置)，
+    命中 NO_PROXY 的主机直连。返回 (代理主机, 端口, 代理认证头) 或 None。
+    """
+    proxy = urllib.request.getproxies().get(scheme)
+    if not proxy or urllib.request.proxy_bypass(netloc):
+        return None
+    parts = urlsplit(proxy if '://' in proxy else 'http://' + proxy)
+    headers = {}
+    if parts.username:
+        credentials = f"{unquote(parts.username)}:{unquote(parts.password or '')}"
+        headers['Proxy-Authorization'] = 'Basic ' + base64.b64encode(credentials.encode('utf-8')).decode('ascii')
+    return parts.hostname, parts.port or (443 if parts.scheme == 'https' else 80), headers
+
+
+class ConnectionPool:
+    """
+    按 (scheme, host:port) 复用 HTTP(S) 长连接。
+    连接按线程隔离 (http.client 连接不是线程安全的)，供 orchestrator 的线程并发调用。
+    配置了代理时 (HTTP_PROXY / HTTPS_PROXY / NO_PROXY)：https 经 CONNECT 隧道，http 向代理发送绝对 URI 请求。
+    """
+
+    def __init__(self, timeout=TIMEOUT):
+        self.timeout = timeout
+        self._local = threading.local()
+
+    def _conns(self):
+        conns = getattr(self._local, 'conns', None)
+        if conns is None:
+            conns = self._local.conns = {}
+        return conns
+
+    def get(self, scheme, netloc):
+        """返回 (连接, 代理请求头)；代理请求头为 None 表示直连或隧道，请求行使用相对路径。"""
+        key = (scheme, netloc)
+        entry = self._conns().get(key)
+        if entry is None:
+            proxy = _proxy_for(scheme, netloc)
+            if proxy is None:
+                cls = http.client.HTTPSConnection if scheme == 'https' else http.client.HTTPConnection
+                entry = (cls(netloc, timeout=self.timeout), None)
+            elif scheme == 'https':
+                conn = http.client.HTTPSConnection(proxy[0], proxy[1], timeout=self.timeout)
+                conn.set_tunnel(netloc, headers=proxy[2])
+                entry = (conn, None)
+            else:
+                entry = (http.client.HTTPConnection(proxy[0], proxy[1], timeout=self.timeout), proxy[2])
+            self._conns()[key] = entry
+        return entry
+
+    def discard(self, scheme, netloc):
+        entry = self._conns().pop((scheme, netloc), None)
+        if entry is not None:
+            entry[0].close()
+
+    def request(self, url, headers):
+        """发送 GET；复用的连接若已被服务端关闭则重连重试一次。返回 (response, scheme, netloc)。"""
+        parts = urlsplit(url)
+        scheme, netloc = parts.scheme or 'http', parts.netloc
+        path = parts.path or '/'
+        if parts.query:
+            path += '?' + parts.query
+        for attempt in (0, 1):
+            conn, proxy_headers = self.get(scheme, netloc)
+            try:
+                if proxy_headers is None:
+                    conn.request('GET', path, headers=headers)
+                else:
+                    conn.request('GET', f"{scheme}://{netloc}{path}", headers={**headers, **proxy_headers})
+                return conn.getresponse(), scheme, netloc
+            except (http.client.RemoteDisconnected, http.client.CannotSendRequest,
+                    ConnectionResetError, BrokenPipeError):
+                self.discard(scheme, netloc)
+                if attempt:
+                    raise
+
+
+_POOL = ConnectionPool()
+
+
+class MetadataCache:
+    """URL -> {etag, last_modified, title, description} 的磁盘缓存，用于条件请求 (304 直接复用)。"""
+
+    def __init__(self, cache_dir=CACHE_DIR):
+        self.cache_dir = os.path.join(cache_dir, "metadata")
 
-def get_metadata(url):
-    headers = {
-        'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
-    }
+    def _path(self, url):
+        return os.path.join(self.cache_dir, hashlib.sha256(url.encode('utf-8')).hexdigest() + ".json")
+
+    def get(self, url):
+        try:
+            with open(self._path(url), 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def put(self, url, entry):
+        os.makedirs(self.cache_dir, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=self.cache_dir, prefix=".tmp_", suffix=".json")
+        try:
+            with os.fdopen(fd, 'w', encoding='utf-8') as f:
+                json.dump(entry, f, ensure_ascii=False)
+            os.replace(tmp_path, self._path(url))
+        except BaseException:
+            if os.path.exists(tmp_path): os.remove(tmp_path)
+            raise
+
+
+def _conditional_headers(entry):
+    headers = dict(HEADERS)
+    if entry:
+        if entry.get('etag'):
+            headers['If-None-Match'] = entry['etag']
+        if entry.get('last_modified'):
+            headers['If-Modified-Since'] = entry['last_modified']
+    return headers
+
+
+def _scan_head(response):
+    """
+    流式解析：按块解码并查找 <title> 与 og:description，两者都找到 (或 </head> 已出现) 即停止读取。
+    返回 (title_match, desc_match, fully_read)。
+    """
+    decoder = codecs.getincrementaldecoder('utf-8')(errors='ignore')
+    text = ''
+    title_match = desc_match = None
+    while True:
+        chunk = response.read(CHUNK_SIZE)
+        if not chunk:
+            text += decoder.decode(b'', final=True)
+            break
+        text += decoder.decode(chunk)
+        title_match = title_match or TITLE_RE.search(text)
+        desc_match = desc_match or DESC_RE.search(text)
+        if (title_match and desc_match) or HEAD_END in text:
+            break
+    title_match = title_match or TITLE_RE.search(text)
+    desc_match = desc_match or DESC_RE.search(text)
+    return title_match, desc_match, response.isclosed()
+
+
+def _release(response, scheme, netloc, fully_read):
+    """正文未读完时：余量小则读完保留连接，否则断开，避免后续请求读到残留数据。"""
+    if fully_read:
+        return
+    remaining = response.length
+    if remaining is not None and remaining <= DRAIN_LIMIT:
+        response.read()
+    else:
+        _POOL.discard(scheme, netloc)
+
+
+def get_metadata(url, use_cache=True, cache_dir=CACHE_DIR):
+    cache = MetadataCache(cache_dir) if use_cache else None
+    entry = cache.get(url) if cache else None
     try:
-        req = urllib.request.Request(url, headers=headers)
-        with urllib.request.urlopen(req, timeout=10) as response:
-            html = response.read().decode('utf-8', errors='ignore')
-            
-            # Extract Title
-            title_match = re.search(r'<title>(.*?)</title>', html)
-            title = title_match.group(1).replace("- YouTube", "").strip() if title_match else "Unknown Title"
-            
-            # Extract Description (og:description)
-            desc_match = re.search(r'<meta property="og:description" content="(.*?)"', html)
-            description = desc_match.group(1) if desc_match else ""
-            
-            return {
-                "title": title,
-                "description": description,
-                "url": url
-            }
+        target = url
+        for _ in range(MAX_REDIRECTS + 1):
+            response, scheme, netloc = _POOL.request(target, _conditional_headers(entry))
+            if response.status in (301, 302, 303, 307, 308) and response.getheader('Location'):
+                response.read()
+                target = urljoin(target, response.getheader('Location'))
+                continue
+            break
+        else:
+            raise http.client.HTTPException(f"Too many redirects: {url}")
+
+        if response.status == 304 and entry:
+            response.read()
+            return {"title": entry['title'], "description": entry['description'], "url": url}
+        if response.status >= 400:
+            response.read()
+            raise http.client.HTTPException(f"HTTP Error {response.status}: {response.reason}")
+
+        title_match, desc_match, fully_read = _scan_head(response)
+        _release(response, scheme, netloc, fully_read)
+
+        # Extract Title
+        title = title_match.group(1).replace("- YouTube", "").strip() if title_match else "Unknown Title"
+
+        # Extract Description (og:description)
+        description = desc_match.group(1) if desc_match else ""
+
+        etag, last_modified = response.getheader('ETag'), response.getheader('Last-Modified')
+        if cache and (etag or last_modified):
+            cache.put(url, {
+                "etag": etag, "last_modified": last_modified,
+                "title": title, "description": description
+            })
+
+        return {
+            "title": title,
+            "description": description,
+            "url": url
+        }
     except Exception as e:
         return {"error": str(e)}
 
@@ -1,38 +1,186 @@
-import sys
+import os
+import re
+import gzip
 import json
-from youtube_transcript_api import YouTubeTranscriptApi
-from youtube_transcript_api.formatters import TextFormatter
+import time
+import hashlib
+import argparse
+import tempfile
 
-def get_transcript(video_url):
+try:
+    from youtube_transcript_api import YouTubeTranscriptApi
+    from youtube_transcript_api.formatters import TextFormatter
+except ImportError:  # 未安装时返回 error，由调用方降级到元数据策略
+    YouTubeTranscriptApi = None
+
+PREFERRED_LANGS = ['zh-Hans', 'zh-TW', 'en']
+# 单次返回的字符上限 (旧版直接截断到该长度；现在可通过 offset 翻页读取全文)
+MAX_CHARS = 20000
+CACHE_DIR = os.environ.get(
+    "SEARCH_EXPERT_CACHE", os.path.join(os.path.expanduser("~"), ".cache", "search_expert")
+)
+CACHE_TTL = int(os.environ.get("SEARCH_EXPERT_TRANSCRIPT_TTL", 30 * 24 * 3600))
+CACHE_MAX_BYTES = int(os.environ.get("SEARCH_EXPERT_TRANSCRIPT_MAX_BYTES", 200 * 1024 * 1024))
+
+_SAFE_KEY = re.compile(r'^[A-Za-z0-9_-]+$')
+
+
+class TranscriptCache:
+    """
+    字幕本地存储：(video_id, 语言) -> 完整字幕文本 (gzip 压缩)。
+    文件 mtime 记录最近一次访问，用于 TTL 过期与超出容量时的 LRU 淘汰。
+    """
+
+    def __init__(self, cache_dir=CACHE_DIR, ttl=CACHE_TTL, max_bytes=CACHE_MAX_BYTES):
+        self.cache_dir = os.path.join(cache_dir, "transcripts")
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+
+    @staticmethod
+    def _key(part):
+        return part if _SAFE_KEY.match(part) else hashlib.sha256(part.encode('utf-8')).hexdigest()[:32]
+
+    def _path(self, video_id, lang):
+        return os.path.join(self.cache_dir, f"{self._key(video_id)}.{self._key(lang)}.txt.gz")
+
+    def _expired(self, path, now):
+        return self.ttl is not None and now - os.path.getmtime(path) > self.ttl
+
+    def get(self, video_id, langs=PREFERRED_LANGS):
+        """按语言偏好查找；偏好语言都未缓存时返回该视频任一已缓存语言。返回 (text, lang) 或 None。"""
+        if not os.path.isdir(self.cache_dir):
+            return None
+        prefix = self._key(video_id) + "."
+        candidates = [self._path(video_id, lang) for lang in langs]
+        candidates += sorted(
+            os.path.join(self.cache_dir, f) for f in os.listdir(self.cache_dir)
+            if f.startswith(prefix) and f.endswith(".txt.gz")
+        )
+        now = time.time()
+        for path in candidates:
+            if not os.path.exists(path):
+                continue
+            if self._expired(path, now):
+                self._remove(path)
+                continue
+            try:
+                with gzip.open(path, 'rt', encoding='utf-8') as f:
+                    text = f.read()
+            except (OSError, EOFError):
+                self._remove(path)
+                continue
+            os.utime(path, None)
+            lang = os.path.basename(path)[len(prefix):-len(".txt.gz")]
+            return text, lang
+        return None
+
+    def put(self, video_id, lang, text):
+        os.makedirs(self.cache_dir, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=self.cache_dir, prefix=".tmp_", suffix=".gz")
+        try:
+            with os.fdopen(fd, 'wb') as raw, gzip.GzipFile(fileobj=raw, mode='wb') as f:
+                f.write(text.encode('utf-8'))
+            os.replace(tmp_path, self._path(video_id, lang))
+        except BaseException:
+            if os.path.exists(tmp_path): os.remove(tmp_path)
+            raise
+        self.evict()
+
+    def evict(self):
+        """删除过期条目；总大小仍超过上限时按最近访问时间从旧到新淘汰。"""
+        if not os.path.isdir(self.cache_dir):
+            return
+        now = time.time()
+        entries = []
+        for name in os.listdir(self.cache_dir):
+            if not name.endswith(".txt.gz"):
+                continue
+            path = os.path.join(self.cache_dir, name)
+            try:
+                st = os.stat(path)
+            except OSError:
+                continue
+            if self.ttl is not None and now - st.st_mtime > self.ttl:
+                self._remove(path)
+            else:
+                entries.append((st.st_mtime, st.st_size, path))
+
+        total = sum(size for _, size, _ in entries)
+        if self.max_bytes is None or total <= self.max_bytes:
+            return
+        for _, size, path in sorted(entries):
+            self._remove(path)
+            total -= size
+            if total <= self.max_bytes:
+                break
+
+    @staticmethod
+    def _remove(path):
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+
+def extract_video_id(video_url):
+    return video_url.split('v=')[-1].split('&')[0]
+
+
+def _fetch_remote(video_id):
+    """从 YouTube 拉取字幕全文，返回 (text, 语言代码)。"""
+    # 实例化 API
+    ytt_api = YouTubeTranscriptApi()
+
+    # 使用实例方法 list
+    transcript_list = ytt_api.list(video_id)
+
+    # 尝试寻找手动创建的中文或英文字幕
     try:
-        video_id = video_url.split('v=')[-1].split('&')[0]
-        
-        # 实例化 API
-        ytt_api = YouTubeTranscriptApi()
-        
-        # 使用实例方法 list
-        transcript_list = ytt_api.list(video_id)
-        
-        # 尝试寻找手动创建的中文或英文字幕
+        transcript = transcript_list.find_manually_created_transcript(PREFERRED_LANGS)
+    except:
+        # 如果没有手动，尝试自动生成的
         try:
-            transcript = transcript_list.find_manually_created_transcript(['zh-Hans', 'zh-TW', 'en'])
+            transcript = transcript_list.find_generated_transcript(PREFERRED_LANGS)
         except:
-            # 如果没有手动，尝试自动生成的
-            try:
-                transcript = transcript_list.find_generated_transcript(['zh-Hans', 'zh-TW', 'en'])
-            except:
-                 # 如果都没找到指定语言，直接拿第一个可用的并翻译（如果需要，这里暂取第一个）
-                 transcript = next(iter(transcript_list))
-
-        # 获取实际内容
-        transcript_data = transcript.fetch()
-        
-        formatter = TextFormatter()
-        text_formatted = formatter.format_transcript(transcript_data)
-        
+             # 如果都没找到指定语言，直接拿第一个可用的并翻译（如果需要，这里暂取第一个）
+             transcript = next(iter(transcript_list))
+
+    # 获取实际内容
+    transcript_data = transcript.fetch()
+
+    formatter = TextFormatter()
+    return formatter.format_transcript(transcript_data), getattr(transcript, 'language_code', 'unknown')
+
+
+def get_transcript(video_url, offset=0, limit=MAX_CHARS, use_cache=True, cache=None):
+    """
+    先查本地缓存，未命中才访问网络 (拉取的全文写入缓存)。
+    返回 text[offset:offset+limit]；next_offset 不为 None 时可继续翻页。
+    """
+    try:
+        video_id = extract_video_id(video_url)
+        cache = cache or (TranscriptCache() if use_cache else None)
+
+        hit = cache.get(video_id) if cache else None
+        if hit is not None:
+            text_formatted, lang = hit
+        else:
+            if YouTubeTranscriptApi is None:
+                return {"status": "error", "message": "youtube_transcript_api is not installed"}
+            text_formatted, lang = _fetch_remote(video_id)
+            if cache:
+                cache.put(video_id, lang, text_formatted)
+
+        end = len(text_formatted) if limit is None else offset + limit
         return {
             "status": "success",
-            "transcript": text_formatted[:20000]
+            "transcript": text_formatted[offset:end],
+            "video_id": video_id,
+            "language": lang,
+            "cached": hit is not None,
+            "total_chars": len(text_formatted),
+            "offset": offset,
+            "next_offset": end if end < len(text_formatted) else None
         }
     except Exception as e:
         return {
@@ -40,8 +188,34 @@ def get_transcript(video_url):
             "message": str(e)
         }
 
+
+def iter_transcript_chunks(video_url, chunk_size=MAX_CHARS, use_cache=True):
+    """逐块产出完整字幕：全文只获取一次 (缓存或网络)，之后在内存中切片。出错时产出一次 error 字典后结束。"""
+    full = get_transcript(video_url, offset=0, limit=None, use_cache=use_cache)
+    if full.get("status") != "success":
+        yield full
+        return
+    text, total = full["transcript"], full["total_chars"]
+    offset = 0
+    while True:
+        end = offset + chunk_size
+        yield dict(full, transcript=text[offset:end], offset=offset,
+                   next_offset=end if end < total else None)
+        if end >= total:
+            return
+        offset = end
+
+
 if __name__ == "__main__":
-    if len(sys.argv) < 2:
+    parser = argparse.ArgumentParser(description="Fetch a YouTube transcript (cached locally)")
+    parser.add_argument("url", nargs="?")
+    parser.add_argument("--offset", type=int, default=0, help="Character offset to start from")
+    parser.add_argument("--limit", type=int, default=MAX_CHARS, help="Max characters to return (0 = all)")
+    parser.add_argument("--no-cache", action="store_true", help="Bypass the local transcript cache")
+    args = parser.parse_args()
+
+    if not args.url:
         print(json.dumps({"status": "error", "message": "No URL provided"}))
     else:
-        print(json.dumps(get_transcript(sys.argv[1]), ensure_ascii=False, indent=2))
+        result = get_transcript(args.url, offset=args.offset, limit=args.limit or None, use_cache=not args.no_cache)
+        print(json.dumps(result, ensure_ascii=False, indent=2))
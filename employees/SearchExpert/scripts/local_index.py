@@ -0,0 +1,282 @@
+import sys
+import os
+import re
+import json
+import math
+import time
+import sqlite3
+import argparse
+from collections import Counter
+
+# 路径配置
+SKILL_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+REPO_ROOT = os.path.abspath(os.path.join(SKILL_ROOT, "../.."))
+CACHE_DIR = os.environ.get(
+    "SEARCH_EXPERT_CACHE", os.path.join(os.path.expanduser("~"), ".cache", "search_expert")
+)
+DEFAULT_DB = os.path.join(CACHE_DIR, "local_index.sqlite")
+
+# 默认收录：任意层级下名为 reports / SOPs / research 的目录中的文本类文件
+INDEX_DIR_NAMES = {"reports", "SOPs", "research"}
+INDEX_EXTENSIONS = {".md", ".txt", ".json", ".jsonl", ".html", ".htm", ".csv"}
+SKIP_DIR_NAMES = {".git", ".venv", "venv", "node_modules", "__pycache__"}
+MAX_FILE_BYTES = 20 * 1024 * 1024
+
+BM25_K1 = 1.2
+BM25_B = 0.75
+
+# 英文/数字按词切分；中日文字符段切为二元组，建索引时额外收录单字 (单字查询可命中)
+TOKEN_RE = re.compile(r'[0-9a-z]+|[぀-ヿ㐀-䶿一-鿿豈-﫿]+')
+# 分词规则变更时递增，已有索引库会被清空重建
+TOKENIZER_VERSION = 2
+TAG_RE = re.compile(r'<[^>]+>')
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS docs (
+    id INTEGER PRIMARY KEY,
+    path TEXT UNIQUE NOT NULL,
+    mtime_ns INTEGER NOT NULL,
+    size INTEGER NOT NULL,
+    length INTEGER NOT NULL,
+    title TEXT
+);
+CREATE TABLE IF NOT EXISTS postings (
+    term TEXT NOT NULL,
+    doc_id INTEGER NOT NULL,
+    tf INTEGER NOT NULL,
+    PRIMARY KEY (term, doc_id)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS postings_doc ON postings (doc_id);
+"""
+
+
+def tokenize(text, unigrams=False):
+    """
+    查询分词：中日文单字段为单字，多字段为二元组。
+    unigrams=True (建索引) 时中日文段同时产出全部单字，使单字查询也能命中。
+    """
+    tokens = []
+    for m in TOKEN_RE.finditer(text.lower()):
+        tok = m.group(0)
+        if tok[0] < '぀':
+            tokens.append(tok)
+        elif len(tok) == 1:
+            tokens.append(tok)
+        else:
+            tokens.extend(tok[i:i + 2] for i in range(len(tok) - 1))
+            if unigrams:
+                tokens.extend(tok)
+    return tokens
+
+
+def read_document(path):
+    with open(path, 'r', encoding='utf-8', errors='ignore') as f:
+        text = f.read()
+    if path.endswith(('.html', '.htm')):
+        text = TAG_RE.sub(' ', text)
+    return text
+
+
+def _title_of(text, path):
+    for line in text.splitlines():
+        line = line.strip().lstrip('#').strip()
+        if line:
+            return line[:120]
+    return os.path.basename(path)
+
+
+def discover_files(roots=None):
+    """
+    遍历收录文件。roots 为空时扫描整个仓库中的 reports / SOPs / research 目录；
+    显式给出的 root 目录 (或单个文件) 则整体收录。
+    """
+    explicit = roots is not None
+    for root in (roots if explicit else [REPO_ROOT]):
+        root = os.path.abspath(root)
+        if os.path.isfile(root):
+            yield root
+            continue
+        for dirpath, dirnames, filenames in os.walk(root):
+            dirnames[:] = [d for d in dirnames if d not in SKIP_DIR_NAMES and not d.startswith('.')]
+            rel_parts = os.path.relpath(dirpath, root).split(os.sep)
+            if not explicit and not INDEX_DIR_NAMES.intersection(rel_parts):
+                continue
+            for name in filenames:
+                if os.path.splitext(name)[1].lower() in INDEX_EXTENSIONS:
+                    yield os.path.join(dirpath, name)
+
+
+class LocalIndex:
+    """
+    SQLite 持久化的增量倒排索引 + BM25 排序。
+    - postings 表以 (term, doc_id) 为聚簇主键，按词查倒排为一次范围扫描。
+    - update() 只重建 (mtime, size) 变化的文件，删除已消失的文件。
+    """
+
+    def __init__(self, db_path=DEFAULT_DB):
+        self.db_path = db_path
+        os.makedirs(os.path.dirname(os.path.abspath(db_path)), exist_ok=True)
+        self.conn = sqlite3.connect(db_path)
+        # WAL + NORMAL：批量写入不逐事务刷盘，读者不被写者阻塞
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.execute("PRAGMA cache_size=-65536")
+        self.conn.executescript(SCHEMA)
+        if self.conn.execute("PRAGMA user_version").fetchone()[0] != TOKENIZER_VERSION:
+            with self.conn:
+                self.conn.execute("DELETE FROM postings")
+                self.conn.execute("DELETE FROM docs")
+            self.conn.execute(f"PRAGMA user_version = {TOKENIZER_VERSION}")
+        self._lengths = None
+
+    def close(self):
+        self.conn.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def update(self, roots=None):
+        """增量更新索引，返回 {'added', 'updated', 'removed', 'unchanged', 'seconds'}。"""
+        t0 = time.perf_counter()
+        stats = {"added": 0, "updated": 0, "removed": 0, "unchanged": 0}
+        known = {path: (doc_id, mtime_ns, size) for doc_id, path, mtime_ns, size
+                 in self.conn.execute("SELECT id, path, mtime_ns, size FROM docs")}
+        seen = set()
+
+        with self.conn:
+            for path in discover_files(roots):
+                try:
+                    st = os.stat(path)
+                except OSError:
+                    continue
+                if st.st_size > MAX_FILE_BYTES:
+                    continue
+                seen.add(path)
+                prev = known.get(path)
+                if prev and prev[1] == st.st_mtime_ns and prev[2] == st.st_size:
+                    stats["unchanged"] += 1
+                    continue
+                if prev:
+                    self._delete(prev[0])
+                self._add(path, st)
+                stats["updated" if prev else "added"] += 1
+
+            # 显式 roots 只管理其下的文件；默认模式下全库同步
+            scope = None if roots is None else [os.path.abspath(r) for r in roots]
+            for path, (doc_id, _, _) in known.items():
+                if path in seen:
+                    continue
+                if scope is not None and not any(path == r or path.startswith(r.rstrip(os.sep) + os.sep) for r in scope):
+                    continue
+                self._delete(doc_id)
+                stats["removed"] += 1
+
+        self._lengths = None
+        stats["seconds"] = time.perf_counter() - t0
+        return stats
+
+    def _add(self, path, st):
+        text = read_document(path)
+        tf = Counter(tokenize(text, unigrams=True))
+        cur = self.conn.execute(
+            "INSERT INTO docs (path, mtime_ns, size, length, title) VALUES (?, ?, ?, ?, ?)",
+            (path, st.st_mtime_ns, st.st_size, sum(tf.values()), _title_of(text, path))
+        )
+        doc_id = cur.lastrowid
+        self.conn.executemany("INSERT INTO postings (term, doc_id, tf) VALUES (?, ?, ?)",
+                              ((term, doc_id, n) for term, n in tf.items()))
+
+    def _delete(self, doc_id):
+        self.conn.execute("DELETE FROM postings WHERE doc_id = ?", (doc_id,))
+        self.conn.execute("DELETE FROM docs WHERE id = ?", (doc_id,))
+
+    def _doc_lengths(self):
+        # 文档长度常驻内存 (数万文档仅数 MB)，避免每次查询回表
+        if self._lengths is None:
+            self._lengths = dict(self.conn.execute("SELECT id, length FROM docs"))
+        return self._lengths
+
+    def search(self, query, k=10, snippets=False):
+        """BM25 检索，返回 [{'path', 'title', 'score', ('snippet')}]，按得分降序。"""
+        terms = list(dict.fromkeys(tokenize(query)))
+        lengths = self._doc_lengths()
+        n_docs = len(lengths)
+        if not terms or not n_docs:
+            return []
+        avgdl = (sum(lengths.values()) / n_docs) or 1.0
+
+        scores = {}
+        for term in terms:
+            postings = self.conn.execute("SELECT doc_id, tf FROM postings WHERE term = ?", (term,)).fetchall()
+            if not postings:
+                continue
+            df = len(postings)
+            idf = math.log(1 + (n_docs - df + 0.5) / (df + 0.5))
+            for doc_id, tf in postings:
+                norm = BM25_K1 * (1 - BM25_B + BM25_B * lengths.get(doc_id, avgdl) / avgdl)
+                scores[doc_id] = scores.get(doc_id, 0.0) + idf * tf * (BM25_K1 + 1) / (tf + norm)
+
+        top = sorted(scores.items(), key=lambda x: x[1], reverse=True)[:k]
+        if not top:
+            return []
+        meta = {doc_id: (path, title) for doc_id, path, title in self.conn.execute(
+            f"SELECT id, path, title FROM docs WHERE id IN ({','.join('?' * len(top))})", [d for d, _ in top])}
+
+        results = []
+        for doc_id, score in top:
+            path, title = meta[doc_id]
+            hit = {"path": path, "title": title, "score": round(score, 4)}
+            if snippets:
+                hit["snippet"] = _snippet(path, query)
+            results.append(hit)
+        return results
+
+
+def _snippet(path, query, width=60):
+    """读取原文，取首个查询词命中处前后各 width 字符。"""
+    try:
+        text = read_document(path)
+    except OSError:
+        return ""
+    lowered = text.lower()
+    positions = [lowered.find(w) for w in TOKEN_RE.findall(query.lower())]
+    positions = [p for p in positions if p >= 0]
+    pos = min(positions) if positions else 0
+    start = max(0, pos - width)
+    return " ".join(text[start:pos + width].split())
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Local knowledge search (inverted index + BM25)")
+    parser.add_argument("--db", default=DEFAULT_DB, help="Index database path")
+    sub = parser.add_subparsers(dest="cmd", required=True)
+
+    p_index = sub.add_parser("index", help="Incrementally (re)index documents")
+    p_index.add_argument("--root", action="append", default=None, help="Directory or file to index (repeatable); default: repo reports/SOPs/research")
+
+    p_search = sub.add_parser("search", help="Query the index")
+    p_search.add_argument("query")
+    p_search.add_argument("-k", type=int, default=10, help="Number of results")
+    p_search.add_argument("--update", action="store_true", help="Incrementally re-index before searching")
+    p_search.add_argument("--root", action="append", default=None)
+    p_search.add_argument("--json", action="store_true", help="Print results as JSON")
+    args = parser.parse_args()
+
+    with LocalIndex(args.db) as index:
+        if args.cmd == "index" or args.update:
+            stats = index.update(args.root)
+            print(f">>> Indexed: +{stats['added']} ~{stats['updated']} -{stats['removed']} "
+                  f"(unchanged {stats['unchanged']}) in {stats['seconds']:.2f}s", file=sys.stderr)
+        if args.cmd == "search":
+            t0 = time.perf_counter()
+            hits = index.search(args.query, k=args.k, snippets=True)
+            elapsed_ms = (time.perf_counter() - t0) * 1000
+            if args.json:
+                print(json.dumps({"query": args.query, "ms": round(elapsed_ms, 2), "results": hits}, ensure_ascii=False, indent=2))
+            else:
+                for i, h in enumerate(hits, 1):
+                    print(f"{i}. [{h['score']:.2f}] {h['title']}\n   {h['path']}\n   {h['snippet']}")
+                print(f"--- {len(hits)} results in {elapsed_ms:.1f} ms ---")
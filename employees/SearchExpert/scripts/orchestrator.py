@@ -1,49 +1,46 @@
 import sys
 import json
-import subprocess
+import asyncio
+import argparse
 import os
 
-# 路径配置
+# 路径配置：抓取脚本以函数形式进程内导入，不再逐个起子进程
 SKILL_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 SCRIPTS_DIR = os.path.join(SKILL_ROOT, "scripts")
-VENV_PYTHON = os.path.abspath(os.path.join(SKILL_ROOT, "../../.venv/bin/python"))
+if SCRIPTS_DIR not in sys.path:
+    sys.path.insert(0, SCRIPTS_DIR)
 
-def run_script(script_name, args):
-    cmd = [VENV_PYTHON, os.path.join(SCRIPTS_DIR, script_name)] + args
-    try:
-        result = subprocess.run(cmd, capture_output=True, text=True, check=True)
-        return json.loads(result.stdout)
-    except subprocess.CalledProcessError as e:
-        return {"status": "error", "message": f"Script execution failed: {e.stderr}"}
-    except json.JSONDecodeError:
-        return {"status": "error", "message": "Invalid JSON output from script"}
-
-def main(url):
-    print(f"🔍 [Orchestrator] Starting deep research for: {url}")
-    
-    # 1. 无论如何，先抓取元数据 (L1)
-    metadata = run_script("fetch_metadata.py", [url])
+from fetch_metadata import get_metadata
+from fetch_transcript import get_transcript
+
+DEFAULT_CONCURRENCY = 4
+
+
+def log(msg):
+    # 进度信息走 stderr，stdout 只输出 JSON 结果
+    print(msg, file=sys.stderr, flush=True)
+
+
+def build_result(url, metadata, transcript_data):
+    """由元数据 (L1) 与字幕 (L2) 结果组装给主 Agent 的最终指令。"""
     title = metadata.get("title", "Unknown Title")
-    print(f"📄 [Metadata] Title: {title}")
+    log(f"📄 [Metadata] Title: {title}")
 
-    # 2. 尝试获取字幕 (L2)
-    transcript_data = run_script("fetch_transcript.py", [url])
-    
     context_source = ""
     context_content = ""
 
     if transcript_data.get("status") == "success":
-        print("✅ [Transcript] Successfully extracted video transcript.")
+        log("✅ [Transcript] Successfully extracted video transcript.")
         context_source = "Transcript"
         context_content = transcript_data.get("transcript")
     else:
-        print(f"⚠️ [Transcript] Failed/Unavailable: {transcript_data.get('message')}")
-        print("🔄 [Fallback] Switching to Metadata + Search Strategy...")
-        
+        log(f"⚠️ [Transcript] Failed/Unavailable: {transcript_data.get('message')}")
+        log("🔄 [Fallback] Switching to Metadata + Search Strategy...")
+
         # 3. 降级策略 (L3)
         context_source = "Metadata_and_Search"
         context_content = f"Title: {title}\nDescription: {metadata.get('description')}\n"
-        
+
         # 可以在这里提示主 Agent 去搜索，或者直接返回指令让主 Agent 去搜
         # 为了简单，我们这里返回一个特殊的标志，告诉主 Agent "我尽力了，剩下的你来搜"
 
@@ -70,11 +67,74 @@ def main(url):
             "please PERFORM A WEB SEARCH for this video title to find summaries or reviews, "
             "and then synthesize a report."
         )
+    return final_output
+
+
+async def _call(fn, url):
+    # 抓取函数为同步阻塞 IO，放到线程中执行；异常统一折算为 error 字典
+    try:
+        return await asyncio.to_thread(fn, url)
+    except Exception as e:
+        return {"status": "error", "message": f"{type(e).__name__}: {e}"}
+
+
+async def fetch_sources(url, metadata_fn=get_metadata, transcript_fn=get_transcript):
+    """元数据与字幕两路请求互不依赖，并发执行。返回 (metadata, transcript_data)。"""
+    return await asyncio.gather(_call(metadata_fn, url), _call(transcript_fn, url))
+
+
+async def research_url(url, semaphore, metadata_fn=get_metadata, transcript_fn=get_transcript):
+    async with semaphore:
+        log(f"🔍 [Orchestrator] Starting deep research for: {url}")
+        metadata, transcript_data = await fetch_sources(url, metadata_fn, transcript_fn)
+        return build_result(url, metadata, transcript_data)
+
+
+async def research_urls(urls, concurrency=DEFAULT_CONCURRENCY, on_result=None,
+                        metadata_fn=get_metadata, transcript_fn=get_transcript):
+    """
+    批量研究：同时处理的 URL 数不超过 concurrency。
+    每完成一个即回调 on_result(result)；返回按输入顺序排列的结果列表。
+    """
+    semaphore = asyncio.Semaphore(max(1, concurrency))
+
+    async def run(i, url):
+        result = await research_url(url, semaphore, metadata_fn, transcript_fn)
+        if on_result is not None:
+            on_result(result)
+        return i, result
+
+    results = [None] * len(urls)
+    for i, result in await asyncio.gather(*(run(i, u) for i, u in enumerate(urls))):
+        results[i] = result
+    return results
+
+
+def main(urls, concurrency=DEFAULT_CONCURRENCY):
+    if len(urls) == 1:
+        # 单 URL 保持原有的缩进 JSON 输出
+        result = asyncio.run(research_urls(urls, concurrency))[0]
+        print(json.dumps(result, ensure_ascii=False, indent=2))
+        return [result]
+    # 多 URL：每完成一个输出一行 JSON (JSON Lines)
+    emit = lambda r: print(json.dumps(r, ensure_ascii=False), flush=True)
+    return asyncio.run(research_urls(urls, concurrency, on_result=emit))
 
-    print(json.dumps(final_output, ensure_ascii=False, indent=2))
 
 if __name__ == "__main__":
-    if len(sys.argv) < 2:
-        print("Usage: python orchestrator.py <url>")
+    parser = argparse.ArgumentParser(description="WebResearcher orchestrator (metadata + transcript, concurrent)")
+    parser.add_argument("urls", nargs="*", help="One or more URLs")
+    parser.add_argument("--input", default=None, help="File with one URL per line ('-' for stdin)")
+    parser.add_argument("--concurrency", type=int, default=DEFAULT_CONCURRENCY, help="Max URLs processed at once")
+    args = parser.parse_args()
+
+    urls = list(args.urls)
+    if args.input:
+        stream = sys.stdin if args.input == "-" else open(args.input, encoding="utf-8")
+        with stream:
+            urls.extend(line.strip() for line in stream if line.strip() and not line.startswith("#"))
+
+    if not urls:
+        print("Usage: python orchestrator.py <url> [<url> ...] [--input urls.txt] [--concurrency N]")
     else:
-        main(sys.argv[1])
+        main(urls, args.concurrency)
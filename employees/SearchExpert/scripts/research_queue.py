@@ -0,0 +1,184 @@
+import sys
+import os
+import json
+import time
+import random
+import asyncio
+import argparse
+import tempfile
+from urllib.parse import urlsplit, urlunsplit
+
+from orchestrator import build_result, fetch_sources, log
+from fetch_metadata import get_metadata
+from fetch_transcript import get_transcript
+
+DEFAULT_WORKERS = 4
+DEFAULT_RETRIES = 3
+DEFAULT_BACKOFF = 1.0
+DEFAULT_HOST_INTERVAL = 1.0
+
+
+def normalize_url(url):
+    """去重键：去掉首尾空白与 #fragment，scheme/host 小写。"""
+    parts = urlsplit(url.strip())
+    return urlunsplit((parts.scheme.lower(), parts.netloc.lower(), parts.path, parts.query, ''))
+
+
+def read_urls(sources):
+    """从文件 (或 '-' 表示 stdin) 读取 URL，每行一个，忽略空行与 # 注释。"""
+    urls = []
+    for src in sources:
+        stream = sys.stdin if src == "-" else open(src, encoding="utf-8")
+        with stream:
+            urls.extend(line.strip() for line in stream if line.strip() and not line.lstrip().startswith("#"))
+    return urls
+
+
+def dedupe(urls):
+    seen, unique = set(), []
+    for url in urls:
+        key = normalize_url(url)
+        if key not in seen:
+            seen.add(key)
+            unique.append(url)
+    return unique
+
+
+class HostRateLimiter:
+    """同一 host 的相邻请求间隔不小于 interval 秒 (不同 host 互不影响)。"""
+
+    def __init__(self, interval=DEFAULT_HOST_INTERVAL):
+        self.interval = interval
+        self._locks = {}
+        self._last = {}
+
+    async def wait(self, host):
+        if self.interval <= 0:
+            return
+        lock = self._locks.setdefault(host, asyncio.Lock())
+        async with lock:
+            delay = self._last.get(host, 0.0) + self.interval - time.monotonic()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            self._last[host] = time.monotonic()
+
+
+def load_checkpoint(output_path):
+    """读取已有 JSONL 产物：返回 {去重键: 最后一条记录}。status 为 ok 的 URL 续跑时跳过。"""
+    done = {}
+    if not os.path.exists(output_path):
+        return done
+    with open(output_path, 'r', encoding='utf-8') as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+            except ValueError:
+                continue  # 中断时可能残留半行
+            if isinstance(record, dict) and record.get("target_url"):
+                done[normalize_url(record["target_url"])] = record
+    return done
+
+
+def compact_output(output_path, order):
+    """合并产物：每个 URL 只保留最后一条记录，按输入顺序排列，原子替换。"""
+    records = load_checkpoint(output_path)
+    rank = {normalize_url(u): i for i, u in enumerate(order)}
+    keys = sorted(records, key=lambda k: rank.get(k, len(rank)))
+    dir_name = os.path.dirname(os.path.abspath(output_path))
+    fd, tmp_path = tempfile.mkstemp(dir=dir_name, prefix=".tmp_", suffix=".jsonl")
+    try:
+        with os.fdopen(fd, 'w', encoding='utf-8') as f:
+            for k in keys:
+                f.write(json.dumps(records[k], ensure_ascii=False) + "\n")
+        os.replace(tmp_path, output_path)
+    except BaseException:
+        if os.path.exists(tmp_path): os.remove(tmp_path)
+        raise
+
+
+async def research_with_retry(url, limiter, retries=DEFAULT_RETRIES, backoff=DEFAULT_BACKOFF,
+                              metadata_fn=get_metadata, transcript_fn=get_transcript):
+    """元数据抓取失败视为可重试错误 (字幕缺失属正常降级，不重试)，指数退避加抖动。"""
+    host = urlsplit(url).netloc.lower()
+    error = None
+    for attempt in range(1, retries + 2):
+        await limiter.wait(host)
+        metadata, transcript_data = await fetch_sources(url, metadata_fn, transcript_fn)
+        error = metadata.get("error") or (metadata.get("message") if metadata.get("status") == "error" else None)
+        if not error:
+            result = build_result(url, metadata, transcript_data)
+            result.update(status="ok", attempts=attempt)
+            return result
+        if attempt <= retries:
+            delay = backoff * 2 ** (attempt - 1) * (1 + random.random() * 0.25)
+            log(f"↻ [Queue] {url} failed ({error}), retry {attempt}/{retries} in {delay:.1f}s")
+            await asyncio.sleep(delay)
+    return {"target_url": url, "status": "error", "error": error, "attempts": retries + 1}
+
+
+async def run_queue(urls, output_path, workers=DEFAULT_WORKERS, retries=DEFAULT_RETRIES,
+                    backoff=DEFAULT_BACKOFF, host_interval=DEFAULT_HOST_INTERVAL, resume=True,
+                    metadata_fn=get_metadata, transcript_fn=get_transcript):
+    """
+    队列驱动的批量研究：去重 -> 跳过已完成 -> 固定数量 worker 消费队列。
+    每条结果完成即追加写入 JSONL (即检查点)，结束后合并为每 URL 一条。返回统计字典。
+    """
+    urls = dedupe(urls)
+    done = load_checkpoint(output_path) if resume else {}
+    if not resume and os.path.exists(output_path):
+        os.remove(output_path)
+    pending = [u for u in urls if done.get(normalize_url(u), {}).get("status") != "ok"]
+    stats = {"total": len(urls), "skipped": len(urls) - len(pending), "ok": 0, "error": 0}
+    log(f"📥 [Queue] {stats['total']} unique URLs, {stats['skipped']} already done, {len(pending)} to process")
+
+    queue = asyncio.Queue()
+    for url in pending:
+        queue.put_nowait(url)
+    limiter = HostRateLimiter(host_interval)
+    out_dir = os.path.dirname(os.path.abspath(output_path))
+    os.makedirs(out_dir, exist_ok=True)
+
+    with open(output_path, 'a', encoding='utf-8') as out:
+        async def worker():
+            while True:
+                try:
+                    url = queue.get_nowait()
+                except asyncio.QueueEmpty:
+                    return
+                try:
+                    record = await research_with_retry(url, limiter, retries, backoff, metadata_fn, transcript_fn)
+                except Exception as e:
+                    record = {"target_url": url, "status": "error", "error": f"{type(e).__name__}: {e}", "attempts": 0}
+                # 单线程事件循环内写入，无需加锁；逐条 flush 保证中断后可续跑
+                out.write(json.dumps(record, ensure_ascii=False) + "\n")
+                out.flush()
+                stats[record["status"]] += 1
+                queue.task_done()
+
+        await asyncio.gather(*(worker() for _ in range(max(1, min(workers, len(pending) or 1)))))
+
+    compact_output(output_path, urls)
+    log(f"✅ [Queue] ok {stats['ok']} | error {stats['error']} | skipped {stats['skipped']} -> {output_path}")
+    return stats
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Batch WebResearcher queue (dedup, worker pool, retry, resume)")
+    parser.add_argument("urls", nargs="*", help="URLs to research")
+    parser.add_argument("--input", action="append", default=[], help="File with one URL per line ('-' for stdin); repeatable")
+    parser.add_argument("--output", required=True, help="Consolidated JSONL output (also the resume checkpoint)")
+    parser.add_argument("--workers", type=int, default=DEFAULT_WORKERS)
+    parser.add_argument("--retries", type=int, default=DEFAULT_RETRIES, help="Retries per URL on metadata failure")
+    parser.add_argument("--backoff", type=float, default=DEFAULT_BACKOFF, help="Base backoff seconds (doubles per retry)")
+    parser.add_argument("--host-interval", type=float, default=DEFAULT_HOST_INTERVAL, help="Min seconds between requests to one host")
+    parser.add_argument("--no-resume", action="store_true", help="Ignore existing output and start over")
+    args = parser.parse_args()
+
+    all_urls = list(args.urls) + read_urls(args.input)
+    if not all_urls:
+        parser.error("no URLs given (positional or --input)")
+    stats = asyncio.run(run_queue(
+        all_urls, args.output, workers=args.workers, retries=args.retries, backoff=args.backoff,
+        host_interval=args.host_interval, resume=not args.no_resume
+    ))
+    print(json.dumps(stats, ensure_ascii=False))
@@ -0,0 +1,212 @@
+import re
+from collections import Counter, deque
+
+# 流式扫描时单段最大缓冲：找不到换行时在最后一个空白处切分，避免无界增长
+MAX_SEGMENT_CHARS = 1024 * 1024
+
+
+class AhoCorasick:
+    """
+    多模式串匹配自动机：一次线性扫描报告所有 (可重叠的) 词典命中。
+    在根状态时用首字符集合的正则跳过不可能起始的字符 (C 层扫描)，纯 Python 循环只处理候选位置。
+    """
+
+    def __init__(self, terms):
+        self.terms = list(dict.fromkeys(t for t in terms if t))
+        self._lens = [len(t) for t in self.terms]
+        goto, fail, out = [{}], [0], [[]]
+        for tid, term in enumerate(self.terms):
+            s = 0
+            for ch in term:
+                nxt = goto[s].get(ch)
+                if nxt is None:
+                    nxt = len(goto)
+                    goto[s][ch] = nxt
+                    goto.append({})
+                    fail.append(0)
+                    out.append([])
+                s = nxt
+            out[s].append(tid)
+
+        queue = deque(goto[0].values())
+        while queue:
+            s = queue.popleft()
+            for ch, t in goto[s].items():
+                queue.append(t)
+                f = fail[s]
+                while f and ch not in goto[f]:
+                    f = fail[f]
+                fail[t] = goto[f].get(ch, 0)
+                if out[fail[t]]:
+                    out[t] = out[t] + out[fail[t]]
+
+        self._goto, self._fail, self._out = goto, fail, out
+        self._first = re.compile('[' + ''.join(re.escape(c) for c in goto[0]) + ']') if goto[0] else None
+
+    def feed(self, text, offset=0, state=0):
+        """
+        扫描一段文本，返回 (hits, state)。hits 为 [(start, end, term_id)]，位置为全局偏移。
+        state 传给下一段即可跨段匹配 (流式)。
+        """
+        hits = []
+        if self._first is None:
+            return hits, 0
+        goto, fail, out, lens = self._goto, self._fail, self._out, self._lens
+        skip = self._first.search
+        i, n = 0, len(text)
+        while i < n:
+            if state == 0:
+                m = skip(text, i)
+                if m is None:
+                    break
+                i = m.start()
+            ch = text[i]
+            while state and ch not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(ch, 0)
+            if out[state]:
+                end = offset + i + 1
+                for tid in out[state]:
+                    hits.append((end - lens[tid], end, tid))
+            i += 1
+        return hits, state
+
+
+class ScanResult:
+    """按类别汇总的命中：次数、词频、位置 (可选)。"""
+
+    def __init__(self, categories, keep_positions=True):
+        self.keep_positions = keep_positions
+        self.counts = {c: Counter() for c in categories}
+        self.positions = {c: [] for c in categories}
+
+    def add(self, category, term, start, end):
+        self.counts[category][term] += 1
+        if self.keep_positions:
+            self.positions[category].append((start, end, term))
+
+    def terms(self, category):
+        """按首次出现顺序返回去重后的命中词。"""
+        return list(self.counts[category].keys())
+
+    def to_dict(self):
+        result = {}
+        for c, counter in self.counts.items():
+            entry = {"count": sum(counter.values()), "terms": dict(counter)}
+            if self.keep_positions:
+                entry["positions"] = sorted(self.positions[c])
+            result[c] = entry
+        return result
+
+
+class TextScanner:
+    """
+    编译一次、多次复用的文本扫描器：
+    - dictionaries {类别: 词表}：全部词合并进一个 Aho–Corasick 自动机，一趟扫描得到所有类别的命中。
+    - patterns {类别: 正则}：无分组的正则合并为一个前瞻门控正则，只在至少一个类别可能命中的位置逐类匹配
+      (带分组或自带不同标志的预编译正则单独扫描)，
+      每个类别的结果与对全文单独 re.findall 一致 (同类别内不重叠、从左到右)。
+    """
+
+    def __init__(self, dictionaries=None, patterns=None, ignore_case=False, keep_positions=True):
+        self.ignore_case = ignore_case
+        self.keep_positions = keep_positions
+        dictionaries = dictionaries or {}
+        patterns = patterns or {}
+        self.categories = list(dict.fromkeys(list(dictionaries) + list(patterns)))
+
+        # 词 -> 所属类别 (同一个词可属于多个类别)
+        term_categories, display = {}, {}
+        for category, terms in dictionaries.items():
+            for term in terms:
+                key = term.lower() if ignore_case else term
+                if not key:
+                    continue
+                owners = term_categories.setdefault(key, [])
+                if category not in owners:
+                    owners.append(category)
+                display.setdefault(key, term)
+        self._automaton = AhoCorasick(term_categories.keys())
+        self._term_info = [(display[t], term_categories[t]) for t in self._automaton.terms]
+
+        flags = re.IGNORECASE if ignore_case else 0
+        self._patterns = [(c, re.compile(p, flags) if isinstance(p, str) else p) for c, p in patterns.items()]
+        # 只有无分组、标志与门控一致的正则才能拼进门控 (否则会丢标志、错位反向引用)，其余单独 finditer
+        gate_flags = re.compile('', flags).flags
+        self._gated = [(c, p) for c, p in self._patterns if p.groups == 0 and p.flags == gate_flags]
+        self._separate = [(c, p) for c, p in self._patterns if (c, p) not in self._gated]
+        self._gate = None
+        if self._gated:
+            alternatives = '|'.join(f'(?:{p.pattern})' for _, p in self._gated)
+            self._gate = re.compile(f'(?=(?:{alternatives}))', flags)
+
+    def _scan_patterns(self, text, offset, result):
+        for category, pattern in self._separate:
+            for m in pattern.finditer(text):
+                result.add(category, m.group(0), offset + m.start(), offset + m.end())
+        if self._gate is None:
+            return
+        next_allowed = {c: 0 for c, _ in self._gated}
+        for gate in self._gate.finditer(text):
+            pos = gate.start()
+            for category, pattern in self._gated:
+                if pos < next_allowed[category]:
+                    continue
+                m = pattern.match(text, pos)
+                if m is None:
+                    continue
+                result.add(category, m.group(0), offset + pos, offset + m.end())
+                next_allowed[category] = m.end() if m.end() > pos else pos + 1
+
+    def _scan_dictionary(self, text, offset, state, result):
+        hits, state = self._automaton.feed(text.lower() if self.ignore_case else text, offset, state)
+        for start, end, tid in hits:
+            term, categories = self._term_info[tid]
+            for category in categories:
+                result.add(category, term, start, end)
+        return state
+
+    def scan(self, text):
+        """扫描整段文本，返回 ScanResult。"""
+        result = ScanResult(self.categories, self.keep_positions)
+        self._scan_dictionary(text, 0, 0, result)
+        if self._patterns:
+            self._scan_patterns(text, 0, result)
+        return result
+
+    def scan_stream(self, chunks, on_segment=None):
+        """
+        流式扫描任意大小的文本 (文件对象或字符串块迭代器)，内存只保留一个段。
+        词典命中通过自动机状态跨段连续；正则按换行切段 (正则类别不应跨行匹配)。
+        on_segment(segment) 可在同一趟中做额外统计。
+        """
+        result = ScanResult(self.categories, self.keep_positions)
+        state, offset, buf = 0, 0, ''
+
+        def process(segment):
+            nonlocal state, offset
+            state = self._scan_dictionary(segment, offset, state, result)
+            if self._patterns:
+                self._scan_patterns(segment, offset, result)
+            if on_segment is not None:
+                on_segment(segment)
+            offset += len(segment)
+
+        for chunk in chunks:
+            buf += chunk
+            cut = buf.rfind('\n') + 1
+            if not cut and len(buf) > MAX_SEGMENT_CHARS:
+                ws = max(buf.rfind(' '), buf.rfind('\t'))
+                cut = ws + 1 if ws >= 0 else len(buf)
+            if cut:
+                process(buf[:cut])
+                buf = buf[cut:]
+        if buf:
+            process(buf)
+        return result
+
+
+def load_terms(path):
+    """读取词表文件：每行一个词，忽略空行与 # 注释。"""
+    with open(path, 'r', encoding='utf-8') as f:
+        return [line.strip() for line in f if line.strip() and not line.startswith('#')]
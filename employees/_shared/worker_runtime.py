@@ -0,0 +1,438 @@
+"""
+常驻 worker 运行时：预先导入 pandas / numpy / scipy / matplotlib 的进程池，
+把员工脚本的入口当作作业执行 (JSON 进、JSON 出)，串联多脚本工作流时不再每步重复付出数秒的导入开销。
+
+作业 (一行一个 JSON)：
+  {"id": "1", "script": "DataAnalyst/scripts/trend_break_analyzer.py", "argv": ["--panel", "p.csv", ...]}
+  {"id": "2", "script": "MarketingExpert/scripts/narrator.py", "function": "generate_prompts", "kwargs": {...}}
+script 为相对 employees/ 的路径 (或其下的绝对路径)；给出 function 时调用模块函数，否则以 __main__ 方式运行脚本。
+结果：{"id", "ok", "result", "exit_code", "stdout", "stderr", "error", "seconds"}。
+
+用法：
+  python worker_runtime.py serve [--socket PATH] [--workers N]    # 本地 Unix socket 常驻服务
+  python worker_runtime.py stdio [--workers N]                     # 经管道：stdin 读作业，stdout 写结果
+  python worker_runtime.py run SCRIPT [-- ARGV...]                 # 提交单个作业 (服务未启动时自动拉起)
+  python worker_runtime.py batch JOBS.jsonl                        # 提交一批作业
+"""
+import sys
+import os
+import io
+import json
+import time
+import runpy
+import socket
+import hashlib
+import argparse
+import threading
+import traceback
+import subprocess
+import contextlib
+import socketserver
+import importlib
+import importlib.util
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+EMPLOYEES_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SOCKET_PATH = os.environ.get("EMPLOYEE_WORKER_SOCKET",
+                             os.path.join("/tmp", f"employee_worker-{os.getuid() if hasattr(os, 'getuid') else 0}.sock"))
+PRELOAD = ["numpy", "pandas", "scipy.stats", "matplotlib", "matplotlib.pyplot"]
+DEFAULT_WORKERS = os.cpu_count() or 1
+
+
+def log(msg):
+    print(msg, file=sys.stderr, flush=True)
+
+
+def _warm_up(modules=PRELOAD):
+    """预导入重型依赖；matplotlib 固定为无界面后端。缺失的依赖跳过。"""
+    os.environ.setdefault("MPLBACKEND", "Agg")
+    loaded = []
+    for name in modules:
+        try:
+            importlib.import_module(name)
+            loaded.append(name)
+        except ImportError:
+            pass
+    return loaded
+
+
+def _resolve_script(script):
+    path = os.path.realpath(script if os.path.isabs(script) else os.path.join(EMPLOYEES_DIR, script))
+    if os.path.commonpath([path, os.path.realpath(EMPLOYEES_DIR)]) != os.path.realpath(EMPLOYEES_DIR):
+        raise ValueError(f"script 必须位于 employees/ 目录下: {script}")
+    if not os.path.isfile(path):
+        raise FileNotFoundError(script)
+    return path
+
+
+_modules = {}
+
+
+def _load_module(path):
+    """按 (路径, mtime) 缓存脚本模块；脚本所在目录加入 sys.path，兄弟模块 (如 eda_toolkit) 只导入一次。"""
+    stamp = os.stat(path).st_mtime_ns
+    cached = _modules.get(path)
+    if cached and cached[0] == stamp:
+        return cached[1]
+    script_dir = os.path.dirname(path)
+    if script_dir not in sys.path:
+        sys.path.insert(0, script_dir)
+    name = "_job_" + os.path.splitext(os.path.basename(path))[0] + "_" + hashlib.md5(path.encode()).hexdigest()[:8]
+    spec = importlib.util.spec_from_file_location(name, path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    _modules[path] = (stamp, module)
+    return module
+
+
+def _run_main(path, argv):
+    """以 __main__ 方式运行脚本 (等价于 python script.py argv...)，返回退出码。"""
+    script_dir = os.path.dirname(path)
+    saved_argv, saved_path = sys.argv, list(sys.path)
+    sys.argv = [path] + [str(a) for a in argv]
+    sys.path.insert(0, script_dir)
+    try:
+        runpy.run_path(path, run_name="__main__")
+        return 0
+    except SystemExit as e:
+        if e.code is None:
+            return 0
+        return e.code if isinstance(e.code, int) else 1
+    finally:
+        sys.argv, sys.path[:] = saved_argv, saved_path
+
+
+def _jsonable(obj):
+    """结果转为可 JSON 序列化的结构：DataFrame -> records，Series -> dict，numpy 标量 -> Python 标量。"""
+    if obj is None or isinstance(obj, (bool, int, float, str)):
+        return obj
+    if isinstance(obj, dict):
+        return {str(k): _jsonable(v) for k, v in obj.items()}
+    if isinstance(obj, (list, tuple, set)):
+        return [_jsonable(v) for v in obj]
+    if hasattr(obj, "to_dict") and hasattr(obj, "columns"):
+        return _jsonable(obj.to_dict(orient="records"))
+    if hasattr(obj, "to_dict"):
+        return _jsonable(obj.to_dict())
+    if hasattr(obj, "tolist"):
+        return _jsonable(obj.tolist())
+    if hasattr(obj, "item"):
+        return obj.item()
+    return str(obj)
+
+
+def execute_job(job):
+    """在 worker 进程内执行一个作业，捕获 stdout/stderr 与异常，始终返回结果 dict。"""
+    t0 = time.perf_counter()
+    out, err = io.StringIO(), io.StringIO()
+    response = {"id": job.get("id"), "ok": False, "result": None, "exit_code": None}
+    cwd = os.getcwd()
+    try:
+        path = _resolve_script(job["script"])
+        if job.get("cwd"):
+            os.chdir(job["cwd"])
+        with contextlib.redirect_stdout(out), contextlib.redirect_stderr(err):
+            if job.get("function"):
+                func = getattr(_load_module(path), job["function"])
+                response["result"] = _jsonable(func(*job.get("args", []), **job.get("kwargs", {})))
+                response["exit_code"] = 0
+            else:
+                response["exit_code"] = _run_main(path, job.get("argv", []))
+        response["ok"] = response["exit_code"] == 0
+    except Exception as e:
+        response["error"] = f"{type(e).__name__}: {e}"
+        response["traceback"] = traceback.format_exc()
+    finally:
+        os.chdir(cwd)
+        plt = sys.modules.get("matplotlib.pyplot")
+        if plt is not None:
+            plt.close("all")
+    response["stdout"] = out.getvalue()
+    response["stderr"] = err.getvalue()
+    response["seconds"] = round(time.perf_counter() - t0, 3)
+    return response
+
+
+def _ping(_=None):
+    return os.getpid()
+
+
+class WorkerPool:
+    """
+    预热的进程池。POSIX 下使用 forkserver 并预加载重型依赖，worker 由已导入依赖的模板进程 fork 出来；
+    worker 常驻复用，某个作业崩溃导致进程池损坏时自动重建。
+    """
+
+    def __init__(self, workers=DEFAULT_WORKERS, preload=PRELOAD):
+        self.workers = max(1, workers)
+        self.preload = list(preload)
+        self._lock = threading.Lock()
+        self._isolate_lock = threading.Lock()
+        self._pool = self._create(self.workers)
+
+    def _create(self, workers):
+        ctx = None
+        if "forkserver" in multiprocessing.get_all_start_methods():
+            ctx = multiprocessing.get_context("forkserver")
+            ctx.set_forkserver_preload(self.preload)
+        pool = ProcessPoolExecutor(max_workers=workers, mp_context=ctx,
+                                   initializer=_warm_up, initargs=(self.preload,))
+        list(pool.map(_ping, range(workers)))
+        return pool
+
+    def submit(self, job, callback):
+        """
+        提交作业；完成时以结果 dict 调用 callback (在池的回调线程或隔离重试线程中)。
+        进程池损坏时同批在途的作业都会失败，无法区分是谁导致的崩溃：池重建后，
+        受影响的作业逐个放到独立的单进程池中重试，只有自身再次崩溃的作业才报告失败。
+        """
+        def done(fut):
+            try:
+                callback(fut.result())
+            except BrokenProcessPool:
+                self._rebuild(pool)
+                threading.Thread(target=self._run_isolated, args=(job, callback), daemon=True).start()
+            except Exception as e:
+                callback({"id": job.get("id"), "ok": False, "error": f"{type(e).__name__}: {e}"})
+
+        with self._lock:
+            pool = self._pool
+        try:
+            fut = pool.submit(execute_job, job)
+        except BrokenProcessPool:
+            pool = self._rebuild(pool)
+            fut = pool.submit(execute_job, job)
+        fut.add_done_callback(done)
+        return fut
+
+    def _run_isolated(self, job, callback):
+        """在一次性的单 worker 进程池中串行重试，崩溃只影响该作业本身。"""
+        with self._isolate_lock:
+            pool = None
+            try:
+                pool = self._create(1)
+                response = pool.submit(execute_job, job).result()
+            except BrokenProcessPool as e:
+                response = {"id": job.get("id"), "ok": False, "error": f"worker 进程异常退出: {e}"}
+            except Exception as e:
+                response = {"id": job.get("id"), "ok": False, "error": f"{type(e).__name__}: {e}"}
+            finally:
+                if pool is not None:
+                    pool.shutdown(wait=False, cancel_futures=True)
+        callback(response)
+
+    def _rebuild(self, broken):
+        with self._lock:
+            if self._pool is broken:
+                log("⚠️ [worker_runtime] 进程池损坏，正在重建")
+                broken.shutdown(wait=False, cancel_futures=True)
+                self._pool = self._create(self.workers)
+            return self._pool
+
+    def shutdown(self):
+        self._pool.shutdown(wait=True)
+
+
+def _reply_and_set(reply, response, written):
+    try:
+        reply(response)
+    finally:
+        written.set()
+
+
+def _serve_lines(pool, read_line, write_line):
+    """按行读取作业并发派发，结果完成即写回 (乱序，以 id 对应)；读到 EOF 后等待全部完成。"""
+    write_lock = threading.Lock()
+    pending = []
+    seq = 0
+
+    def reply(response):
+        with write_lock:
+            write_line(json.dumps(response, ensure_ascii=False))
+
+    while True:
+        line = read_line()
+        if not line:
+            break
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            job = json.loads(line)
+        except ValueError as e:
+            reply({"id": None, "ok": False, "error": f"无效的作业 JSON: {e}"})
+            continue
+        seq += 1
+        job.setdefault("id", str(seq))
+        op = job.get("op")
+        if op == "ping":
+            reply({"id": job["id"], "ok": True, "result": {"pid": os.getpid(), "workers": pool.workers}})
+        elif op == "shutdown":
+            reply({"id": job["id"], "ok": True})
+            return "shutdown"
+        else:
+            # future 完成时先唤醒等待者、后执行回调，因此以“结果已写回”作为完成信号
+            written = threading.Event()
+            pending.append(written)
+            pool.submit(job, lambda response, written=written: _reply_and_set(reply, response, written))
+    for written in pending:
+        written.wait()
+
+
+def serve(socket_path=SOCKET_PATH, workers=DEFAULT_WORKERS, preload=PRELOAD):
+    """本地 Unix socket 服务：每个连接一条线程，连接内作业以 JSON Lines 流水线提交。"""
+    pool = WorkerPool(workers, preload)
+    if os.path.exists(socket_path):
+        os.unlink(socket_path)
+
+    class Handler(socketserver.StreamRequestHandler):
+        def handle(self):
+            def write_line(text):
+                self.wfile.write(text.encode("utf-8") + b"\n")
+                self.wfile.flush()
+            try:
+                status = _serve_lines(pool, lambda: self.rfile.readline().decode("utf-8"), write_line)
+            except (BrokenPipeError, ConnectionResetError):
+                return
+            if status == "shutdown":
+                threading.Thread(target=server.shutdown, daemon=True).start()
+
+    class Server(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+        daemon_threads = True
+
+    server = Server(socket_path, Handler)
+    os.chmod(socket_path, 0o600)
+    log(f"✅ [worker_runtime] 监听 {socket_path}，worker 数 {pool.workers}")
+    try:
+        server.serve_forever()
+    finally:
+        server.server_close()
+        pool.shutdown()
+        if os.path.exists(socket_path):
+            os.unlink(socket_path)
+
+
+def serve_stdio(workers=DEFAULT_WORKERS, preload=PRELOAD):
+    """管道模式：stdin 逐行读作业，stdout 逐行写结果 (作业内的打印已被捕获，不会混入)。"""
+    pool = WorkerPool(workers, preload)
+    stdout = sys.stdout
+
+    def write_line(text):
+        stdout.write(text + "\n")
+        stdout.flush()
+    try:
+        _serve_lines(pool, sys.stdin.readline, write_line)
+    finally:
+        pool.shutdown()
+
+
+class WorkerClient:
+    """Unix socket 客户端：一个连接内流水线提交多个作业，按提交顺序返回结果。"""
+
+    def __init__(self, socket_path=SOCKET_PATH, timeout=None):
+        self.socket_path = socket_path
+        self.timeout = timeout
+
+    def run_many(self, jobs):
+        jobs = [dict(job, id=str(job.get("id", n))) for n, job in enumerate(jobs)]
+        with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+            sock.settimeout(self.timeout)
+            sock.connect(self.socket_path)
+            sock.sendall("".join(json.dumps(j, ensure_ascii=False) + "\n" for j in jobs).encode("utf-8"))
+            sock.shutdown(socket.SHUT_WR)
+            results = {}
+            with sock.makefile("r", encoding="utf-8") as f:
+                for line in f:
+                    response = json.loads(line)
+                    results[response.get("id")] = response
+        return [results.get(j["id"], {"id": j["id"], "ok": False, "error": "连接中断，未收到结果"}) for j in jobs]
+
+    def run(self, script, argv=None, function=None, kwargs=None, cwd=None):
+        job = {"script": script}
+        if function:
+            job.update(function=function, kwargs=kwargs or {})
+        else:
+            job["argv"] = list(argv or [])
+        if cwd:
+            job["cwd"] = cwd
+        return self.run_many([job])[0]
+
+    def ping(self):
+        try:
+            return self.run_many([{"op": "ping"}])[0].get("ok", False)
+        except OSError:
+            return False
+
+
+def ensure_server(socket_path=SOCKET_PATH, workers=DEFAULT_WORKERS, wait=60.0):
+    """服务未运行时在后台拉起，并等待其可用；返回客户端。"""
+    client = WorkerClient(socket_path)
+    if client.ping():
+        return client
+    subprocess.Popen(
+        [sys.executable, os.path.abspath(__file__), "serve", "--socket", socket_path, "--workers", str(workers)],
+        stdin=subprocess.DEVNULL, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL, start_new_session=True
+    )
+    deadline = time.time() + wait
+    while time.time() < deadline:
+        time.sleep(0.2)
+        if client.ping():
+            return client
+    raise TimeoutError(f"worker 服务未能在 {wait}s 内启动: {socket_path}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="常驻 worker 运行时：预导入依赖，以作业方式执行员工脚本")
+    sub = parser.add_subparsers(dest="cmd", required=True)
+
+    p_serve = sub.add_parser("serve", help="Unix socket 常驻服务")
+    p_serve.add_argument("--socket", default=SOCKET_PATH)
+    p_serve.add_argument("--workers", type=int, default=DEFAULT_WORKERS)
+
+    p_stdio = sub.add_parser("stdio", help="管道模式：stdin 作业 -> stdout 结果")
+    p_stdio.add_argument("--workers", type=int, default=DEFAULT_WORKERS)
+
+    p_run = sub.add_parser("run", help="提交单个脚本作业")
+    p_run.add_argument("script", help="相对 employees/ 的脚本路径")
+    p_run.add_argument("argv", nargs=argparse.REMAINDER, help="传给脚本的参数 (置于 -- 之后)")
+    p_run.add_argument("--socket", default=SOCKET_PATH)
+    p_run.add_argument("--cwd", default=None, help="作业工作目录 (默认当前目录)")
+
+    p_batch = sub.add_parser("batch", help="提交 JSON Lines 作业文件 (- 为 stdin)")
+    p_batch.add_argument("jobs")
+    p_batch.add_argument("--socket", default=SOCKET_PATH)
+
+    p_stop = sub.add_parser("stop", help="停止服务")
+    p_stop.add_argument("--socket", default=SOCKET_PATH)
+
+    args = parser.parse_args()
+
+    if args.cmd == "serve":
+        serve(args.socket, args.workers)
+    elif args.cmd == "stdio":
+        serve_stdio(args.workers)
+    elif args.cmd == "run":
+        argv = args.argv[1:] if args.argv[:1] == ["--"] else args.argv
+        response = ensure_server(args.socket).run(args.script, argv=argv, cwd=args.cwd or os.getcwd())
+        sys.stdout.write(response.get("stdout") or "")
+        sys.stderr.write(response.get("stderr") or "")
+        if response.get("error"):
+            log(response.get("traceback") or response["error"])
+        sys.exit(response.get("exit_code") or (0 if response.get("ok") else 1))
+    elif args.cmd == "batch":
+        f = sys.stdin if args.jobs == "-" else open(args.jobs, "r", encoding="utf-8")
+        with f:
+            jobs = [json.loads(line) for line in f if line.strip()]
+        cwd = os.getcwd()
+        jobs = [dict(job, cwd=job.get("cwd", cwd)) for job in jobs]
+        for response in ensure_server(args.socket).run_many(jobs):
+            print(json.dumps(response, ensure_ascii=False))
+    elif args.cmd == "stop":
+        client = WorkerClient(args.socket)
+        if client.ping():
+            client.run_many([{"op": "shutdown"}])
+            log("✅ [worker_runtime] 已停止")
+        else:
+            log("worker 服务未运行")
@@ -0,0 +1,158 @@
+import os
+import sys
+import json
+import time
+import inspect
+import argparse
+import tracemalloc
+from dataclasses import dataclass, asdict
+from datetime import datetime
+from typing import Callable, Dict, List, Optional, Tuple
+
+import pandas as pd
+
+from order_analysis.src.utils.synthetic_data import generate_k5_frame
+from order_analysis.src.core.metrics import MetricEngine
+from order_analysis.src.core.channel_analyzer import ChannelAnalyzer
+from order_analysis.src.core.cube_analyzer import CubeAnalyzer
+from order_analysis.src.core.basket_analyzer import BasketAnalyzer
+from order_analysis.src.strategies.overview_strategy import OverviewStrategy
+from order_analysis.src.strategies.product_strategy import ProductStrategy
+from order_analysis.src.strategies.pricing_strategy import PricingStrategy
+from order_analysis.src.strategies.temporal_strategy import TemporalStrategy
+from order_analysis.src.strategies.basket_strategy import BasketStrategy
+
+BENCH_TARGETS = [
+    MetricEngine, ChannelAnalyzer, CubeAnalyzer, BasketAnalyzer,
+    OverviewStrategy, ProductStrategy, PricingStrategy, TemporalStrategy, BasketStrategy,
+]
+
+# 以 "x" 的倍数判定回归 (当前耗时 / 基线耗时)
+REGRESSION_RATIO = 1.2
+
+
+@dataclass
+class BenchResult:
+    name: str
+    rows: int
+    seconds: float
+    rows_per_sec: float
+    peak_mem_mb: Optional[float]
+    error: Optional[str] = None
+
+
+def discover_methods(targets=BENCH_TARGETS) -> List[Tuple[str, Callable]]:
+    """收集所有公开的静态分析方法 (首参均为交易 DataFrame)。"""
+    methods = []
+    for cls in targets:
+        for name, fn in inspect.getmembers(cls, predicate=inspect.isfunction):
+            if name.startswith('_'): continue
+            methods.append((f"{cls.__name__}.{name}", fn))
+    return methods
+
+
+def time_call(fn: Callable, df: pd.DataFrame, repeat: int, track_memory: bool) -> Tuple[float, Optional[float]]:
+    """返回 (最优耗时秒数, 峰值内存 MB)。内存追踪单独跑一轮，避免 tracemalloc 污染计时。"""
+    best = float('inf')
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        fn(df)
+        best = min(best, time.perf_counter() - t0)
+
+    peak_mb = None
+    if track_memory:
+        tracemalloc.start()
+        try:
+            fn(df)
+            _, peak = tracemalloc.get_traced_memory()
+            peak_mb = peak / 1024 / 1024
+        finally:
+            tracemalloc.stop()
+    return best, peak_mb
+
+
+def run_suite(scales: List[int], repeat: int = 1, track_memory: bool = True,
+              pattern: Optional[str] = None, seed: int = 42) -> List[BenchResult]:
+    methods = discover_methods()
+    if pattern:
+        methods = [(n, f) for n, f in methods if pattern in n]
+
+    results = []
+    for n_rows in scales:
+        print(f">>> Generating synthetic K5 frame: {n_rows:,} rows")
+        df = generate_k5_frame(n_rows, seed=seed)
+        for name, fn in methods:
+            try:
+                seconds, peak_mb = time_call(fn, df, repeat, track_memory)
+                res = BenchResult(name, n_rows, seconds, n_rows / seconds if seconds > 0 else float('inf'), peak_mb)
+            except Exception as e:
+                res = BenchResult(name, n_rows, float('nan'), float('nan'), None, error=f"{type(e).__name__}: {e}")
+            results.append(res)
+            mem = f"{res.peak_mem_mb:8.1f} MB" if res.peak_mem_mb is not None else "       -"
+            print(f"   {name:<55} {res.seconds:9.4f}s {res.rows_per_sec:14,.0f} rows/s {mem}" if not res.error
+                  else f"   {name:<55} ERROR {res.error}")
+    return results
+
+
+def compare_with_baseline(results: List[BenchResult], baseline_path: str) -> List[Dict]:
+    """与历史基线对比，返回每项的耗时比值及回归标记。"""
+    with open(baseline_path, 'r', encoding='utf-8') as f:
+        baseline = json.load(f)
+    base_map = {(r['name'], r['rows']): r for r in baseline['results']}
+
+    rows = []
+    for r in results:
+        base = base_map.get((r.name, r.rows))
+        if not base or r.error or base.get('error'): continue
+        ratio = r.seconds / base['seconds'] if base['seconds'] > 0 else float('nan')
+        rows.append({
+            "name": r.name, "rows": r.rows,
+            "baseline_s": base['seconds'], "current_s": r.seconds,
+            "ratio": ratio, "regression": ratio > REGRESSION_RATIO
+        })
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Order Analysis Benchmark Suite (synthetic K5 data)')
+    parser.add_argument('--scales', type=int, nargs='+', default=[10_000, 100_000], help='Row counts to benchmark (e.g. 10000 1000000 10000000)')
+    parser.add_argument('--repeat', type=int, default=1, help='Timing repetitions per method (best is kept)')
+    parser.add_argument('--filter', default=None, help='Only run methods whose qualified name contains this string')
+    parser.add_argument('--no-memory', action='store_true', help='Skip tracemalloc peak-memory measurement')
+    parser.add_argument('--baseline', default=None, help='Previous result JSON to compare against')
+    parser.add_argument('--output', default=None, help='Where to write the result JSON')
+    parser.add_argument('--seed', type=int, default=42)
+    args = parser.parse_args()
+
+    results = run_suite(args.scales, args.repeat, not args.no_memory, args.filter, args.seed)
+
+    output = {
+        "meta": {
+            "generated_at": datetime.now().isoformat(),
+            "python": sys.version.split()[0],
+            "pandas": pd.__version__,
+            "scales": args.scales,
+            "seed": args.seed
+        },
+        "results": [asdict(r) for r in results]
+    }
+
+    if args.baseline:
+        comparison = compare_with_baseline(results, args.baseline)
+        output["comparison"] = comparison
+        print("\n>>> Baseline comparison (current / baseline)")
+        for c in sorted(comparison, key=lambda x: x['ratio'], reverse=True):
+            flag = "REGRESSION" if c['regression'] else ""
+            print(f"   {c['name']:<55} {c['rows']:>10,} {c['ratio']:6.2f}x {flag}")
+
+    out_path = args.output or os.path.join(
+        os.path.dirname(os.path.abspath(__file__)), "results", f"bench_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json"
+    )
+    os.makedirs(os.path.dirname(out_path), exist_ok=True)
+    with open(out_path, 'w', encoding='utf-8') as f:
+        json.dump(output, f, ensure_ascii=False, indent=2)
+    print(f">>> Results saved to {out_path}")
+
+
+if __name__ == "__main__":
+    main()
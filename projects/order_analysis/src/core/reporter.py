@@ -2,7 +2,8 @@ import os
 import pandas as pd
 from datetime import datetime
 from typing import Dict, Any
-import markdown
+
+from order_analysis.src.utils.md_render import format_series, format_frame, md_to_html, PCT
 
 class MarkdownReporter:
     def __init__(self, output_dir: str):
@@ -39,8 +40,8 @@ class MarkdownReporter:
         # 格式化表格
         fmt_df = trend_df.head().reset_index()
         fmt_df['period'] = fmt_df['period'].dt.strftime('%Y-%m-%d')
-        fmt_df['gmv'] = fmt_df['gmv'].apply(lambda x: f"{x:,.2f}")
-        fmt_df['aov'] = fmt_df['aov'].apply(lambda x: f"{x:.2f}")
+        fmt_df['gmv'] = format_series(fmt_df['gmv'], "{:,.2f}", na=None)
+        fmt_df['aov'] = format_series(fmt_df['aov'], "{:.2f}", na=None)
         
         self.content.append(fmt_df.to_markdown(index=False))
         self.content.append("\n")
@@ -49,8 +50,8 @@ class MarkdownReporter:
         self.add_header("3. Top 10 品类分析 (按 GMV)", level=2)
         # 格式化
         fmt_df = cat_df.reset_index()
-        fmt_df['gmv'] = fmt_df['gmv'].apply(lambda x: f"{x:,.2f}")
-        fmt_df['gmv_share'] = fmt_df['gmv_share'].apply(lambda x: f"{x:.2%}")
+        fmt_df['gmv'] = format_series(fmt_df['gmv'], "{:,.2f}", na=None)
+        fmt_df['gmv_share'] = format_series(fmt_df['gmv_share'], "{:.2%}", na=None)
         
         self.content.append(fmt_df.to_markdown(index=False))
         self.content.append("\n")
@@ -60,10 +61,10 @@ class MarkdownReporter:
         self.add_header("4.1 渠道概览", level=3)
         
         fmt_df = df.reset_index()
-        fmt_df['gmv'] = fmt_df['gmv'].apply(lambda x: f"¥{x:,.0f}")
-        fmt_df['gmv_share'] = fmt_df['gmv_share'].apply(lambda x: f"{x:.1%}")
-        fmt_df['aov'] = fmt_df['aov'].apply(lambda x: f"¥{x:.1f}")
-        fmt_df['avg_price'] = fmt_df['avg_price'].apply(lambda x: f"¥{x:.1f}")
+        fmt_df['gmv'] = format_series(fmt_df['gmv'], "¥{:,.0f}", na=None)
+        fmt_df['gmv_share'] = format_series(fmt_df['gmv_share'], PCT, na=None)
+        fmt_df['aov'] = format_series(fmt_df['aov'], "¥{:.1f}", na=None)
+        fmt_df['avg_price'] = format_series(fmt_df['avg_price'], "¥{:.1f}", na=None)
         
         self.content.append(fmt_df.to_markdown(index=False))
         self.content.append("\n")
@@ -71,19 +72,19 @@ class MarkdownReporter:
     def add_channel_time_pref(self, df: pd.DataFrame):
         self.add_header("4.2 交易时间段偏好 (订单占比)", level=3)
         # 格式化百分比
-        fmt_df = df.map(lambda x: f"{x:.1%}")
+        fmt_df = format_frame(df, PCT, na=None)
         self.content.append(fmt_df.to_markdown())
         self.content.append("\n")
 
     def add_channel_discount(self, df: pd.DataFrame):
         self.add_header("4.3 折扣敏感度 (平均折扣率)", level=3)
-        fmt_df = df.map(lambda x: f"{x:.1%}")
+        fmt_df = format_frame(df, PCT, na=None)
         self.content.append(fmt_df.to_markdown())
         self.content.append("\n")
 
     def add_channel_upt(self, df: pd.DataFrame):
         self.add_header("4.4 客件数 (UPT)", level=3)
-        fmt_df = df.map(lambda x: f"{x:.1f}")
+        fmt_df = format_frame(df, "{:.1f}", na=None)
         self.content.append(fmt_df.to_markdown())
         self.content.append("\n")
 
@@ -93,9 +94,9 @@ class MarkdownReporter:
         fmt_df = df.copy()
         for col in fmt_df.columns:
             if 'uplift' in col:
-                fmt_df[col] = fmt_df[col].map(lambda x: f"{x:+.1%}" if pd.notnull(x) else "-")
+                fmt_df[col] = format_series(fmt_df[col], "{:+.1%}")
             else:
-                fmt_df[col] = fmt_df[col].map(lambda x: f"¥{x:,.0f}" if pd.notnull(x) else "-")
+                fmt_df[col] = format_series(fmt_df[col], "¥{:,.0f}")
         
         self.content.append(fmt_df.to_markdown())
         self.content.append("\n")
@@ -104,20 +105,20 @@ class MarkdownReporter:
         self.add_header("5. 订单结构分布 (无监督聚类)", level=2)
         
         self.add_header("5.1 客单价区间分布 (AOV Bins)", level=3)
-        fmt_aov = aov_dist.map(lambda x: f"{x:.1%}")
+        fmt_aov = format_frame(aov_dist, PCT, na=None)
         self.content.append(fmt_aov.to_markdown())
         self.content.append("\n")
         
         self.add_header("5.2 消费模式聚类特征 (K-Means K=4)", level=3)
         fmt_prof = cluster_profile.reset_index()
-        fmt_prof['实收金额'] = fmt_prof['实收金额'].apply(lambda x: f"¥{x:.1f}")
-        fmt_prof['销售数量'] = fmt_prof['销售数量'].apply(lambda x: f"{x:.1f}件")
-        fmt_prof['share'] = fmt_prof['share'].apply(lambda x: f"{x:.1%}")
+        fmt_prof['实收金额'] = format_series(fmt_prof['实收金额'], "¥{:.1f}", na=None)
+        fmt_prof['销售数量'] = format_series(fmt_prof['销售数量'], "{:.1f}件", na=None)
+        fmt_prof['share'] = format_series(fmt_prof['share'], PCT, na=None)
         self.content.append(fmt_prof[['label', '实收金额', '销售数量', 'count', 'share']].to_markdown(index=False))
         self.content.append("\n")
 
         self.add_header("5.3 渠道消费模式构成", level=3)
-        fmt_cc = channel_cluster.map(lambda x: f"{x:.1%}")
+        fmt_cc = format_frame(channel_cluster, PCT, na=None)
         self.content.append(fmt_cc.to_markdown())
         self.content.append("\n")
 
@@ -139,7 +140,7 @@ class MarkdownReporter:
         # 2. Top 商品
         self.content.append(f"**核心驱动品类 (Top 5)**:")
         fmt_prod = top_products[['小类编码', '商品名称', '实收金额', '销售数量']].copy()
-        fmt_prod['实收金额'] = fmt_prod['实收金额'].apply(lambda x: f"¥{x:,.0f}")
+        fmt_prod['实收金额'] = format_series(fmt_prod['实收金额'], "¥{:,.0f}", na=None)
         self.content.append(fmt_prod.to_markdown(index=False))
         self.content.append("\n")
 
@@ -190,7 +191,7 @@ class MarkdownReporter:
         
     def _save_html(self, md_text: str, output_path: str):
         # Convert MD to HTML
-        html_body = markdown.markdown(md_text, extensions=['tables', 'fenced_code'])
+        html_body = md_to_html(md_text, ('tables', 'fenced_code'))
         
         # Simple CSS (GitHub-like)
         css = """
@@ -1,13 +1,13 @@
-import markdown
 import os
+import sys
 import glob
+import argparse
 
-def convert_all():
-    base_dir = os.getcwd()
-    reports_dir = os.path.join(base_dir, "order_analysis", "reports", "channels")
-    
-    # CSS
-    css = """
+from order_analysis.src.generators.report_builder import BuildTask, ReportBuilder, print_summary
+from order_analysis.src.utils import md_render
+
+# CSS
+CSS = """
     <style>
         body { font-family: -apple-system,BlinkMacSystemFont,"Segoe UI",Helvetica,Arial,sans-serif; line-height: 1.6; max-width: 900px; margin: 0 auto; padding: 20px; color: #24292e; }
         h1, h2, h3 { border-bottom: 1px solid #eaecef; padding-bottom: .3em; }
@@ -18,20 +18,36 @@ def convert_all():
         code { background-color: rgba(27,31,35,.05); padding: .2em .4em; border-radius: 3px; }
     </style>
     """
+
+def md_to_html(payload):
+    """进程池任务：Markdown 文本 -> 完整 HTML 文档。"""
+    html_name, text = payload
+    html_body = md_render.md_to_html(text)
+    full_html = f"<!DOCTYPE html><html><head><meta charset='utf-8'><title>Report</title>{CSS}</head><body>{html_body}</body></html>"
+    return {html_name: full_html}
+
+def convert_all(reports_dir=None, workers=None, force=False):
+    base_dir = os.getcwd()
+    reports_dir = reports_dir or os.path.join(base_dir, "order_analysis", "reports", "channels")
     
-    for md_file in glob.glob(os.path.join(reports_dir, "*.md")):
+    tasks = []
+    for md_file in sorted(glob.glob(os.path.join(reports_dir, "*.md"))):
         with open(md_file, 'r', encoding='utf-8') as f:
             text = f.read()
-            
-        html_body = markdown.markdown(text, extensions=['tables'])
-        
-        full_html = f"<!DOCTYPE html><html><head><meta charset='utf-8'><title>Report</title>{css}</head><body>{html_body}</body></html>"
-        
-        html_file = md_file.replace(".md", ".html")
-        with open(html_file, 'w', encoding='utf-8') as f:
-            f.write(full_html)
-            
-        print(f"Converted {os.path.basename(md_file)} -> HTML")
+        html_name = os.path.basename(md_file).replace(".md", ".html")
+        tasks.append(BuildTask(os.path.basename(md_file), md_to_html, (html_name, text)))
+    
+    summary = ReportBuilder(reports_dir, workers=workers, force=force).build(tasks)
+    for name in summary.built:
+        print(f"Converted {name} -> HTML")
+    print_summary(summary)
+    return summary
 
 if __name__ == "__main__":
-    convert_all()
+    parser = argparse.ArgumentParser(description='Batch Markdown -> HTML converter')
+    parser.add_argument('--dir', default=None, help='Directory containing Markdown reports')
+    parser.add_argument('--workers', type=int, default=None, help='Worker processes (default: CPU count)')
+    parser.add_argument('--force', action='store_true', help='Reconvert even if Markdown is unchanged')
+    args = parser.parse_args()
+    summary = convert_all(args.dir, workers=args.workers, force=args.force)
+    sys.exit(1 if summary.failed else 0)
@@ -1,8 +1,10 @@
-import json
 import os
 import pandas as pd
 from datetime import datetime
 
+from order_analysis.src.report_store import AnalysisStore
+from order_analysis.src.utils.md_render import compile_table, md_to_html
+
 def fmt_c(x): return f"¥{x:,.1f}"
 def fmt_p(x): return f"{x:.1%}"
 
@@ -26,10 +28,10 @@ def get_report_markdown(ch, data):
     lines.append("> - **刺客 (Assassin)**: 低件单价且带动能力低于中位数的流量品，消耗履约成本。")
     lines.append("")
     
-    lines.append("| 商品名称 | 渗透率 | 带动系数 | 件单价 | 战略人格 |")
-    lines.append("| :--- | :--- | :--- | :--- | :--- |")
-    for item in pm[:15]:
-        lines.append(f"| {item['sku']} | {fmt_p(item['penetration'])} | {item['affinity']:.2f} | {fmt_c(item['avg_price'])} | {item['role']} |")
+    lines.append(compile_table(("商品名称", "渗透率", "带动系数", "件单价", "战略人格"), ':---').render(
+        (item['sku'], fmt_p(item['penetration']), f"{item['affinity']:.2f}", fmt_c(item['avg_price']), item['role'])
+        for item in pm[:15]
+    ))
     lines.append("")
     
     top_affinity = ", ".join([i['sku'] for i in sorted(pm, key=lambda x: x['affinity'], reverse=True)[:3]])
@@ -66,10 +68,10 @@ def get_report_markdown(ch, data):
     lines.append(f"- **孤儿单元凶 Top 3**: {culprits_str}")
     lines.append("")
     
-    lines.append("| 客群指纹 | 占比 | 平均件数 | 平均类目数 | 平均客单 |")
-    lines.append("| :--- | :--- | :--- | :--- | :--- |")
-    for seg in bq['segments']:
-        lines.append(f"| {seg['label']} | {fmt_p(seg['share'])} | {seg['avg_items']:.1f} | {seg['avg_cats']:.1f} | {fmt_c(seg['avg_aov'])} |")
+    lines.append(compile_table(("客群指纹", "占比", "平均件数", "平均类目数", "平均客单"), ':---').render(
+        (seg['label'], fmt_p(seg['share']), f"{seg['avg_items']:.1f}", f"{seg['avg_cats']:.1f}", fmt_c(seg['avg_aov']))
+        for seg in bq['segments']
+    ))
     lines.append("")
 
     # --- 4. 时空生活 ---
@@ -78,11 +80,10 @@ def get_report_markdown(ch, data):
     lines.append("> - **TGI 指数**: (时段内品类占比 / 全天该品类占比) * 100。>100 表示该时段对该品类有显著偏好。")
     lines.append("")
     
-    lines.append("| 时段 (Period) | 心智商品 (High TGI SKUs) |")
-    lines.append("| :--- | :--- |")
-    for period, items in ti['period_tgi'].items():
-        item_str = ", ".join([f"{i['name']} (TGI {i['tgi']:.0f})" for i in items])
-        lines.append(f"| {period} | {item_str} |")
+    lines.append(compile_table(("时段 (Period)", "心智商品 (High TGI SKUs)"), ':---').render(
+        (period, ", ".join([f"{i['name']} (TGI {i['tgi']:.0f})" for i in items]))
+        for period, items in ti['period_tgi'].items()
+    ))
     lines.append("")
     
     weekend_type = "工作区/补缺型" if ti['weekend_fluctuation'] < 1 else "生活/囤货型"
@@ -92,8 +93,7 @@ def get_report_markdown(ch, data):
 
 def get_report_html(ch, md_content):
     # 简单转换，保留 CSS 样式
-    import markdown
-    html_body = markdown.markdown(md_content, extensions=['tables'])
+    html_body = md_to_html(md_content)
     
     html = f"""
     <html>
@@ -122,9 +122,9 @@ def main():
     output_dir = os.path.join(base_dir, "order_analysis/reports/diagnostics_v3")
     if not os.path.exists(output_dir): os.makedirs(output_dir)
     
-    with open(json_path, 'r') as f:
-        data = json.load(f)
-    for ch, ch_data in data['channels'].items():
+    store = AnalysisStore.open(json_path)
+    for ch in store.channel_names():
+        ch_data = store.channel(ch)
         print(f"Generating V3 Diagnostic for {ch}...")
         
         # 1. Generate Markdown
@@ -1,7 +1,8 @@
-import json
 import os
 import pandas as pd
 
+from order_analysis.src.report_store import AnalysisStore
+
 def format_currency(x):
     return f"¥{x:,.1f}"
 
@@ -76,10 +77,10 @@ def main():
     json_path = os.path.join(base_dir, "order_analysis/reports/data/analysis_data.json")
     output_dir = os.path.join(base_dir, "order_analysis/reports/channels")
     
-    with open(json_path, 'r') as f:
-        full_data = json.load(f)
+    store = AnalysisStore.open(json_path)
         
-    for ch_name, ch_data in full_data['channels'].items():
+    for ch_name in store.channel_names():
+        ch_data = store.channel(ch_name)
         if not ch_data['metrics']: continue # Skip empty
         
         print(f"Generating report for {ch_name}...")
@@ -1,8 +1,9 @@
-import json
 import os
 import pandas as pd
 from datetime import datetime
 
+from order_analysis.src.report_store import AnalysisStore
+
 def format_currency(x):
     return f"¥{x:,.1f}"
 
@@ -184,10 +185,10 @@ def main():
     if not os.path.exists(output_dir):
         os.makedirs(output_dir)
     
-    with open(json_path, 'r') as f:
-        full_data = json.load(f)
+    store = AnalysisStore.open(json_path)
         
-    for ch_name, ch_data in full_data['channels'].items():
+    for ch_name in store.channel_names():
+        ch_data = store.channel(ch_name)
         if not ch_data.get('dashboard'): continue
         
         print(f"Generating V2 report for {ch_name}...")
@@ -0,0 +1,178 @@
+import os
+import sys
+import time
+import hashlib
+import types
+import tempfile
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, List, Optional
+
+from order_analysis.src.utils.serialization import dumps, load_json
+
+BUILD_MANIFEST = ".build_manifest.json"
+
+
+@dataclass
+class BuildTask:
+    """
+    一个报告构建单元。
+    render_fn 必须是模块级函数 (可被 pickle)，签名: payload -> {文件名: 文本内容}。
+    """
+    name: str
+    render_fn: Callable[[Any], Dict[str, str]]
+    payload: Any
+    source_hash: str = ""
+
+
+@dataclass
+class BuildSummary:
+    built: List[str] = field(default_factory=list)
+    skipped: List[str] = field(default_factory=list)
+    failed: Dict[str, str] = field(default_factory=dict)
+    timings: Dict[str, float] = field(default_factory=dict)
+    seconds: float = 0.0
+
+
+def hash_payload(payload: Any) -> str:
+    return hashlib.sha256(dumps(payload, compact=True)).hexdigest()
+
+
+def _project_source_files(fn: Callable) -> List[str]:
+    """
+    render_fn 所在模块及其 (传递) 引用的本项目模块的源文件：
+    从模块全局变量中找出属于本项目包的模块 / 函数 / 类 (如 md_render、fmt_* 辅助函数)。
+    """
+    package = __name__.split('.')[0]
+    files, seen = set(), set()
+    stack = [sys.modules.get(getattr(fn, '__module__', None))]
+    while stack:
+        module = stack.pop()
+        if module is None or id(module) in seen:
+            continue
+        seen.add(id(module))
+        path = getattr(module, '__file__', None)
+        if path and path.endswith('.py'):
+            files.add(os.path.abspath(path))
+        for value in vars(module).values():
+            if isinstance(value, types.ModuleType):
+                name = value.__name__
+            else:
+                name = getattr(value, '__module__', None)
+            if isinstance(name, str) and name.split('.')[0] == package:
+                stack.append(sys.modules.get(name))
+    return sorted(files)
+
+
+def _renderer_fingerprint(fn: Callable) -> str:
+    """渲染代码变更也应触发重建：对 render_fn 所在模块及其依赖的本项目辅助模块源码取哈希。"""
+    files = _project_source_files(fn)
+    if not files:
+        return getattr(fn, '__qualname__', 'unknown')
+    h = hashlib.sha256()
+    for path in files:
+        try:
+            with open(path, 'rb') as f:
+                h.update(os.path.basename(path).encode('utf-8') + b'\0' + f.read())
+        except OSError:
+            h.update(os.path.basename(path).encode('utf-8'))
+    return h.hexdigest()[:16]
+
+
+def atomic_write(path: str, text: str):
+    """先写同目录临时文件再 os.replace，读者不会看到半成品。"""
+    dir_name = os.path.dirname(os.path.abspath(path))
+    fd, tmp_path = tempfile.mkstemp(dir=dir_name, prefix=".tmp_", suffix=os.path.splitext(path)[1])
+    try:
+        with os.fdopen(fd, 'w', encoding='utf-8') as f:
+            f.write(text)
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path): os.remove(tmp_path)
+        raise
+
+
+def _run_task(render_fn: Callable, payload: Any):
+    t0 = time.perf_counter()
+    outputs = render_fn(payload)
+    return outputs, time.perf_counter() - t0
+
+
+class ReportBuilder:
+    """
+    并行 + 增量的报告构建器。
+    - 以 (数据哈希, 渲染器源码哈希) 作为构建键，未变化且产物仍在时跳过。
+    - 渲染在进程池中执行 (Markdown/HTML 转换为纯 Python CPU 密集)，写盘在主进程原子完成。
+    """
+
+    def __init__(self, output_dir: str, workers: Optional[int] = None, force: bool = False):
+        self.output_dir = output_dir
+        self.workers = workers if workers is not None else (os.cpu_count() or 1)
+        self.force = force
+        os.makedirs(output_dir, exist_ok=True)
+        self.manifest_path = os.path.join(output_dir, BUILD_MANIFEST)
+        self.manifest: Dict[str, Dict[str, Any]] = {}
+        if os.path.exists(self.manifest_path):
+            try:
+                self.manifest = load_json(self.manifest_path)
+            except ValueError:
+                self.manifest = {}  # 损坏的 manifest 视为全量重建
+
+    def _build_key(self, task: BuildTask) -> str:
+        data_hash = task.source_hash or hash_payload(task.payload)
+        return f"{data_hash}:{_renderer_fingerprint(task.render_fn)}"
+
+    def _is_fresh(self, task: BuildTask, key: str) -> bool:
+        entry = self.manifest.get(task.name)
+        if self.force or not entry or entry.get('key') != key:
+            return False
+        return all(os.path.exists(os.path.join(self.output_dir, f)) for f in entry.get('outputs', []))
+
+    def _commit(self, task: BuildTask, key: str, outputs: Dict[str, str]):
+        for fname, text in outputs.items():
+            atomic_write(os.path.join(self.output_dir, fname), text)
+        self.manifest[task.name] = {"key": key, "outputs": sorted(outputs.keys())}
+
+    def build(self, tasks: List[BuildTask]) -> BuildSummary:
+        summary = BuildSummary()
+        t_start = time.perf_counter()
+
+        pending = []
+        for task in tasks:
+            key = self._build_key(task)
+            if self._is_fresh(task, key):
+                summary.skipped.append(task.name)
+            else:
+                pending.append((task, key))
+
+        if pending and self.workers > 1 and len(pending) > 1:
+            with ProcessPoolExecutor(max_workers=min(self.workers, len(pending))) as pool:
+                futures = {pool.submit(_run_task, t.render_fn, t.payload): (t, k) for t, k in pending}
+                for fut in as_completed(futures):
+                    task, key = futures[fut]
+                    self._collect(task, key, fut.result, summary)
+        else:
+            for task, key in pending:
+                self._collect(task, key, lambda: _run_task(task.render_fn, task.payload), summary)
+
+        atomic_write(self.manifest_path, dumps(self.manifest).decode('utf-8'))
+        summary.seconds = time.perf_counter() - t_start
+        return summary
+
+    def _collect(self, task: BuildTask, key: str, get_result: Callable, summary: BuildSummary):
+        try:
+            outputs, seconds = get_result()
+            self._commit(task, key, outputs)
+            summary.built.append(task.name)
+            summary.timings[task.name] = seconds
+        except Exception as e:
+            # 单个报告失败不影响其他报告；manifest 不更新，下次会重试
+            self.manifest.pop(task.name, None)
+            summary.failed[task.name] = f"{type(e).__name__}: {e}"
+
+
+def print_summary(summary: BuildSummary, stream=sys.stdout):
+    print(f">>> Built {len(summary.built)} | Skipped (unchanged) {len(summary.skipped)} | "
+          f"Failed {len(summary.failed)} | {summary.seconds:.2f}s", file=stream)
+    for name, err in summary.failed.items():
+        print(f"   ✗ {name}: {err}", file=stream)
@@ -1,8 +1,12 @@
-import json
 import os
+import sys
 import pandas as pd
 from datetime import datetime
 
+from order_analysis.src.report_store import AnalysisStore
+from order_analysis.src.generators.report_builder import BuildTask, ReportBuilder, print_summary
+from order_analysis.src.utils.md_render import compile_table, md_to_html
+
 def fmt_c(x): return f"¥{x:,.1f}" if pd.notnull(x) else "-"
 def fmt_p(x): return f"{x:.1%}" if pd.notnull(x) else "-"
 def fmt_f(x): return f"{x:.2f}" if pd.notnull(x) else "-"
@@ -21,10 +25,8 @@ class StrategicReporter:
         self.lines.append(f"> {text}\n")
         
     def add_table(self, headers, rows):
-        self.lines.append("| " + " | ".join(headers) + " |")
-        self.lines.append("| " + " | ".join(['---'] * len(headers)) + " |")
-        for row in rows:
-            self.lines.append("| " + " | ".join([str(r) for r in row]) + " |")
+        # 表头/分隔行按表头缓存，数据行走预编译的 format 模板
+        self.lines.append(compile_table(tuple(headers)).render(rows))
         self.lines.append("")
 
     def render_overview(self):
@@ -124,7 +126,7 @@ class StrategicReporter:
         self.add_quote("**指标详解**: TGI > 100 代表该时段对该品类有显著偏好。")
         tgi_rows = []
         for p, items in st['tgi_heatmap'].items():
-            item_str = ", ".join([f"{i['sku']}({i['tgi']:.0f})" for i in items])
+            item_str = ", ".join([f"{i['sku']}({i['tgi']:.0f})" if i['tgi'] is not None else f"{i['sku']}(-)" for i in items])
             tgi_rows.append([p, item_str])
         self.add_table(["时段", "高 TGI 商品 (Top 3)"], tgi_rows)
 
@@ -212,32 +214,51 @@ class GlobalStrategicReporter(StrategicReporter):
         self.add_table(["商品名称", "销售金额 (GMV)"], [[k, fmt_c(v)] for k, v in top10.items()])
 
 def get_report_html(title, md_content):
-    import markdown
-    html = markdown.markdown(md_content, extensions=['tables'])
+    html = md_to_html(md_content)
     css = "<style>body{font-family:sans-serif;max-width:1000px;margin:40px auto;padding:20px;line-height:1.6;color:#24292e;background:#f6f8fa}.container{background:white;padding:40px;border-radius:8px;box-shadow:0 1px 3px rgba(0,0,0,0.12)}h1,h2,h3{border-bottom:1px solid #eaecef;padding-bottom:0.3em}table{border-collapse:collapse;width:100%;margin:20px 0}th,td{border:1px solid #dfe2e5;padding:10px;text-align:left}th{background:#f6f8fa}blockquote{border-left:4px solid #0366d6;background:#f1f8ff;padding:15px;margin:20px 0}</style>"
     return f"<html><head><meta charset='utf-8'><title>{title}</title>{css}</head><body><div class='container'>{html}</div></body></html>"
 
-def main():
+def render_channel_report(payload):
+    """进程池任务：渲染单个渠道的 Markdown + HTML。"""
+    ch, data, benchmarks = payload
+    md_text = StrategicReporter(ch, data, benchmarks).generate()
+    return {f"report_{ch}_v4.md": md_text, f"report_{ch}_v4.html": get_report_html(ch, md_text)}
+
+def render_global_report(payload):
+    global_data, channel_rankings, benchmarks = payload
+    md = GlobalStrategicReporter("全渠道总览", global_data, channel_rankings, benchmarks).generate()
+    return {"report_global_v4.md": md, "report_global_v4.html": get_report_html("Global Overview", md)}
+
+def main(channels=None, skip_global=False, workers=None, force=False):
     base_dir = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
     json_path = os.path.join(base_dir, "reports", "data", "analysis_v4_full.json")
     output_dir = os.path.join(base_dir, "reports", "diagnostics_v5")
-    if not os.path.exists(output_dir): os.makedirs(output_dir)
-    with open(json_path, 'r') as f: full_data = json.load(f)
-    gb = full_data['global']['business_overview']
+    # 分片存在时只加载 manifest + 目标渠道分片
+    store = AnalysisStore.open(json_path)
+    global_data = store.section('global')
+    gb = global_data['business_overview']
     benchmarks = {"aov_avg": gb['aov'], "upt_avg": gb['upt']}
     
-    print("Generating Global Report...")
-    global_rep = GlobalStrategicReporter("全渠道总览", full_data['global'], full_data['channels'], benchmarks)
-    md = global_rep.generate()
-    with open(os.path.join(output_dir, "report_global_v4.md"), 'w') as f: f.write(md)
-    with open(os.path.join(output_dir, "report_global_v4.html"), 'w') as f: f.write(get_report_html("Global Overview", md))
+    tasks = []
+    if not skip_global:
+        # 全局报告只依赖各渠道的商品排名，避免把完整渠道数据送进进程池
+        rankings = {ch: {"product_rankings": store.channel(ch).get('product_rankings', {})} for ch in store.channel_names()}
+        tasks.append(BuildTask("global", render_global_report, (global_data, rankings, benchmarks)))
+    for ch in (channels or store.channel_names()):
+        tasks.append(BuildTask(ch, render_channel_report, (ch, store.channel(ch), benchmarks)))
     
-    for ch, data in full_data['channels'].items():
-        print(f"Generating Detailed Report for {ch}...")
-        rep = StrategicReporter(ch, data, benchmarks)
-        md_text = reporter_md = rep.generate()
-        with open(os.path.join(output_dir, f"report_{ch}_v4.md"), 'w') as f: f.write(md_text)
-        with open(os.path.join(output_dir, f"report_{ch}_v4.html"), 'w') as f: f.write(get_report_html(ch, md_text))
+    print(f"Generating {len(tasks)} strategic reports...")
+    summary = ReportBuilder(output_dir, workers=workers, force=force).build(tasks)
+    print_summary(summary)
+    return summary
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    import argparse
+    parser = argparse.ArgumentParser(description='Strategic Report Generator')
+    parser.add_argument('--channel', action='append', default=None, help='Only render the given channel (repeatable)')
+    parser.add_argument('--skip-global', action='store_true', help='Do not render the global overview report')
+    parser.add_argument('--workers', type=int, default=None, help='Render worker processes (default: CPU count)')
+    parser.add_argument('--force', action='store_true', help='Rebuild even if source data is unchanged')
+    args = parser.parse_args()
+    summary = main(channels=args.channel, skip_global=args.skip_global, workers=args.workers, force=args.force)
+    sys.exit(1 if summary.failed else 0)
\ No newline at end of file
@@ -1,9 +1,9 @@
 import os
 import sys
 import pandas as pd
-import json
-import numpy as np
+import argparse
 from datetime import datetime
+from typing import Optional
 
 # Import Analyzers
 from order_analysis.src.dal import DataLoader
@@ -12,14 +12,8 @@ from order_analysis.src.core.channel_analyzer import ChannelAnalyzer
 from order_analysis.src.core.distribution_analyzer import DistributionAnalyzer
 from order_analysis.src.core.cube_analyzer import CubeAnalyzer
 from order_analysis.src.utils.time_utils import get_day_type
-
-# Helper to serialize numpy types
-class NpEncoder(json.JSONEncoder):
-    def default(self, obj):
-        if isinstance(obj, np.integer): return int(obj)
-        if isinstance(obj, np.floating): return float(obj)
-        if isinstance(obj, np.ndarray): return obj.tolist()
-        return super(NpEncoder, self).default(obj)
+from order_analysis.src.utils.serialization import dump_json, SIDECAR_FORMATS
+from order_analysis.src.report_store import write_shards, shard_dir_for
 
 def assign_period(h):
     if 6 <= h < 11: return '1_Morning'
@@ -28,7 +22,7 @@ def assign_period(h):
     elif 17 <= h < 22: return '4_Evening'
     else: return '5_LateNight'
 
-def run_pipeline():
+def run_pipeline(compact: bool = False, sidecar: Optional[str] = None):
     base_dir = os.getcwd()
     data_path = os.path.join(base_dir, "order_analysis", "datas", "K5.交易流水明细表2026-01-13 9_49_12.xlsx")
     output_dir = os.path.join(base_dir, "order_analysis", "reports", "data")
@@ -124,8 +118,9 @@ def run_pipeline():
 
     # Save JSON
     json_path = os.path.join(output_dir, "analysis_data.json")
-    with open(json_path, 'w', encoding='utf-8') as f:
-        json.dump(results, f, cls=NpEncoder, ensure_ascii=False, indent=2)
+    dump_json(results, json_path, compact=compact, sidecar=sidecar)
+    # 按渠道分片，供报告生成器按需加载
+    write_shards(results, shard_dir_for(json_path))
     
     print(f">>> Data saved to {json_path}")
     
@@ -150,4 +145,8 @@ def run_pipeline():
         f.write(prompt)
 
 if __name__ == "__main__":
-    run_pipeline()
+    parser = argparse.ArgumentParser(description='Order Analysis Pipeline')
+    parser.add_argument('--compact', action='store_true', help='Write non-indented JSON')
+    parser.add_argument('--sidecar', choices=SIDECAR_FORMATS, default=None, help='Also write a binary sidecar')
+    args = parser.parse_args()
+    run_pipeline(compact=args.compact, sidecar=args.sidecar)
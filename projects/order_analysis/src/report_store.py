@@ -0,0 +1,171 @@
+import os
+import sys
+import threading
+from collections.abc import Mapping
+from dataclasses import dataclass, asdict, field
+from typing import Any, Dict, Iterator, List, Optional
+
+from order_analysis.src.utils.serialization import dump_json, load_json
+
+MANIFEST_NAME = "manifest.json"
+ROOT_SHARD = "_root.json"
+SHARD_VERSION = 1
+
+
+@dataclass
+class ShardManifest:
+    """
+    分片索引：根节点 (meta/global 等非渠道段) 一个文件，每个渠道一个文件。
+    渠道文件名使用序号，避免中文/特殊字符在不同文件系统上的兼容问题。
+    """
+    version: int
+    meta: Dict[str, Any]
+    root_file: str
+    channels: Dict[str, str] = field(default_factory=dict)
+
+
+def write_shards(results: Dict[str, Any], out_dir: str, compact: bool = True) -> ShardManifest:
+    """
+    将完整分析结果拆分为 manifest + 根分片 + 渠道分片。
+    `results` 需包含 `channels` 字典，其余顶层键整体写入根分片。
+    """
+    os.makedirs(out_dir, exist_ok=True)
+    channels = results.get('channels', {})
+    root = {k: v for k, v in results.items() if k != 'channels'}
+
+    dump_json(root, os.path.join(out_dir, ROOT_SHARD), compact=compact)
+    channel_files = {}
+    for i, (ch, data) in enumerate(channels.items()):
+        fname = f"channel_{i:03d}.json"
+        dump_json(data, os.path.join(out_dir, fname), compact=compact)
+        channel_files[ch] = fname
+
+    manifest = ShardManifest(SHARD_VERSION, results.get('meta', {}), ROOT_SHARD, channel_files)
+    # manifest 最后写入：读者看到 manifest 即代表分片已完整
+    dump_json(asdict(manifest), os.path.join(out_dir, MANIFEST_NAME), compact=False)
+    return manifest
+
+
+def shard_dir_for(json_path: str) -> str:
+    """`reports/data/analysis_v4_full.json` -> `reports/data/analysis_v4_full/`"""
+    return os.path.splitext(json_path)[0]
+
+
+class _LazyChannels(Mapping):
+    """渠道名 -> 渠道数据 的只读映射，访问时才加载对应分片。"""
+    def __init__(self, store: "AnalysisStore"):
+        self._store = store
+
+    def __getitem__(self, name: str) -> Dict[str, Any]:
+        return self._store.channel(name)
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self._store.channel_names())
+
+    def __len__(self) -> int:
+        return len(self._store.channel_names())
+
+
+class AnalysisStore:
+    """
+    分析结果读取器。
+    - 分片模式：只读 manifest，渠道数据按需加载并缓存 (线程安全，可并发渲染)。
+    - 单文件模式：兼容旧产物，首次访问时整体加载一次。
+    """
+
+    def __init__(self, shard_dir: Optional[str] = None, json_path: Optional[str] = None):
+        if not shard_dir and not json_path:
+            raise ValueError("需要提供分片目录或 JSON 文件路径")
+        self.shard_dir = shard_dir
+        self.json_path = json_path
+        self._lock = threading.Lock()
+        self._cache: Dict[str, Any] = {}
+        self._full: Optional[Dict[str, Any]] = None
+        self.manifest: Optional[ShardManifest] = None
+        if shard_dir:
+            self.manifest = ShardManifest(**load_json(os.path.join(shard_dir, MANIFEST_NAME)))
+
+    @classmethod
+    def open(cls, path: str) -> "AnalysisStore":
+        """
+        `path` 可以是分片目录，也可以是单个 JSON 文件。
+        若 JSON 旁存在不旧于它的同名分片目录，则优先使用分片。
+        """
+        if os.path.isdir(path):
+            return cls(shard_dir=path)
+        if not os.path.exists(path):
+            raise FileNotFoundError(f"未找到分析结果: {path}")
+        candidate = shard_dir_for(path)
+        manifest_path = os.path.join(candidate, MANIFEST_NAME)
+        if os.path.exists(manifest_path) and os.path.getmtime(manifest_path) >= os.path.getmtime(path):
+            return cls(shard_dir=candidate)
+        return cls(json_path=path)
+
+    @property
+    def is_sharded(self) -> bool:
+        return self.manifest is not None
+
+    def _load_full(self) -> Dict[str, Any]:
+        with self._lock:
+            if self._full is None:
+                self._full = load_json(self.json_path)
+            return self._full
+
+    def _load_shard(self, fname: str) -> Any:
+        with self._lock:
+            cached = self._cache.get(fname)
+        if cached is not None:
+            return cached
+        data = load_json(os.path.join(self.shard_dir, fname))
+        with self._lock:
+            return self._cache.setdefault(fname, data)
+
+    def root(self) -> Dict[str, Any]:
+        """除 `channels` 之外的全部顶层段 (meta / global / global_overview ...)。"""
+        if self.is_sharded:
+            return self._load_shard(self.manifest.root_file)
+        return {k: v for k, v in self._load_full().items() if k != 'channels'}
+
+    @property
+    def meta(self) -> Dict[str, Any]:
+        if self.is_sharded:
+            return self.manifest.meta
+        return self._load_full().get('meta', {})
+
+    def section(self, key: str, default: Any = None) -> Any:
+        return self.root().get(key, default)
+
+    def channel_names(self) -> List[str]:
+        if self.is_sharded:
+            return list(self.manifest.channels.keys())
+        return list(self._load_full().get('channels', {}).keys())
+
+    def channel(self, name: str) -> Dict[str, Any]:
+        if self.is_sharded:
+            if name not in self.manifest.channels:
+                raise KeyError(name)
+            return self._load_shard(self.manifest.channels[name])
+        return self._load_full()['channels'][name]
+
+    @property
+    def channels(self) -> Mapping:
+        return _LazyChannels(self)
+
+    def evict(self, name: Optional[str] = None):
+        """释放已加载的渠道分片 (批量渲染大量门店时控制内存)。"""
+        with self._lock:
+            if name is None:
+                self._cache.clear()
+            elif self.is_sharded and name in self.manifest.channels:
+                self._cache.pop(self.manifest.channels[name], None)
+
+
+if __name__ == "__main__":
+    # 将已有的单文件结果转换为分片: python -m order_analysis.src.report_store <analysis.json> [out_dir]
+    if len(sys.argv) < 2:
+        print("Usage: python -m order_analysis.src.report_store <analysis.json> [out_dir]")
+        sys.exit(1)
+    src = sys.argv[1]
+    dst = sys.argv[2] if len(sys.argv) > 2 else shard_dir_for(src)
+    m = write_shards(load_json(src), dst)
+    print(f"Sharded {len(m.channels)} channels -> {dst}")
@@ -1,9 +1,9 @@
 import os
 import sys
 import pandas as pd
-import json
-import numpy as np
+import argparse
 from datetime import datetime
+from typing import Optional
 
 from order_analysis.src.dal import DataLoader
 from order_analysis.src.strategies.overview_strategy import OverviewStrategy
@@ -12,16 +12,10 @@ from order_analysis.src.strategies.pricing_strategy import PricingStrategy
 from order_analysis.src.strategies.temporal_strategy import TemporalStrategy
 from order_analysis.src.strategies.basket_strategy import BasketStrategy
 from order_analysis.src.utils.time_utils import get_day_type
+from order_analysis.src.utils.serialization import dump_json, SIDECAR_FORMATS
+from order_analysis.src.report_store import write_shards, shard_dir_for
 
-# Helper to serialize numpy types
-class NpEncoder(json.JSONEncoder):
-    def default(self, obj):
-        if isinstance(obj, np.integer): return int(obj)
-        if isinstance(obj, np.floating): return float(obj)
-        if isinstance(obj, np.ndarray): return obj.tolist()
-        return super(NpEncoder, self).default(obj)
-
-def run_strategic_pipeline():
+def run_strategic_pipeline(compact: bool = False, sidecar: Optional[str] = None):
     base_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
     data_path = os.path.join(base_dir, "datas", "K5.交易流水明细表2026-01-13 9_49_12.xlsx")
     output_dir = os.path.join(base_dir, "reports", "data")
@@ -131,10 +125,15 @@ def run_strategic_pipeline():
 
     # Save
     out_path = os.path.join(output_dir, "analysis_v4_full.json")
-    with open(out_path, 'w', encoding='utf-8') as f:
-        json.dump(final_output, f, cls=NpEncoder, ensure_ascii=False, indent=2)
+    dump_json(final_output, out_path, compact=compact, sidecar=sidecar)
+    # 按渠道分片，供报告生成器按需加载
+    write_shards(final_output, shard_dir_for(out_path))
         
     print(f">>> ✅ Phase 1 Complete. Saved to {out_path}")
 
 if __name__ == "__main__":
-    run_strategic_pipeline()
+    parser = argparse.ArgumentParser(description='Strategic Diagnosis Pipeline')
+    parser.add_argument('--compact', action='store_true', help='Write non-indented JSON')
+    parser.add_argument('--sidecar', choices=SIDECAR_FORMATS, default=None, help='Also write a binary sidecar')
+    args = parser.parse_args()
+    run_strategic_pipeline(compact=args.compact, sidecar=args.sidecar)
@@ -0,0 +1,85 @@
+import threading
+import numpy as np
+import pandas as pd
+from functools import lru_cache
+from typing import Iterable, List, Optional, Sequence, Tuple
+
+import markdown
+
+# 报告中的百分比格式 (与各 reporter 的 fmt_p 保持一致)
+PCT = "{:.1%}"
+
+
+def format_values(values: Iterable, spec: str, na: Optional[str] = "-") -> List[str]:
+    """
+    按列批量格式化：一次取出底层数组，用预绑定的 str.format 映射，
+    替代逐格 `Series.apply(lambda x: f"...")`。
+    空值输出 `na`；`na=None` 时空值也走格式化 (与未做空值判断的旧 lambda 一致)。
+    """
+    arr = np.asarray(values, dtype=object)
+    fmt = spec.format
+    if na is None:
+        return list(map(fmt, arr))
+    mask = pd.isna(arr)
+    if not mask.any():
+        return list(map(fmt, arr))
+    return [na if m else fmt(v) for v, m in zip(arr, mask)]
+
+
+def format_series(s: pd.Series, spec: str, na: Optional[str] = "-") -> pd.Series:
+    return pd.Series(format_values(s.to_numpy(), spec, na), index=s.index, name=s.name, dtype=object)
+
+
+def format_frame(df: pd.DataFrame, spec: str, na: Optional[str] = "-") -> pd.DataFrame:
+    """对整张表的每个单元格套用同一格式 (替代 `df.map(lambda x: ...)`)，保留行列索引。"""
+    if df.shape[1] == 0:
+        return df.astype(object)
+    cols = [format_values(df.iloc[:, j].to_numpy(), spec, na) for j in range(df.shape[1])]
+    arr = np.empty(df.shape, dtype=object)
+    for j, col in enumerate(cols):
+        arr[:, j] = col
+    return pd.DataFrame(arr, index=df.index, columns=df.columns)
+
+
+class TableTemplate:
+    """
+    预编译的 Markdown 表格模板：表头与分隔行只生成一次，
+    数据行使用固定占位符的 format 字符串，最终一次 join。
+    """
+
+    def __init__(self, headers: Tuple[str, ...], sep: str = '---'):
+        self.n_cols = len(headers)
+        self.head = "| " + " | ".join(headers) + " |\n| " + " | ".join([sep] * self.n_cols) + " |"
+        self.row_fmt = ("| " + " | ".join(["{}"] * self.n_cols) + " |").format
+
+    def render_rows(self, rows: Iterable[Sequence]) -> List[str]:
+        out = [self.head]
+        n, row_fmt = self.n_cols, self.row_fmt
+        for row in rows:
+            # 行宽与表头不一致时退回通用拼接，保持与原实现逐字一致
+            out.append(row_fmt(*row) if len(row) == n else "| " + " | ".join([str(r) for r in row]) + " |")
+        return out
+
+    def render(self, rows: Iterable[Sequence]) -> str:
+        return "\n".join(self.render_rows(rows))
+
+
+@lru_cache(maxsize=256)
+def compile_table(headers: Tuple[str, ...], sep: str = '---') -> TableTemplate:
+    return TableTemplate(headers, sep)
+
+
+_md_local = threading.local()
+
+
+def md_to_html(text: str, extensions: Tuple[str, ...] = ('tables',)) -> str:
+    """
+    复用线程内的 Markdown 实例 (扩展只加载一次)，输出与 `markdown.markdown` 相同。
+    """
+    cache = getattr(_md_local, 'converters', None)
+    if cache is None:
+        cache = _md_local.converters = {}
+    md = cache.get(extensions)
+    if md is None:
+        md = cache[extensions] = markdown.Markdown(extensions=list(extensions))
+    return md.reset().convert(text)
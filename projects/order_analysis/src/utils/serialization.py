@@ -0,0 +1,109 @@
+import json
+import os
+import numpy as np
+from datetime import date
+from typing import Any, Dict, Optional
+
+try:
+    import orjson
+except ImportError:  # 回退到标准库 json
+    orjson = None
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+SIDECAR_FORMATS = ('msgpack',)
+
+
+class NpEncoder(json.JSONEncoder):
+    """标准库回退路径：序列化 NumPy / pandas 标量。"""
+    def default(self, obj):
+        if isinstance(obj, np.integer): return int(obj)
+        if isinstance(obj, np.floating): return float(obj)
+        if isinstance(obj, np.bool_): return bool(obj)
+        if isinstance(obj, np.ndarray): return obj.tolist()
+        if isinstance(obj, date): return obj.isoformat()
+        return super(NpEncoder, self).default(obj)
+
+
+def _orjson_default(obj):
+    # orjson 原生处理 ndarray 与 numpy 标量 (OPT_SERIALIZE_NUMPY)，这里只兜底少见类型
+    if isinstance(obj, np.bool_): return bool(obj)
+    if isinstance(obj, np.generic): return obj.item()
+    if isinstance(obj, date): return obj.isoformat()
+    raise TypeError(f"Type is not JSON serializable: {type(obj).__name__}")
+
+
+def dumps(obj: Any, compact: bool = False) -> bytes:
+    """序列化为 UTF-8 字节。compact=True 时不缩进。"""
+    if orjson is not None:
+        option = orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NON_STR_KEYS
+        if not compact:
+            option |= orjson.OPT_INDENT_2
+        return orjson.dumps(obj, default=_orjson_default, option=option)
+    kwargs = dict(
+        cls=NpEncoder, ensure_ascii=False, allow_nan=False,
+        indent=None if compact else 2,
+        separators=(',', ':') if compact else None
+    )
+    try:
+        text = json.dumps(obj, **kwargs)
+    except ValueError:
+        # 与 orjson 行为保持一致：NaN / Infinity 写为 null，保证产物是合法 JSON
+        text = json.dumps(_replace_non_finite(obj), **kwargs)
+    return text.encode('utf-8')
+
+
+def _replace_non_finite(obj: Any) -> Any:
+    if isinstance(obj, dict):
+        return {k: _replace_non_finite(v) for k, v in obj.items()}
+    if isinstance(obj, (list, tuple)):
+        return [_replace_non_finite(v) for v in obj]
+    if isinstance(obj, np.ndarray):
+        return _replace_non_finite(obj.tolist())
+    if isinstance(obj, (float, np.floating)) and not np.isfinite(obj):
+        return None
+    return obj
+
+
+def dump_json(obj: Any, path: str, compact: bool = False, sidecar: Optional[str] = None) -> Dict[str, str]:
+    """
+    写出分析结果 JSON，可选同时写出二进制 sidecar (同名不同后缀)。
+    返回实际写出的文件路径映射。
+    """
+    with open(path, 'wb') as f:
+        f.write(dumps(obj, compact=compact))
+    written = {"json": path}
+
+    if sidecar:
+        if sidecar not in SIDECAR_FORMATS:
+            raise ValueError(f"未知的 sidecar 格式: {sidecar} (可选: {', '.join(SIDECAR_FORMATS)})")
+        if msgpack is None:
+            raise ImportError("写出 msgpack sidecar 需要安装 msgpack")
+        side_path = os.path.splitext(path)[0] + ".msgpack"
+        with open(side_path, 'wb') as f:
+            # 复用 JSON 的原生化结果，保证两份产物内容一致
+            f.write(msgpack.packb(loads(dumps(obj, compact=True)), use_bin_type=True))
+        written["msgpack"] = side_path
+    return written
+
+
+def loads(data: bytes) -> Any:
+    if orjson is not None:
+        try:
+            return orjson.loads(data)
+        except orjson.JSONDecodeError:
+            pass  # 旧产物可能含 NaN / Infinity (非标准 JSON)，交给标准库解析
+    return json.loads(data)
+
+
+def load_json(path: str) -> Any:
+    """读取分析结果；若存在同名 .msgpack sidecar 且已安装 msgpack，则优先读取二进制版本。"""
+    side_path = os.path.splitext(path)[0] + ".msgpack"
+    if msgpack is not None and os.path.exists(side_path) and os.path.getmtime(side_path) >= os.path.getmtime(path):
+        with open(side_path, 'rb') as f:
+            return msgpack.unpackb(f.read(), raw=False, strict_map_key=False)
+    with open(path, 'rb') as f:
+        return loads(f.read())